@@ -0,0 +1,96 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir / "model"))
+from utils import COMPRESSIONS, _open_archive, archive_suffix
+
+
+def tree_size(path):
+    """Total size in bytes of the regular files under path."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            total += os.path.getsize(os.path.join(root, f))
+    return total
+
+
+def bench_codec(input_dir, compression, level=None, threads=0, repeat=1):
+    """
+    Archive input_dir with one codec and measure it.
+
+    Returns:
+        dict: codec, level, seconds (best of repeat), archive size in bytes
+    """
+    input_dir = Path(input_dir)
+    best = None
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = Path(tmp) / f"bench{archive_suffix(compression)}"
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with _open_archive(archive, compression, level, threads) as tar:
+                tar.add(input_dir, arcname=input_dir.name)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        size = archive.stat().st_size
+    return {
+        "codec": compression,
+        "level": COMPRESSIONS[compression][1] if level is None else level,
+        "seconds": best,
+        "size": size,
+    }
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser(
+        description="Compare archive wall time and size for each compression codec."
+    )
+    parser.add_argument("input_dir", type=str, help="Directory to archive.")
+    parser.add_argument(
+        "--codecs",
+        nargs="+",
+        choices=list(COMPRESSIONS),
+        default=list(COMPRESSIONS),
+        help="Codecs to compare. Default: all.",
+    )
+    parser.add_argument(
+        "--levels",
+        nargs="+",
+        type=int,
+        default=None,
+        help="Levels to try for every compressed codec. Default: codec default.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=0,
+        help="Compressor threads, 0 uses every core. Default: 0.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per setting, best is kept. Default: 3."
+    )
+    return parser
+
+
+def main():
+    args = build_argparser().parse_args()
+    raw = tree_size(args.input_dir)
+    print(f"Input: {args.input_dir} ({raw / 1e6:.1f} MB)")
+    print(f"{'codec':<6} {'level':>5} {'seconds':>9} {'MB':>9} {'ratio':>7} {'MB/s':>8}")
+    for codec in args.codecs:
+        levels = [None] if codec == "none" or not args.levels else args.levels
+        for level in levels:
+            r = bench_codec(args.input_dir, codec, level, args.threads, args.repeat)
+            print(
+                f"{r['codec']:<6} {str(r['level'] or '-'):>5} {r['seconds']:>9.3f} "
+                f"{r['size'] / 1e6:>9.2f} {raw / max(r['size'], 1):>7.2f} "
+                f"{raw / 1e6 / max(r['seconds'], 1e-9):>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
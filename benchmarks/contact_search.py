@@ -0,0 +1,113 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir / "model"))
+from contacts import brute_force_pairs, contact_pairs
+from scoring import read_structure
+
+# Heavy atoms per residue and atom density of a folded protein (atoms / A^3)
+ATOMS_PER_RESIDUE = 8
+DENSITY = 0.05
+
+
+def synthetic_complex(n_receptor, n_peptide, seed=0):
+    """
+    Receptor and peptide heavy-atom coordinates.
+
+    The receptor fills a sphere at protein density and the peptide is an
+    extended chain lying on its surface, so the contact count is realistic.
+    """
+    rng = np.random.default_rng(seed)
+    n_atoms = n_receptor * ATOMS_PER_RESIDUE
+    radius = (3 * n_atoms / (4 * np.pi * DENSITY)) ** (1 / 3)
+    direction = rng.normal(size=(n_atoms, 3))
+    direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+    receptor = direction * radius * rng.random((n_atoms, 1)) ** (1 / 3)
+
+    trace = np.arange(n_peptide)[:, None] * np.array([3.8, 0.0, 0.0])
+    trace += np.array([-1.9 * n_peptide, 0.0, radius + 2.0])
+    peptide = np.repeat(trace, ATOMS_PER_RESIDUE, axis=0)
+    peptide += rng.normal(0, 1.0, peptide.shape)
+    return receptor, peptide
+
+
+def bench(func, a, b, cutoff, repeat=3):
+    """
+    Returns:
+        tuple: (best wall time in seconds, result of the last run)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(a, b, cutoff)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser(
+        description="Compare the cell-list contact search against brute-force all pairs."
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="PDB or mmCIF files; contacts between their first two chains are searched. "
+        "Default: synthetic complexes of --receptor_lengths residues.",
+    )
+    parser.add_argument(
+        "--receptor_lengths",
+        nargs="+",
+        type=int,
+        default=[100, 300, 1000, 3000],
+        help="Receptor residue counts of the synthetic complexes. Default: 100 300 1000 3000.",
+    )
+    parser.add_argument(
+        "--peptide_length",
+        type=int,
+        default=15,
+        help="Peptide residue count of the synthetic complexes. Default: 15.",
+    )
+    parser.add_argument(
+        "--cutoff", type=float, default=5.0, help="Contact cutoff in Angstrom. Default: 5."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per setting, best is kept. Default: 3."
+    )
+    return parser
+
+
+def main():
+    args = build_argparser().parse_args()
+    cases = []
+    for path in args.files:
+        atoms = read_structure(path)
+        chains = [atoms.coords[atoms.chain_index == i] for i in (0, 1)]
+        cases.append((Path(path).name, *chains))
+    if not args.files:
+        for n in args.receptor_lengths:
+            cases.append((f"receptor {n} res", *synthetic_complex(n, args.peptide_length)))
+
+    print(
+        f"{'complex':<24} {'pair':<18} {'atoms':>13} {'pairs':>7} "
+        f"{'brute s':>9} {'cells s':>9} {'speedup':>8}"
+    )
+    for name, receptor, peptide in cases:
+        for pair, a, b in (("receptor-peptide", receptor, peptide), ("receptor-receptor", receptor, receptor)):
+            naive, expected = bench(brute_force_pairs, a, b, args.cutoff, args.repeat)
+            cells, found = bench(contact_pairs, a, b, args.cutoff, args.repeat)
+            if not all(np.array_equal(x, y) for x, y in zip(expected, found)):
+                raise AssertionError(f"Contact pairs differ for {name} {pair}")
+            print(
+                f"{name[:24]:<24} {pair:<18} {f'{len(a)}x{len(b)}':>13} {len(found[0]):>7} "
+                f"{naive:>9.4f} {cells:>9.4f} {naive / cells:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
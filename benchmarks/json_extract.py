@@ -0,0 +1,123 @@
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir / "model"))
+from jsonstream import read_json_keys
+
+SCALARS = ("max_pae", "ptm", "iptm")
+
+
+def write_scores(path, n_residues, seed=0):
+    """Write a synthetic AlphaFold-Multimer score JSON with an n x n PAE matrix."""
+    rng = random.Random(seed)
+    data = {
+        "max_pae": 31.75,
+        "pae": [[round(rng.uniform(0, 31.75), 2) for _ in range(n_residues)] for _ in range(n_residues)],
+        "plddt": [round(rng.uniform(30, 95), 2) for _ in range(n_residues)],
+        "ptm": rng.random(),
+        "iptm": rng.random(),
+    }
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def load_scalars(path):
+    with open(path, "r") as f:
+        data = json.load(f)
+    return {key: data.get(key) for key in SCALARS + ("plddt",)}
+
+
+def stream_scalars(path):
+    return read_json_keys(path, keys=SCALARS, arrays=["plddt"])
+
+
+def load_arrays(path):
+    with open(path, "r") as f:
+        data = json.load(f)
+    return np.array(data["plddt"]), np.array(data["pae"])
+
+
+def stream_arrays(path):
+    data = read_json_keys(path, arrays=["plddt", "pae"])
+    return data["plddt"], data["pae"]
+
+
+METHODS = {
+    "json.load scalars": load_scalars,
+    "stream scalars": stream_scalars,
+    "json.load + pae": load_arrays,
+    "stream + pae": stream_arrays,
+}
+
+
+def bench(func, path, repeat=3):
+    """
+    Returns:
+        tuple: (best wall time in seconds, peak traced memory in bytes)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser(
+        description="Compare json.load against streaming key-selective extraction of score JSONs."
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="Score JSONs to benchmark. Default: synthetic files of --lengths residues.",
+    )
+    parser.add_argument(
+        "--lengths",
+        nargs="+",
+        type=int,
+        default=[250, 500, 1000, 2000],
+        help="Residue counts of the synthetic files. Default: 250 500 1000 2000.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per setting, best is kept. Default: 3."
+    )
+    return parser
+
+
+def main():
+    args = build_argparser().parse_args()
+    print(f"{'file':<24} {'MB':>7} {'method':<18} {'seconds':>9} {'peak MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        files = [Path(f) for f in args.files]
+        if not files:
+            for n in args.lengths:
+                files.append(Path(tmp) / f"scores_{n}.json")
+                write_scores(files[-1], n)
+        for path in files:
+            size = path.stat().st_size
+            for method, func in METHODS.items():
+                seconds, peak = bench(func, path, args.repeat)
+                print(
+                    f"{path.name[:24]:<24} {size / 1e6:>7.1f} {method:<18} "
+                    f"{seconds:>9.3f} {peak / 1e6:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
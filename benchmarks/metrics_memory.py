@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir / "model"))
+from afm import INTERFACE_COLUMNS
+from metadata import MetricTable, write_streamed_metadata
+from utils import METADATA_FORMATS, _write_parquet
+
+SCORE_KEYS = ("plddt", "ptm", "iptm", "composite_ptm", "max_pae", *INTERFACE_COLUMNS)
+CHAINS = ("AB", "BA", "AC")
+
+
+def predictions(n_ids, ranks):
+    """(id, rank, file) rows of a synthetic run, in scan order."""
+    return [
+        (f"Pep{i}-Rec{i}", str(rank), f"Pep{i}-Rec{i}_{rank}.json")
+        for i in range(n_ids)
+        for rank in range(1, ranks + 1)
+    ]
+
+
+def score_result(protein_id, rank):
+    """Score metrics of one prediction, as json_batch_extract returns them."""
+    seed = zlib.crc32(f"{protein_id}_{rank}".encode())
+    return {key: round((seed >> k) % 100000 / 1000, 3) for k, key in enumerate(SCORE_KEYS)}
+
+
+def chain_result(protein_id, rank):
+    """Structure metrics of one prediction, as pdb_extract returns them."""
+    # A new string per row, as when parsed from a file
+    return {"chains": "".join(CHAINS[int(rank) % len(CHAINS)])}
+
+
+def run_dicts(rows, metadata_path, metadata_format):
+    """Per-row dicts merged with pandas, the layout before MetricTable."""
+    import pandas as pd
+
+    all_results = [{**score_result(i, r), "id": i, "rank": r} for i, r, _ in rows]
+    chain_results = [{**chain_result(i, r), "id": i, "rank": r} for i, r, _ in rows]
+    dfs = pd.merge(
+        pd.DataFrame(all_results), pd.DataFrame(chain_results), on=["id", "rank"], how="left"
+    )
+    main_cols = ["id", "rank", "chains"]
+    dfs = dfs[main_cols + [c for c in dfs.columns if c not in main_cols]]
+    dfs.sort_values(by=["id", "rank"], inplace=True)
+    if metadata_format == "csv":
+        dfs.to_csv(metadata_path + ".csv", index=False)
+    else:
+        _write_parquet(dfs, metadata_path + ".parquet")
+
+
+def _fill(rows):
+    table = MetricTable(SCORE_KEYS)
+    for protein_id, rank, _ in rows:
+        table.set(protein_id, rank, score_result(protein_id, rank))
+    for protein_id, rank, _ in rows:
+        table.set(protein_id, rank, chain_result(protein_id, rank), create=False)
+    return table
+
+
+def run_table(rows, metadata_path, metadata_format):
+    """Results set into a MetricTable as they arrive, then written from its columns."""
+    table = _fill(rows)
+    table.sort()
+    table.write(metadata_path, metadata_format)
+
+
+def run_stream(rows, metadata_path, metadata_format):
+    """One MetricTable per block of ids, written with --stream_metadata."""
+    # Streamed rows must come in (id, rank) order; the runner sorts them in place
+    rows = sorted(rows)
+    write_streamed_metadata(metadata_path, rows, [], lambda block, _: _fill(block), SCORE_KEYS)
+
+
+VARIANTS = {
+    "dicts + pandas merge": run_dicts,
+    "MetricTable": run_table,
+    "MetricTable streamed": run_stream,
+}
+
+
+def _in_child(func, traced):
+    # A fresh fork per run, so memory freed by one variant is not reused by the next
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        status = 0
+        try:
+            if traced:
+                tracemalloc.start()
+            start = time.perf_counter()
+            func()
+            out = {"seconds": time.perf_counter() - start}
+            if traced:
+                out["peak"] = tracemalloc.get_traced_memory()[1]
+        except BaseException as e:
+            out, status = {"error": f"{type(e).__name__}: {e}"}, 1
+        with os.fdopen(write_fd, "w") as f:
+            json.dump(out, f)
+        os._exit(status)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        out = json.loads(f.read() or '{"error": "benchmark process died"}')
+    os.waitpid(pid, 0)
+    if "error" in out:
+        raise RuntimeError(out["error"])
+    return out
+
+
+def bench(func, repeat):
+    """Best untraced seconds of repeat runs and the tracemalloc peak in bytes of one traced run."""
+    seconds = min(_in_child(func, False)["seconds"] for _ in range(repeat))
+    return seconds, _in_child(func, True)["peak"]
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser(
+        description="Memory and time of building and writing a metadata table, "
+        "per-row dicts merged with pandas against MetricTable."
+    )
+    parser.add_argument(
+        "--ids", type=int, default=40000, help="Synthetic prediction ids. Default: 40000."
+    )
+    parser.add_argument("--ranks", type=int, default=5, help="Ranks per id. Default: 5.")
+    parser.add_argument(
+        "--metadata_format",
+        choices=[f for f in METADATA_FORMATS if f != "both"],
+        default="csv",
+        help="Output format; streaming always writes CSV. Default: csv.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Timed runs per variant; the best is kept. Default: 3.",
+    )
+    return parser
+
+
+def main():
+    args = build_argparser().parse_args()
+    # Imported once here, so no variant is charged for it
+    import pandas  # noqa: F401
+
+    rows = predictions(args.ids, args.ranks)
+    print(f"{len(rows)} predictions, {len(SCORE_KEYS) + 3} columns")
+    print(f"{'variant':<22} {'seconds':>9} {'peak MB':>9} {'bytes/row':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        metadata_path = os.path.join(tmp, "metadata")
+        for variant, func in VARIANTS.items():
+            if func is run_stream and args.metadata_format != "csv":
+                continue
+            seconds, peak = bench(
+                lambda: func(rows, metadata_path, args.metadata_format), args.repeat
+            )
+            print(f"{variant:<22} {seconds:>9.3f} {peak / 1e6:>9.1f} {peak / len(rows):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
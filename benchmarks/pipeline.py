@@ -0,0 +1,380 @@
+import argparse
+import contextlib
+import functools
+import http.server
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir / "model"))
+sys.path.append(str(parent_dir))
+from synthetic import MODELS, generate
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "pipeline.json"
+# Stages faster than this are too noisy for a throughput comparison
+MIN_SECONDS = 0.1
+
+
+@contextlib.contextmanager
+def serve(directory):
+    """Base URL of a local HTTP server for directory, so downloads stay offline."""
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(Handler, directory=str(directory))
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _size(paths):
+    return sum(os.path.getsize(p) for p in paths)
+
+
+def _model_api(model):
+    """(index function, name, json_extract, structure extract, main, structure kind) of a model."""
+    if model == "AFMultimer":
+        from afm import json_extract, main_afm, name, pdb_extract
+        from layouts import index_afm
+
+        return index_afm, name, json_extract, pdb_extract, main_afm, "pdb"
+    if model == "Chai-1":
+        from chai1 import cif_extract, json_extract, main_chai1, name
+        from layouts import index_chai1
+
+        return index_chai1, name, json_extract, cif_extract, main_chai1, "cif"
+    from helixfold3 import cif_extract, json_extract, main_helixfold3, name
+    from layouts import index_helixfold3
+
+    return index_helixfold3, name, json_extract, cif_extract, main_helixfold3, "cif"
+
+
+def _sources(index, kind):
+    return [src for src, dst in index.pairs("") if dst.endswith(f".{kind}")]
+
+
+def model_stages(data, model, workers):
+    """
+    Stages of one model, each a (name, run) pair. run(tmp) does the work in an
+    empty scratch directory and returns the number of files and bytes it read.
+    """
+    index_fn, name, json_extract, structure_extract, main, kind = _model_api(model)
+    input_dir = os.path.join(data, model)
+    index = index_fn(input_dir)
+    jsons, structures = _sources(index, "json"), _sources(index, kind)
+    size = _size(jsons) + _size(structures)
+
+    def scan(tmp):
+        return len(index_fn(input_dir)), 0
+
+    def stage(tmp):
+        name(input_dir, os.path.join(tmp, "out"), workers, "copy")
+        return len(index), size
+
+    def scores(tmp):
+        for path in jsons:
+            json_extract(path)
+        return len(jsons), _size(jsons)
+
+    def chains(tmp):
+        for path in structures:
+            structure_extract(path)
+        return len(structures), _size(structures)
+
+    def full(tmp):
+        main(data, os.path.join(tmp, "out"), url=False, workers=workers, link_mode="copy")
+        return len(index), size
+
+    return [
+        (f"{model} scan", scan),
+        (f"{model} stage", stage),
+        (f"{model} json", scores),
+        (f"{model} structure", chains),
+        (f"{model} main", full),
+    ]
+
+
+def native_stages(data, base_url, workers):
+    """Native download from the local server and DockQ scoring of the AFMultimer ranks."""
+    from layouts import index_afm
+    from native.download import retrieve_natives
+    from scoring import score_batch
+
+    natives_csv = os.path.join(data, "natives.csv")
+    with open(natives_csv) as f:
+        rows = [line.strip().split(",") for line in f.readlines()[1:] if line.strip()]
+    served = {protein_id: os.path.join(data, "natives", f"{pdb_id}.pdb.gz") for protein_id, pdb_id in rows}
+
+    def download(tmp):
+        retrieve_natives(natives_csv, os.path.join(tmp, "natives"), workers=8, base_url=base_url)
+        return len(served), _size(served.values())
+
+    def score(tmp):
+        index = index_afm(os.path.join(data, "AFMultimer"))
+        sources = dict((dst, src) for src, dst in index.pairs(""))
+        batches = {}
+        for protein_id, _, dst in index.files("", "pdb"):
+            batches.setdefault(protein_id, []).append(sources[dst])
+        files = nbytes = 0
+        for protein_id, sources in batches.items():
+            if protein_id in served:
+                score_batch((served[protein_id], sources))
+                files += len(sources) + 1
+                nbytes += _size(sources) + os.path.getsize(served[protein_id])
+        return files, nbytes
+
+    return [("natives download", download), ("scoring", score)]
+
+
+def cli_stage(data, base_url, workers, models):
+    """model.py end to end, as a user runs it: staging, metadata, scores and archives."""
+
+    def run(tmp):
+        subprocess.run(
+            [
+                sys.executable,
+                str(parent_dir / "model" / "model.py"),
+                "--input_path",
+                data,
+                "--model",
+                *models,
+                "--output_dir",
+                os.path.join(tmp, "out"),
+                "--input",
+                os.path.join(data, "natives.csv"),
+                "--native_base_url",
+                base_url,
+                "--no_native_cache",
+                "--workers",
+                str(workers),
+                "--score",
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            cwd=tmp,
+        )
+        files = sum(1 for _, _, names in os.walk(data) for _ in names)
+        return files, sum(
+            os.path.getsize(os.path.join(root, f)) for root, _, names in os.walk(data) for f in names
+        )
+
+    return [("model.py --score", run)]
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if platform.system() == "Darwin" else 1024
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return peak * scale / 1e6
+
+
+def measure(run, repeat=1):
+    """
+    Run a stage in a forked process, repeat times.
+
+    The fork keeps the peak RSS of every stage apart from the others; it
+    includes the harness itself and any subprocess of the stage. The stage
+    runs in its own scratch directory, which the pipeline also uses for its
+    temporary folders.
+
+    Returns:
+        dict: files, bytes, seconds (best of repeat), peak RSS in MB (largest of repeat)
+    """
+    result = {"seconds": None, "rss_mb": 0.0}
+    for _ in range(repeat):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            status = 0
+            try:
+                with tempfile.TemporaryDirectory() as tmp:
+                    os.chdir(tmp)
+                    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                        start = time.perf_counter()
+                        files, nbytes = run(tmp)
+                        elapsed = time.perf_counter() - start
+                out = {"files": files, "bytes": nbytes, "seconds": elapsed, "rss_mb": _peak_rss_mb()}
+            except BaseException as e:
+                out, status = {"error": f"{type(e).__name__}: {e}"}, 1
+            with os.fdopen(write_fd, "w") as f:
+                json.dump(out, f)
+            os._exit(status)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            out = json.loads(f.read() or '{"error": "stage process died"}')
+        os.waitpid(pid, 0)
+        if "error" in out:
+            raise RuntimeError(out["error"])
+        result["files"], result["bytes"] = out["files"], out["bytes"]
+        if result["seconds"] is None or out["seconds"] < result["seconds"]:
+            result["seconds"] = out["seconds"]
+        result["rss_mb"] = max(result["rss_mb"], out["rss_mb"])
+    seconds = max(result["seconds"], 1e-9)
+    result["files_per_s"] = result["files"] / seconds
+    result["mb_per_s"] = result["bytes"] / 1e6 / seconds
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """
+    Stages slower or larger than the baseline by more than tolerance.
+
+    Throughput is only compared for stages that took at least MIN_SECONDS in
+    the baseline; peak RSS always is.
+
+    Returns:
+        list: (stage, message) of every regression
+    """
+    regressions = []
+    for stage, result in results.items():
+        reference = baseline.get(stage)
+        if reference is None:
+            continue
+        if (
+            reference["seconds"] >= MIN_SECONDS
+            and result["files_per_s"] < reference["files_per_s"] * (1 - tolerance)
+        ):
+            regressions.append(
+                (stage, f"{result['files_per_s']:.1f} files/s, baseline {reference['files_per_s']:.1f}")
+            )
+        if result["rss_mb"] > reference["rss_mb"] * (1 + tolerance):
+            regressions.append(
+                (stage, f"{result['rss_mb']:.0f} MB peak RSS, baseline {reference['rss_mb']:.0f}")
+            )
+    return regressions
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser(
+        description="Throughput and peak memory of every pipeline stage on a synthetic dataset, "
+        "offline, with optional regression checks against a stored baseline."
+    )
+    parser.add_argument(
+        "--data",
+        type=str,
+        default=None,
+        help="Dataset written by synthetic.py. Default: generate one in a temporary directory.",
+    )
+    parser.add_argument(
+        "--ids", type=int, default=50, help="Complexes to generate. Default: 50."
+    )
+    parser.add_argument(
+        "--ranks", type=int, default=5, help="Predictions per complex and model. Default: 5."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Dataset seed. Default: 0.")
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        choices=MODELS,
+        default=list(MODELS),
+        help="Models to benchmark. Default: all.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Workers of the pipeline stages. Default: 1."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per stage; the best time is kept. Default: 3."
+    )
+    parser.add_argument(
+        "--no_cli", action="store_true", help="Skip the end-to-end model.py run."
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help=f"Baseline to compare against. Default: {DEFAULT_BASELINE.relative_to(parent_dir)} "
+        "if it exists.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="Allowed drop in files/s and growth in peak RSS before a stage counts as a "
+        "regression. Default: 0.3.",
+    )
+    parser.add_argument(
+        "--save_baseline", type=str, default=None, help="Write the results as a new baseline."
+    )
+    return parser
+
+
+def main():
+    args = build_argparser().parse_args()
+    scale = {"ids": args.ids, "ranks": args.ranks, "seed": args.seed, "workers": args.workers}
+
+    with contextlib.ExitStack() as stack:
+        data = args.data
+        if data is None:
+            data = stack.enter_context(tempfile.TemporaryDirectory(prefix="synthetic_"))
+            start = time.perf_counter()
+            generate(data, args.ids, args.ranks, models=tuple(args.models), seed=args.seed)
+            print(f"Generated {args.ids} complexes x {args.ranks} ranks in "
+                  f"{time.perf_counter() - start:.1f} s")
+        else:
+            scale = {"data": os.path.abspath(data), "workers": args.workers}
+        base_url = stack.enter_context(serve(os.path.join(data, "natives")))
+
+        stages = []
+        for model in args.models:
+            stages += model_stages(data, model, args.workers)
+        stages += native_stages(data, base_url, args.workers)
+        if not args.no_cli:
+            stages += cli_stage(data, base_url, args.workers, args.models)
+
+        results = {}
+        print(f"{'stage':<22} {'files':>7} {'MB':>8} {'seconds':>8} {'files/s':>9} {'MB/s':>8} {'RSS MB':>7}")
+        for stage, run in stages:
+            result = measure(run, args.repeat)
+            results[stage] = result
+            print(
+                f"{stage:<22} {result['files']:>7} {result['bytes'] / 1e6:>8.1f} "
+                f"{result['seconds']:>8.2f} {result['files_per_s']:>9.1f} "
+                f"{result['mb_per_s']:>8.1f} {result['rss_mb']:>7.0f}"
+            )
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump({"scale": scale, "stages": results}, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    baseline_path = args.baseline or (DEFAULT_BASELINE if DEFAULT_BASELINE.exists() else None)
+    if baseline_path is None or args.save_baseline:
+        return
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get("scale") != scale:
+        print(f"Warning: baseline {baseline_path} was measured at {baseline.get('scale')}, "
+              f"this run at {scale}")
+    regressions = compare(results, baseline["stages"], args.tolerance)
+    for stage, message in regressions:
+        print(f"Regression in {stage}: {message}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regression against {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+
+COMMANDS = {
+    "model.py --help": [str(parent_dir / "model" / "model.py"), "--help"],
+    "afm.py --help": [str(parent_dir / "model" / "afm.py"), "--help"],
+    "chai1.py --help": [str(parent_dir / "model" / "chai1.py"), "--help"],
+    "helixfold3.py --help": [str(parent_dir / "model" / "helixfold3.py"), "--help"],
+    "download.py --help": [str(parent_dir / "native" / "download.py"), "--help"],
+}
+# Modules the command line must start without
+HEAVY = ("pandas", "numpy", "pyarrow")
+
+
+def import_times(args):
+    """
+    Imports of one run under -X importtime.
+
+    Returns:
+        list: (module, depth, self microseconds, cumulative microseconds) in import order
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return imports
+
+
+def wall_time(args, repeat):
+    """Best wall time in seconds of repeat runs, without import tracing."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], stdout=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench(args, interpreter_modules, repeat):
+    """
+    Startup cost of a command beyond that of the bare interpreter.
+
+    Returns:
+        dict: wall seconds, import milliseconds (best of repeat), imported
+        modules and the slowest top-level imports
+    """
+    best = None
+    for _ in range(repeat):
+        imports = [row for row in import_times(args) if row[0] not in interpreter_modules]
+        total = sum(cumulative for _, depth, _, cumulative in imports if depth == 1)
+        if best is None or total < best[0]:
+            best = (total, imports)
+    total, imports = best
+    top = sorted(
+        ((name, cumulative) for name, depth, _, cumulative in imports if depth == 1),
+        key=lambda row: -row[1],
+    )
+    return {
+        "wall": wall_time(args, repeat),
+        "import_ms": total / 1000,
+        "modules": {name for name, _, _, _ in imports},
+        "top": top,
+    }
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser(
+        description="Startup time of the command line tools, from -X importtime."
+    )
+    parser.add_argument(
+        "--commands",
+        nargs="+",
+        choices=list(COMMANDS),
+        default=list(COMMANDS),
+        help="Commands to time. Default: all.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Runs per command; the best is kept. Default: 5."
+    )
+    parser.add_argument(
+        "--budget_ms",
+        type=float,
+        default=150.0,
+        help="Import time budget of model.py --help beyond the bare interpreter. Default: 150.",
+    )
+    parser.add_argument(
+        "--top", type=int, default=5, help="Slowest top-level imports to list. Default: 5."
+    )
+    return parser
+
+
+def main():
+    args = build_argparser().parse_args()
+    interpreter_modules = {name for name, _, _, _ in import_times(["-c", "pass"])}
+    interpreter = wall_time(["-c", "pass"], args.repeat)
+    print(f"Interpreter startup: {interpreter * 1000:.0f} ms")
+    print(f"{'command':<22} {'wall ms':>8} {'+ ms':>7} {'import ms':>10}  slowest imports")
+
+    failures = []
+    for command in args.commands:
+        result = bench(COMMANDS[command], interpreter_modules, args.repeat)
+        slowest = ", ".join(f"{name} {us / 1000:.0f}" for name, us in result["top"][: args.top])
+        print(
+            f"{command:<22} {result['wall'] * 1000:>8.0f} "
+            f"{(result['wall'] - interpreter) * 1000:>7.0f} {result['import_ms']:>10.1f}  {slowest}"
+        )
+        if command == "model.py --help":
+            heavy = sorted(m for m in HEAVY if m in result["modules"])
+            if heavy:
+                failures.append(f"model.py --help imports {', '.join(heavy)}")
+            if result["import_ms"] > args.budget_ms:
+                failures.append(
+                    f"model.py --help imports take {result['import_ms']:.1f} ms, "
+                    f"budget {args.budget_ms:.0f} ms"
+                )
+
+    for failure in failures:
+        print(f"Over budget: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import argparse
+import csv
+import gzip
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+MODELS = ("AFMultimer", "Chai-1", "HelixFold3")
+
+# Heavy atoms of every residue type, backbone first
+_BACKBONE = ("N", "CA", "C", "O")
+RESIDUES = {
+    "ALA": ("CB",),
+    "ARG": ("CB", "CG", "CD", "NE", "CZ", "NH1", "NH2"),
+    "ASN": ("CB", "CG", "OD1", "ND2"),
+    "ASP": ("CB", "CG", "OD1", "OD2"),
+    "CYS": ("CB", "SG"),
+    "GLN": ("CB", "CG", "CD", "OE1", "NE2"),
+    "GLU": ("CB", "CG", "CD", "OE1", "OE2"),
+    "GLY": (),
+    "HIS": ("CB", "CG", "ND1", "CD2", "CE1", "NE2"),
+    "ILE": ("CB", "CG1", "CG2", "CD1"),
+    "LEU": ("CB", "CG", "CD1", "CD2"),
+    "LYS": ("CB", "CG", "CD", "CE", "NZ"),
+    "MET": ("CB", "CG", "SD", "CE"),
+    "PHE": ("CB", "CG", "CD1", "CD2", "CE1", "CE2", "CZ"),
+    "PRO": ("CB", "CG", "CD"),
+    "SER": ("CB", "OG"),
+    "THR": ("CB", "OG1", "CG2"),
+    "TRP": ("CB", "CG", "CD1", "CD2", "NE1", "CE2", "CE3", "CZ2", "CZ3", "CH2"),
+    "TYR": ("CB", "CG", "CD1", "CD2", "CE1", "CE2", "CZ", "OH"),
+    "VAL": ("CB", "CG1", "CG2"),
+}
+_CIF_COLUMNS = (
+    "group_PDB id type_symbol label_atom_id label_alt_id label_comp_id label_asym_id "
+    "label_entity_id label_seq_id pdbx_PDB_ins_code Cartn_x Cartn_y Cartn_z occupancy "
+    "B_iso_or_equiv auth_seq_id auth_asym_id pdbx_PDB_model_num"
+).split()
+
+
+class Complex:
+    """
+    Topology and native coordinates of one receptor-peptide complex.
+
+    The receptor CA trace is a self-avoiding-ish random walk folded into a
+    globule and the peptide an extended strand on its surface, so contact
+    and interface counts are of realistic size.
+    """
+
+    def __init__(self, n_receptor, n_peptide, rng):
+        names = list(RESIDUES)
+        self.atoms = []  # (chain, resseq, residue name, atom name)
+        ca = []
+        for chain, length in (("A", n_receptor), ("B", n_peptide)):
+            for resseq in range(1, length + 1):
+                residue = names[rng.integers(len(names))]
+                for atom in _BACKBONE + RESIDUES[residue]:
+                    self.atoms.append((chain, resseq, residue, atom))
+            ca.append(self._trace(length, rng, compact=chain == "A"))
+
+        # Drape the peptide over the top of the receptor, about 5 A above it
+        ca[1] = ca[1] - ca[1].mean(axis=0) + ca[0].mean(axis=0)
+        for residue in ca[1]:
+            near = np.linalg.norm(ca[0][:, :2] - residue[:2], axis=1) < 6.0
+            top = ca[0][near, 2].max() if near.any() else ca[0][:, 2].max()
+            residue[2] = top + 5.0
+        trace = {("A", i + 1): xyz for i, xyz in enumerate(ca[0])}
+        trace.update({("B", i + 1): xyz for i, xyz in enumerate(ca[1])})
+        offsets = rng.normal(0.0, 1.2, (len(self.atoms), 3))
+        self.coords = np.array([trace[(c, r)] for c, r, _, _ in self.atoms]) + offsets
+        self.coords[[a == "CA" for _, _, _, a in self.atoms]] -= offsets[
+            [a == "CA" for _, _, _, a in self.atoms]
+        ]
+        self.n_residues = n_receptor + n_peptide
+
+    @staticmethod
+    def _trace(length, rng, compact):
+        steps = rng.normal(size=(length, 3))
+        steps /= np.linalg.norm(steps, axis=1, keepdims=True)
+        if compact:
+            # Pull every step back towards the origin to fold the chain
+            trace = np.zeros((length, 3))
+            for i in range(1, length):
+                step = steps[i] - 0.05 * trace[i - 1] / max(1.0, np.sqrt(length))
+                trace[i] = trace[i - 1] + 3.8 * step / np.linalg.norm(step)
+            return trace
+        return np.cumsum(np.repeat([[3.3, 0.0, 0.0]], length, axis=0) + 0.5 * steps, axis=0)
+
+    def model(self, rank, rng):
+        """Coordinates and per-atom pLDDT of a prediction; quality drops with rank."""
+        coords = self.coords + rng.normal(0.0, 0.3 + 0.4 * rank, self.coords.shape)
+        shift = np.array([c == "B" for c, _, _, _ in self.atoms])[:, None]
+        coords = coords + shift * rng.normal(0.0, 1.5 * rank, 3)
+        q, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+        coords = coords @ (q * np.sign(np.linalg.det(q))) + rng.normal(0, 20, 3)
+        plddt = np.clip(rng.normal(90 - 5 * rank, 8, self.n_residues), 20, 98)
+        residue = {key: i for i, key in enumerate(dict.fromkeys((c, r) for c, r, _, _ in self.atoms))}
+        return coords, plddt[[residue[(c, r)] for c, r, _, _ in self.atoms]], plddt
+
+    def pdb(self, coords, b_factors):
+        lines = []
+        for serial, ((chain, resseq, residue, atom), xyz, b) in enumerate(
+            zip(self.atoms, coords, b_factors), 1
+        ):
+            name = atom if len(atom) == 4 else f" {atom}"
+            lines.append(
+                f"ATOM  {serial % 100000:5d} {name:<4} {residue:3} {chain}{resseq:4d}    "
+                f"{xyz[0]:8.3f}{xyz[1]:8.3f}{xyz[2]:8.3f}{1.0:6.2f}{b:6.2f}          {atom[0]:>2}"
+            )
+        return "\n".join(lines + ["TER", "END", ""])
+
+    def cif(self, coords, b_factors, entity_poly=False):
+        chains = list(dict.fromkeys(c for c, _, _, _ in self.atoms))
+        lines = ["data_model", "#", "loop_"]
+        if entity_poly:
+            # HelixFold3 layout
+            lines += ["_entity_poly.entity_id", "_entity_poly.pdbx_strand_id", "_entity_poly.type"]
+            lines += [f"{i + 1} {c} polypeptide(L)" for i, c in enumerate(chains)]
+        else:
+            # Chai-1 layout
+            lines += ["_entity.id", "_entity.type", "_entity.src_method", "_entity.pdbx_description"]
+            lines += [f"{i + 1} polymer man 'Entity {c}'" for i, c in enumerate(chains)]
+        lines += ["#", "loop_"] + [f"_atom_site.{column}" for column in _CIF_COLUMNS]
+        for serial, ((chain, resseq, residue, atom), xyz, b) in enumerate(
+            zip(self.atoms, coords, b_factors), 1
+        ):
+            entity = chains.index(chain) + 1
+            lines.append(
+                f"ATOM {serial} {atom[0]} {atom} . {residue} {chain} {entity} {resseq} ? "
+                f"{xyz[0]:.3f} {xyz[1]:.3f} {xyz[2]:.3f} 1.00 {b:.2f} {resseq} {chain} 1"
+            )
+        return "\n".join(lines + ["#", ""])
+
+
+_PAE = {}
+
+
+def _pae_json(n, rng):
+    """JSON text of an n x n PAE matrix, shared by every prediction of that size."""
+    if n not in _PAE:
+        pae = np.round(rng.uniform(0.2, 31.0, (n, n)), 2)
+        _PAE[n] = "[" + ",".join("[" + ",".join(map(str, row)) + "]" for row in pae.tolist()) + "]"
+    return _PAE[n]
+
+
+def _pdb_id(i):
+    """Unique PDB-like ID: a digit and three letters, so it never parses as a number."""
+    letters = "".join(chr(65 + i // 26**k % 26) for k in (2, 1, 0))
+    return f"{1 + i // 26**3 % 9}{letters}"
+
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    return len(text)
+
+
+def generate(
+    root,
+    n_ids=100,
+    ranks=5,
+    receptor_length=(150, 400),
+    peptide_length=(8, 20),
+    models=MODELS,
+    natives=True,
+    seed=0,
+):
+    """
+    Write a synthetic benchmark dataset.
+
+    Layout of root, matching the upstream dataset repository plus natives:
+
+        AFMultimer/<id>/<id>_{relaxed,unrelaxed}_rank_00N_..._model_N_seed_000.pdb
+        AFMultimer/<id>/<id>_scores_rank_00N_..._model_N_seed_000.json
+        Chai-1/<id>/pred.rank_N.cif, scores.rank_N.json (N from 0)
+        HelixFold3/helixfold3_result_to_download_K/job-<id>-x-rankN/
+            predicted_structure.cif, all_results.json
+        natives/<PDB_ID>.pdb.gz   served as an RCSB-like download mirror
+        natives.csv               id,pdb_id
+
+    Args:
+        root (str): Output directory
+        n_ids (int): Number of receptor-peptide complexes
+        ranks (int): Predictions per complex and model
+        receptor_length (tuple): Min and max receptor residues
+        peptide_length (tuple): Min and max peptide residues
+        models (tuple): Model folders to write
+        natives (bool): Also write the natives and natives.csv
+        seed (int): Random seed, the same seed gives the same dataset
+
+    Returns:
+        dict: Number of files and bytes written per model folder
+    """
+    rng = np.random.default_rng(seed)
+    root = Path(root)
+    written = {}
+
+    def add(model, size):
+        files, total = written.get(model, (0, 0))
+        written[model] = (files + 1, total + size)
+
+    rows = []
+    for i in range(n_ids):
+        protein_id = f"Pep{i}-Rec{i}"
+        complex_ = Complex(
+            int(rng.integers(receptor_length[0], receptor_length[1] + 1)),
+            int(rng.integers(peptide_length[0], peptide_length[1] + 1)),
+            rng,
+        )
+        if natives:
+            pdb_id = _pdb_id(i)
+            os.makedirs(root / "natives", exist_ok=True)
+            with gzip.open(root / "natives" / f"{pdb_id}.pdb.gz", "wt", compresslevel=1) as f:
+                f.write(complex_.pdb(complex_.coords, np.zeros(len(complex_.atoms))))
+            rows.append((protein_id, pdb_id))
+
+        for rank in range(1, ranks + 1):
+            coords, b_factors, plddt = complex_.model(rank - 1, rng)
+            ptm, iptm = (float(x) for x in np.round(rng.uniform(0.2, 0.95, 2), 4))
+
+            if "AFMultimer" in models:
+                folder = root / "AFMultimer" / protein_id
+                folder.mkdir(parents=True, exist_ok=True)
+                suffix = f"rank_{rank:03d}_alphafold2_multimer_v3_model_{rank}_seed_000"
+                pdb = complex_.pdb(coords, b_factors)
+                for kind in ("relaxed", "unrelaxed"):
+                    add("AFMultimer", _write(folder / f"{protein_id}_{kind}_{suffix}.pdb", pdb))
+                scores = (
+                    f'{{"max_pae": 31.75, "pae": {_pae_json(complex_.n_residues, rng)}, '
+                    f'"plddt": {json.dumps(np.round(plddt, 2).tolist())}, '
+                    f'"ptm": {ptm}, "iptm": {iptm}}}'
+                )
+                add("AFMultimer", _write(folder / f"{protein_id}_scores_{suffix}.json", scores))
+
+            if "Chai-1" in models:
+                folder = root / "Chai-1" / protein_id
+                folder.mkdir(parents=True, exist_ok=True)
+                add("Chai-1", _write(folder / f"pred.rank_{rank - 1}.cif", complex_.cif(coords, b_factors)))
+                scores = {"ptm": ptm, "iptm": iptm, "aggregate_score": round(0.2 * ptm + 0.8 * iptm, 4)}
+                add("Chai-1", _write(folder / f"scores.rank_{rank - 1}.json", json.dumps(scores)))
+
+            if "HelixFold3" in models:
+                folder = (
+                    root
+                    / "HelixFold3"
+                    / f"helixfold3_result_to_download_{i % 2}"
+                    / f"job-{protein_id}-x-rank{rank}"
+                )
+                folder.mkdir(parents=True, exist_ok=True)
+                cif = complex_.cif(coords, b_factors, entity_poly=True)
+                add("HelixFold3", _write(folder / "predicted_structure.cif", cif))
+                scores = {
+                    "mean_plddt": round(float(plddt.mean()), 3),
+                    "global_pae": round(float(rng.uniform(2, 20)), 3),
+                    "global_pae_min": round(float(rng.uniform(0, 2)), 3),
+                    "ptm": ptm,
+                    "iptm": iptm,
+                    "ranking_confidence": round(0.2 * ptm + 0.8 * iptm, 4),
+                }
+                add("HelixFold3", _write(folder / "all_results.json", json.dumps(scores)))
+
+    if natives:
+        with open(root / "natives.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "pdb_id"])
+            writer.writerows(rows)
+    return written
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic AFMultimer / Chai-1 / HelixFold3 dataset of any size."
+    )
+    parser.add_argument("output_dir", type=str, help="Dataset directory (created if missing).")
+    parser.add_argument(
+        "--ids", type=int, default=100, help="Number of complexes. Default: 100."
+    )
+    parser.add_argument(
+        "--ranks", type=int, default=5, help="Predictions per complex and model. Default: 5."
+    )
+    parser.add_argument(
+        "--receptor_length",
+        nargs=2,
+        type=int,
+        default=[150, 400],
+        help="Min and max receptor residues. Default: 150 400.",
+    )
+    parser.add_argument(
+        "--peptide_length",
+        nargs=2,
+        type=int,
+        default=[8, 20],
+        help="Min and max peptide residues. Default: 8 20.",
+    )
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        choices=MODELS,
+        default=list(MODELS),
+        help="Model folders to write. Default: all.",
+    )
+    parser.add_argument(
+        "--no_natives", action="store_true", help="Do not write natives and natives.csv."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed. Default: 0.")
+    return parser
+
+
+def main():
+    args = build_argparser().parse_args()
+    written = generate(
+        args.output_dir,
+        args.ids,
+        args.ranks,
+        tuple(args.receptor_length),
+        tuple(args.peptide_length),
+        tuple(args.models),
+        not args.no_natives,
+        args.seed,
+    )
+    for model, (files, size) in written.items():
+        print(f"{model:<12} {files:>8} files {size / 1e6:>10.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
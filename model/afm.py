@@ -1,48 +1,67 @@
-import shutil
-import json
-import subprocess
-import os, re
-import pandas as pd
-import argparse
+import os
+import numpy as np
 from pathlib import Path
 import sys
 
 parent_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(parent_dir))
-from utils import _process_file_afm, _download
-
-
-def name(input_path, output_path):
+from utils import _stage_files
+from manifest import cached_batch_map, cached_map
+from structure import read_pdb_atoms, chain_plddt
+from jsonstream import read_json_keys
+from layouts import index_afm
+from profiling import stage
+from metadata import MetricTable
+from runner import Adapter, adapter_cli, build_adapter_argparser, run_adapter
+
+
+def name(
+    input_path,
+    output_path,
+    workers=1,
+    link_mode="auto",
+    archive=None,
+    manifest=None,
+    tree=None,
+    index=None,
+):
     """
     Rename and copy PDB and JSON files with new naming convention.
     - Files with "_relaxed_" -> id_rank.pdb (e.g., Beta_endorphin-mu_opioid_001.pdb)
     - Files with "_scores_" -> id_rank.json (e.g., Beta_endorphin-mu_opioid_001.json)
+
+    index is the InputIndex of input_path, scanned here if not given.
     """
-    os.makedirs(output_path, exist_ok=True)
+    if archive is None:
+        os.makedirs(output_path, exist_ok=True)
+    if index is None:
+        index = index_afm(input_path, tree)
+    return _stage_files(index.pairs(output_path), workers, link_mode, archive, manifest)
 
-    # Get all subdirectories
-    subdirs = [
-        d for d in os.listdir(input_path) if os.path.isdir(os.path.join(input_path, d))
-    ]
 
-    for subdir in subdirs:
-        src_dir = os.path.join(input_path, subdir)
+def _json_scores(data):
+    # Extract pLDDT scores
+    plddt_list = data.get("plddt", [])
+    mean_plddt = float(sum(plddt_list) / len(plddt_list)) if len(plddt_list) else 0.0
 
-        # Process all files in the subdirectory
-        for filename in os.listdir(src_dir):
-            file_path = os.path.join(src_dir, filename)
+    max_pae = data.get("max_pae", 0.0)
+    # Extract confidence metrics
+    ptm = data.get("ptm", 0.0)
+    iptm = data.get("iptm", 0.0)
 
-            # Skip directories
-            if os.path.isdir(file_path):
-                continue
+    # Calculate composite PTM (0.8*iptm + 0.2*ptm)
+    composite_ptm = 0.8 * iptm + 0.2 * ptm
+
+    return {
+        "plddt": round(mean_plddt, 3),
+        "ptm": round(ptm, 3),
+        "iptm": round(iptm, 3),
+        "composite_ptm": round(composite_ptm, 3),
+        "max_pae": round(max_pae, 3),
+    }
 
-            # Process the file
-            _process_file_afm(
-                file_path, filename, output_path, pattern="_relaxed_", format="pdb"
-            )
-            _process_file_afm(
-                file_path, filename, output_path, pattern="_scores_", format="json"
-            )
+
+JSON_SCALARS = ("max_pae", "ptm", "iptm")
 
 
 def json_extract(json_path):
@@ -56,30 +75,11 @@ def json_extract(json_path):
         dict: Dictionary containing mean_plddt, max_pae, ptm, iptm, composite_ptm
     """
     try:
-        with open(json_path, "r") as f:
-            data = json.load(f)
-
-        # Extract pLDDT scores
-        plddt_list = data.get("plddt", [])
-        mean_plddt = sum(plddt_list) / len(plddt_list) if plddt_list else 0.0
-
-        max_pae = data.get("max_pae", 0.0)
-        # Extract confidence metrics
-        ptm = data.get("ptm", 0.0)
-        iptm = data.get("iptm", 0.0)
+        data = read_json_keys(json_path, keys=JSON_SCALARS, arrays=["plddt"])
 
-        # Calculate composite PTM (0.8*iptm + 0.2*ptm)
-        composite_ptm = 0.8 * iptm + 0.2 * ptm
-
-        return {
-            "plddt": round(mean_plddt, 3),
-            "ptm": round(ptm, 3),
-            "iptm": round(iptm, 3),
-            "composite_ptm": round(composite_ptm, 3),
-            "max_pae": round(max_pae, 3),
-        }
+        return _json_scores(data)
 
-    except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
+    except (FileNotFoundError, ValueError, KeyError) as e:
         print(f"Error processing {json_path}: {e}")
         return {
             "plddt": 0.00,
@@ -90,119 +90,220 @@ def json_extract(json_path):
         }
 
 
-def chain_extract(pdb_path):
+INTERFACE_COLUMNS = (
+    "receptor_plddt",
+    "peptide_plddt",
+    "ipae_rec_pep_mean",
+    "ipae_rec_pep_min",
+    "ipae_pep_rec_mean",
+    "ipae_pep_rec_min",
+)
+
+# Metric columns of the metadata, in order
+COLUMNS = ("plddt", "ptm", "iptm", "composite_ptm", "max_pae", *INTERFACE_COLUMNS)
+
+
+def interface_metrics(plddt, pae, chain_lengths):
+    """
+    Receptor/peptide pLDDT and interface PAE for a stack of ranks.
+
+    The receptor is the longer and the peptide the shorter of the first two
+    chains. Interface PAE is taken from the off-diagonal blocks of the PAE
+    matrix: rec_pep is aligned on the receptor and scored on the peptide,
+    pep_rec the other way round.
+
+    Args:
+        plddt (np.ndarray): (n_ranks, n_residues) per-residue pLDDT
+        pae (np.ndarray): (n_ranks, n_residues, n_residues) PAE matrices
+        chain_lengths (list): Residues per chain, in PDB chain order
+
+    Returns:
+        dict: Column name -> (n_ranks,) array
+    """
+    offsets = np.concatenate([[0], np.cumsum(chain_lengths[:2])])
+    first, second = slice(offsets[0], offsets[1]), slice(offsets[1], offsets[2])
+    rec, pep = (first, second) if chain_lengths[0] >= chain_lengths[1] else (second, first)
+
+    rec_pep = pae[:, rec, pep]
+    pep_rec = pae[:, pep, rec]
+    return {
+        "receptor_plddt": plddt[:, rec].mean(axis=1),
+        "peptide_plddt": plddt[:, pep].mean(axis=1),
+        "ipae_rec_pep_mean": rec_pep.mean(axis=(1, 2)),
+        "ipae_rec_pep_min": rec_pep.min(axis=(1, 2)),
+        "ipae_pep_rec_mean": pep_rec.mean(axis=(1, 2)),
+        "ipae_pep_rec_min": pep_rec.min(axis=(1, 2)),
+    }
+
+
+def json_batch_extract(task):
+    """
+    Extract metrics from the score JSONs of every rank of one prediction.
+
+    Scalar metrics are those of json_extract. The pLDDT vectors and PAE
+    matrices of all ranks are stacked so receptor/peptide pLDDT and interface
+    PAE are computed in one vectorized pass.
+
+    Args:
+        task (tuple): (list of JSON paths, chain lengths from the paired PDB)
+
+    Returns:
+        list: One metrics dict per JSON path
     """
-    Extract chain identifiers from a PDB file.
+    json_paths, chain_lengths = task
+    results = []
+    plddts, paes = [], []
+    for json_path in json_paths:
+        try:
+            data = read_json_keys(
+                json_path,
+                keys=JSON_SCALARS,
+                arrays=["plddt", "pae", "predicted_aligned_error"],
+            )
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error processing {json_path}: {e}")
+            data = {}
+        results.append(_json_scores(data))
+        plddts.append(data.get("plddt"))
+        paes.append(data.get("pae", data.get("predicted_aligned_error")))
+
+    for result in results:
+        result.update({column: 0.00 for column in INTERFACE_COLUMNS})
+
+    n_residues = sum(chain_lengths[:2]) if len(chain_lengths) >= 2 else 0
+    valid = [
+        i
+        for i, (plddt, pae) in enumerate(zip(plddts, paes))
+        if n_residues
+        and plddt is not None
+        and pae is not None
+        and plddt.ndim == 1
+        and len(plddt) >= n_residues
+        and pae.shape == (len(plddt), len(plddt))
+    ]
+    if not valid:
+        return results
+
+    plddt = np.array([plddts[i] for i in valid], dtype=np.float64)
+    pae = np.array([paes[i] for i in valid], dtype=np.float64)
+    metrics = interface_metrics(plddt, pae, chain_lengths)
+    for k, i in enumerate(valid):
+        for column, values in metrics.items():
+            results[i][column] = round(float(values[k]), 3)
+    return results
+
+
+def pdb_extract(pdb_path):
+    """
+    Extract chain identifiers and chain lengths from a PDB file.
 
     Args:
         pdb_path (str): Path to the PDB file
 
     Returns:
-        list: List of chain identifiers
+        dict: Dictionary containing chains and chain_lengths (residues per chain)
     """
-    chains = []
     try:
-        with open(pdb_path, "r") as f:
-            for line in f:
-                if line.startswith("ATOM"):
-                    chain_id = line[21]
-                    if chain_id not in chains:
-                        chains.append(chain_id)
-    except FileNotFoundError as e:
+        atoms = read_pdb_atoms(pdb_path)
+    except (FileNotFoundError, ValueError) as e:
         print(f"Error processing {pdb_path}: {e}")
-    return chains
+        return {"chains": "", "chain_lengths": []}
 
+    _, lengths = chain_plddt(atoms)
+    return {"chains": "".join(atoms.chains)[:2], "chain_lengths": lengths.tolist()}
 
-def build_afm_argparser():
-    parser = argparse.ArgumentParser(description="AFMultimer Benchmark Model")
 
-    parser.add_argument(
-        "--path", required=True, type=str, help="Path to download the dataset."
-    )
+def residue_arrays(json_path):
+    """
+    Per-residue pLDDT and PAE matrix of an AlphaFold score JSON.
 
-    parser.add_argument(
-        "--output_dir",
-        required=True,
-        type=str,
-        help="Directory to save the processed dataset.",
-    )
-    return parser
+    Args:
+        json_path (str): Path to the JSON file
 
+    Returns:
+        tuple: (plddt (n,), pae (n, n) or None)
+    """
+    data = read_json_keys(json_path, arrays=["plddt", "pae", "predicted_aligned_error"])
+    return data["plddt"], data.get("pae", data.get("predicted_aligned_error"))
 
-def main_afm(path, output_dir, url):
-    tmp = os.getcwd() + "/tmp"
-    os.makedirs(tmp, exist_ok=True)
-    os.makedirs(output_dir, exist_ok=True)
-    if url:
-        _download(path, tmp)
-        input_dir = os.path.join(tmp, "models/AFMultimer")
-    else:
-        input_dir = os.path.join(path, "AFMultimer")
-    # input_dir = os.path.join(tmp, "models/AFMultimer")
-    name(input_dir, output_dir)
-    json_files = [f for f in os.listdir(output_dir) if f.endswith(".json")]
-    pdb_files = [f for f in os.listdir(output_dir) if f.endswith(".pdb")]
 
-    all_results = []
+def _metrics(json_rows, pdb_rows, staged, workers=1, manifest=None, profiler=None):
+    """
+    Score and chain metrics of a set of predictions.
 
-    for json_file in json_files:
-        json_path = os.path.join(output_dir, json_file)
-        json_name = str(Path(json_file).stem)
+    Args:
+        json_rows (list): (id, rank, staged JSON) of the predictions
+        pdb_rows (list): (id, rank, staged PDB) of the predictions
+        staged (dict): Staged file -> source, as returned by name()
 
-        protein_id = "_".join(json_name.split("_")[:-1])
-        rank = json_name.split("_")[-1]
+    Returns:
+        MetricTable: One row per score JSON, with the chains of its PDB
+    """
+    # Process PDB files for chain information
+    chain_lengths = {}
+    pdb_files = [f for _, _, f in pdb_rows]
+    with stage(profiler, "pdb", "AFMultimer") as record:
+        pdb_metrics = cached_map(pdb_extract, pdb_files, staged, workers, manifest)
+        record["files"] = len(pdb_files)
+    for (protein_id, rank, _), result in zip(pdb_rows, pdb_metrics):
+        # Chain boundaries are shared by every rank of a prediction
+        lengths = result.pop("chain_lengths")
+        if protein_id not in chain_lengths or int(rank) < chain_lengths[protein_id][0]:
+            chain_lengths[protein_id] = (int(rank), lengths)
+
+    # Process score JSONs, batched over the ranks of each prediction. The
+    # chain lengths from the PDB are part of the cache key of each batch
+    batches = {}
+    json_keys = {}
+    for protein_id, rank, json_file in json_rows:
+        batches.setdefault(protein_id, []).append(json_file)
+        json_keys[json_file] = (protein_id, rank)
+
+    with stage(profiler, "json", "AFMultimer") as record:
+        json_metrics = cached_batch_map(
+            json_batch_extract,
+            [
+                (files, chain_lengths.get(protein_id, (0, []))[1])
+                for protein_id, files in batches.items()
+            ],
+            staged,
+            workers,
+            manifest,
+        )
+        record["files"] = len(json_keys)
 
-        result = json_extract(json_path)
-        result.update({"id": protein_id, "rank": rank})
+    table = MetricTable(COLUMNS)
+    for json_file, result in json_metrics:
+        table.set(*json_keys[json_file], result)
+    for (protein_id, rank, _), result in zip(pdb_rows, pdb_metrics):
+        table.set(protein_id, rank, result, create=False)
+    return table
 
-        all_results.append(result)
 
-    # Process PDB files for chain information
-    chain_results = []
-    for pdb_file in pdb_files:
-        pdb_path = os.path.join(output_dir, pdb_file)
-        pdb_name = str(Path(pdb_file).stem)
-
-        protein_id = "_".join(pdb_name.split("_")[:-1])
-        rank = pdb_name.split("_")[-1]
-        chains = chain_extract(pdb_path)
-
-        chain_results.append(
-            {
-                "id": protein_id,
-                "rank": rank,
-                "chains": "".join(chains)[:2],
-            }
-        )
+def build_afm_argparser():
+    return build_adapter_argparser("AFMultimer Benchmark Model")
 
-    dfs = pd.DataFrame(all_results)
-    chain_df = pd.DataFrame(chain_results)
 
-    dfs = pd.merge(dfs, chain_df, on=["id", "rank"], how="left")
+ADAPTER = Adapter(
+    model="AFMultimer",
+    prefix="AFMultimer",
+    index=index_afm,
+    name=name,
+    structure="pdb",
+    metrics=_metrics,
+    columns=COLUMNS,
+    residue_kind="json",
+    residue_arrays=residue_arrays,
+)
 
-    try:
-        main_cols = [
-            "id",
-            "rank",
-            "chains",
-        ]
-        dfs = dfs[main_cols + [c for c in dfs.columns if c not in main_cols]]
-        dfs.sort_values(by=["id", "rank"], inplace=True)
-    except KeyError as e:
-        print(f"Missing expected columns: {e}")
-        print(f"Available columns: {list(dfs.columns)}")
 
-    dfs.to_csv(os.path.join(output_dir, "AFMultimer_metadata.csv"), index=False)
-    shutil.rmtree(tmp)
+def main_afm(path, output_dir, url, **options):
+    """Process the AFMultimer outputs under path; options are those of runner.run_adapter."""
+    run_adapter(ADAPTER, path, output_dir, url, **options)
 
 
 if __name__ == "__main__":
     # repo_url = "https://github.com/pszgaspar/short_peptide_modeling_benchmark.git"
     # output_dir = "./tmp"
     # download(repo_url, output_dir)
-    parser = build_afm_argparser()
-    args = parser.parse_args()
-
-    repo_url = args.path
-    output_dir = args.output_dir
-    main_afm(repo_url, output_dir)
+    adapter_cli(ADAPTER, build_afm_argparser())
@@ -0,0 +1,257 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import shutil
+import subprocess
+import tarfile
+import threading
+import zipfile
+from typing import NamedTuple
+
+from sources import SourceTree
+
+# Suffix and compression of the supported archive formats
+ARCHIVE_SUFFIXES = {
+    ".zip": "zip",
+    ".tar": "tar",
+    ".tar.gz": "gz",
+    ".tgz": "gz",
+    ".tar.xz": "xz",
+    ".txz": "xz",
+    ".tar.bz2": "bz2",
+    ".tbz2": "bz2",
+    ".tar.zst": "zst",
+    ".tzst": "zst",
+}
+
+
+def archive_format(path):
+    """Compression of an archive path (see ARCHIVE_SUFFIXES), or None if it is not one."""
+    name = str(path).lower()
+    for suffix, compression in ARCHIVE_SUFFIXES.items():
+        if name.endswith(suffix):
+            return compression
+    return None
+
+
+def is_archive(path):
+    return archive_format(path) is not None and os.path.isfile(path)
+
+
+class Member(NamedTuple):
+    """
+    A file of a tar or zip archive, streamed from the archive without being extracted.
+
+    Members are picklable, so they can be handed to worker processes as file
+    sources; each process keeps its own open handle on the archive.
+    offset is the position of the data in the (decompressed) tar stream, which
+    gives the order in which members are cheapest to read.
+    """
+
+    archive: str
+    path: str
+    size: int
+    offset: int
+    oid: str
+
+    def __str__(self):
+        return f"{self.archive}:{self.path}"
+
+    def open(self):
+        """Binary file object streaming the member contents."""
+        return _reader(self.archive).open(self)
+
+
+class _ForwardStream(io.RawIOBase):
+    """
+    Seekable view of a forward-only stream.
+
+    Forward seeks read and discard, backward seeks restart the stream, so
+    reads in increasing offset order cost a single pass.
+    """
+
+    def __init__(self, opener):
+        self._opener = opener
+        self._stream = opener()
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def readinto(self, b):
+        n = self._stream.readinto(b)
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Cannot seek from the end of a compressed stream")
+        if offset < self._pos:
+            self._stream.close()
+            self._stream, self._pos = self._opener(), 0
+        while self._pos < offset:
+            skipped = len(self._stream.read(min(offset - self._pos, 1 << 20)))
+            if not skipped:
+                break
+            self._pos += skipped
+        return self._pos
+
+    def close(self):
+        self._stream.close()
+        super().close()
+
+
+class _ZstdPipe(io.RawIOBase):
+    """Decompressed contents of a .zst file, read from the zstd command line tool."""
+
+    def __init__(self, path):
+        self._proc = subprocess.Popen(["zstd", "-dcq", path], stdout=subprocess.PIPE)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self._proc.stdout.readinto(b)
+
+    def close(self):
+        if not self.closed:
+            self._proc.stdout.close()
+            self._proc.kill()
+            self._proc.wait()
+        super().close()
+
+
+def _open_zst(path):
+    if shutil.which("zstd"):
+        return _ZstdPipe(path)
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError(
+            f"Reading {path} requires the zstd command or the zstandard package."
+        ) from None
+    return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+
+
+def _tar_stream(path):
+    """Seekable binary stream of the uncompressed tar data of an archive."""
+    compression = archive_format(path)
+    if compression == "tar":
+        return open(path, "rb")
+    if compression == "gz":
+        return gzip.open(path, "rb")
+    if compression == "xz":
+        return lzma.open(path, "rb")
+    if compression == "bz2":
+        return bz2.open(path, "rb")
+    if compression == "zst":
+        return io.BufferedReader(_ForwardStream(lambda: _open_zst(path)), 1 << 20)
+    raise ValueError(f"{path} is not a tar archive")
+
+
+class _MemberReader(io.RawIOBase):
+    """Reads size bytes of a shared archive stream, starting at its current position."""
+
+    def __init__(self, stream, size):
+        self._stream = stream
+        self._left = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._left <= 0:
+            return 0
+        n = self._stream.readinto(memoryview(b)[: min(len(b), self._left)])
+        if not n:
+            raise EOFError("Archive ended before the end of the member")
+        self._left -= n
+        return n
+
+
+class _TarReader:
+    """One open tar stream serving member reads of an archive."""
+
+    def __init__(self, path):
+        self._stream = _tar_stream(path)
+
+    def open(self, member):
+        # Only one member can be in flight: opening the next one moves the stream
+        self._stream.seek(member.offset)
+        return io.BufferedReader(_MemberReader(self._stream, member.size))
+
+    def close(self):
+        self._stream.close()
+
+
+class _ZipReader:
+    """One open ZipFile serving member reads of an archive."""
+
+    def __init__(self, path):
+        self._zip = zipfile.ZipFile(path)
+
+    def open(self, member):
+        return self._zip.open(member.path)
+
+    def close(self):
+        self._zip.close()
+
+
+_READERS = {}
+
+
+def _reader(path):
+    # Keyed on pid and thread like the git cat-file processes: file offsets
+    # must not be shared between forked workers or concurrent pipelines
+    key = (os.getpid(), threading.get_ident(), path)
+    if key not in _READERS:
+        _READERS[key] = (_ZipReader if archive_format(path) == "zip" else _TarReader)(path)
+    return _READERS[key]
+
+
+class ArchiveTree(SourceTree):
+    """
+    Directory view of a tar or zip archive, listed once from its headers.
+
+    Paths are member names without any leading "./" and resolve to Members.
+    Nothing is extracted: members are streamed from the archive when the
+    parsers open them. Compressed tars are decompressed on the fly; the zstd
+    command line tool is used for .tar.zst when it is installed, the
+    zstandard package otherwise.
+
+    Args:
+        path (str): Archive path, one of ARCHIVE_SUFFIXES
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = os.path.abspath(path)
+        if archive_format(path) == "zip":
+            with zipfile.ZipFile(self.path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir():
+                        oid = f"zip:{info.CRC:08x}:{info.file_size}"
+                        self._add_member(info.filename, info.file_size, 0, oid)
+        else:
+            with _tar_stream(self.path) as stream, tarfile.open(fileobj=stream, mode="r:") as archive:
+                for info in archive:
+                    if info.isreg() and not info.issparse():
+                        oid = f"tar:{info.mtime}:{info.size}"
+                        self._add_member(info.name, info.size, info.offset_data, oid)
+
+    def __str__(self):
+        return self.path
+
+    def _add_member(self, name, size, offset, oid):
+        path = self._key(name)
+        self._add(path, Member(self.path, name, size, offset, oid))
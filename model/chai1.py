@@ -1,48 +1,45 @@
-import shutil
-import json
-import subprocess
-import os, re
-import pandas as pd
-import argparse
+import os
 from pathlib import Path
 import sys
 
 parent_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(parent_dir))
-from utils import _process_file_chai1, _download
-
-
-def name(input_path, output_path):
+from utils import _stage_files
+from manifest import cached_map
+from structure import read_cif_atoms, peptide_receptor_plddt, residue_plddt
+from jsonstream import read_json_keys
+from layouts import index_chai1
+from profiling import stage
+from metadata import MetricTable
+from runner import Adapter, adapter_cli, build_adapter_argparser, run_adapter
+
+
+def name(
+    input_path,
+    output_path,
+    workers=1,
+    link_mode="auto",
+    archive=None,
+    manifest=None,
+    tree=None,
+    index=None,
+):
     """
     Rename and copy PDB and JSON files with new naming convention.
 
+    index is the InputIndex of input_path, scanned here if not given.
     """
-    os.makedirs(output_path, exist_ok=True)
-
-    # Get all subdirectories
-    subdirs = [
-        d for d in os.listdir(input_path) if os.path.isdir(os.path.join(input_path, d))
-    ]
-
-    for subdir in subdirs:
-        id = Path(subdir).name
-        src_dir = os.path.join(input_path, subdir)
-
-        # Process all files in the subdirectory
-        for filename in os.listdir(src_dir):
-            file_path = os.path.join(src_dir, filename)
-
-            # Skip directories
-            if os.path.isdir(file_path):
-                continue
-            
-            # Process the file
-            _process_file_chai1(
-                id, file_path, filename, output_path, pattern=".rank_", format="cif"
-            )
-            _process_file_chai1(
-                id, file_path, filename, output_path, pattern=".rank_", format="json"
-            )
+    if archive is None:
+        os.makedirs(output_path, exist_ok=True)
+    if index is None:
+        index = index_chai1(input_path, tree)
+    return _stage_files(index.pairs(output_path), workers, link_mode, archive, manifest)
+
+
+JSON_SCALARS = ("ptm", "iptm", "aggregate_score")
+
+# Metric columns of the metadata, in order; the pLDDT columns come from the CIF
+COLUMNS = ("ptm", "iptm", "composite_ptm", "plddt", "receptor_plddt", "peptide_plddt")
 
 
 def json_extract(json_path):
@@ -56,8 +53,7 @@ def json_extract(json_path):
         dict: Dictionary containing mean_plddt, max_pae, ptm, iptm, composite_ptm
     """
     try:
-        with open(json_path, "r") as f:
-            data = json.load(f)
+        data = read_json_keys(json_path, keys=JSON_SCALARS)
 
         # Extract pLDDT scores
         # plddt_list = data.get("plddt", [])
@@ -77,7 +73,7 @@ def json_extract(json_path):
             "composite_ptm": round(composite_ptm, 3),
         }
 
-    except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
+    except (FileNotFoundError, ValueError, KeyError) as e:
         print(f"Error processing {json_path}: {e}")
         return {
             "ptm": 0.00,
@@ -85,178 +81,99 @@ def json_extract(json_path):
             "composite_ptm": 0.00,
         }
 
-def plddt_cif_extract(cif_path):
+def cif_extract(cif_path):
     """
-    Extract mean pLDDT (B-factor) from CIF file without BioPython.
+    Extract mean, receptor and peptide pLDDT plus chain identifiers from a CIF
+    file in a single pass over its _atom_site loop.
 
     Args:
         cif_path (str): Path to the CIF file
 
     Returns:
-        float: Mean pLDDT value
+        dict: Dictionary containing chains, plddt, receptor_plddt, peptide_plddt
     """
-    b_factors = []
     try:
-        with open(cif_path, "r") as f:
-            lines = f.readlines()
-
-        # Find atom_site loop
-        in_loop = False
-        columns = []
-        b_index = None
-        for i, line in enumerate(lines):
-            if line.strip().startswith("loop_"):
-                # Check if next lines are atom_site columns
-                in_loop = True
-                columns = []
-                b_index = None
-                continue
-            if in_loop and line.strip().startswith("_atom_site."):
-                columns.append(line.strip())
-                if line.strip() in ["_atom_site.B_iso_or_equiv", "_atom_site.pLDDT"]:
-                    b_index = len(columns) - 1
-                continue
-            # End of columns, start of data
-            if in_loop and columns and not line.strip().startswith("_atom_site."):
-                if b_index is None:
-                    # No B-factor column found
-                    break
-                # Parse data rows
-                while i < len(lines):
-                    row = lines[i].strip()
-                    if not row or row.startswith("#") or row.startswith("loop_") or row.startswith("_"):
-                        break
-                    fields = row.split()
-                    if len(fields) > b_index:
-                        try:
-                            b_factors.append(float(fields[b_index]))
-                        except ValueError:
-                            pass
-                    i += 1
-                break
+        atoms = read_cif_atoms(cif_path)
     except Exception as e:
-        print(f"Error reading CIF file for pLDDT: {e}")
-        return 0.0
+        print(f"Error reading CIF file: {e}")
+        return {
+            "chains": "",
+            "plddt": 0.00,
+            "receptor_plddt": 0.00,
+            "peptide_plddt": 0.00,
+        }
 
-    if b_factors:
-        return sum(b_factors) / len(b_factors)
-    else:
-        return 0.0
+    plddt = float(atoms.b_factors.mean()) if len(atoms.b_factors) else 0.0
+    result = {"chains": "".join(atoms.chains)[:2], "plddt": round(plddt, 3)}
+    result.update(peptide_receptor_plddt(atoms))
+    return result
 
-def chain_extract(cif_path):
-    """
-    More robust version using regex to extract chain information
+def residue_arrays(cif_path):
     """
-    
-    chains = []
-    
-    try:
-        with open(cif_path, 'r') as file:
-            content = file.read()
-            
-        # Use regex to find entity details patterns
-        pattern = r"^\d+\s+polymer\s+man\s+'Entity\s+([A-Z])'"
-        matches = re.findall(pattern, content, re.MULTILINE)
-        
-        chains = matches
-        
-    except Exception as e:
-        print(f"Error reading CIF file: {e}")
-        return []
-    
-    return chains
+    Per-residue pLDDT of a CIF file (mean B-factor of each residue).
 
-def build_chai1_argparser():
-    parser = argparse.ArgumentParser(description="Chai-1 Benchmark Model")
+    Args:
+        cif_path (str): Path to the CIF file
 
-    parser.add_argument(
-        "--path", required=True, type=str, help="Path to download the dataset."
-    )
+    Returns:
+        tuple: (plddt (n,), None)
+    """
+    return residue_plddt(read_cif_atoms(cif_path))[0], None
 
-    parser.add_argument(
-        "--output_dir",
-        required=True,
-        type=str,
-        help="Directory to save the processed dataset.",
-    )
-    return parser
 
+def _metrics(json_rows, cif_rows, staged, workers=1, manifest=None, profiler=None):
+    """
+    Score and structure metrics of a set of predictions.
 
-def main_chai1(path, output_dir, url):
-    tmp = os.getcwd() + "/tmp"
-    os.makedirs(tmp, exist_ok=True)
-    os.makedirs(output_dir, exist_ok=True)
-    if url:
-        _download(path, tmp, folder_path="models/Chai-1")
-        input_dir = os.path.join(tmp, "models/Chai-1")
-    else:
-        input_dir = os.path.join(path, "Chai-1")
-    # input_dir = os.path.join(tmp, "models/Chai-1")
-    name(input_dir, output_dir)
-    json_files = [f for f in os.listdir(output_dir) if f.endswith(".json")]
-    cif_files = [f for f in os.listdir(output_dir) if f.endswith(".cif")]
+    Args:
+        json_rows (list): (id, rank, staged JSON) of the predictions
+        cif_rows (list): (id, rank, staged CIF) of the predictions
+        staged (dict): Staged file -> source, as returned by name()
 
-    all_results = []
+    Returns:
+        MetricTable: One row per score JSON, with the metrics of its CIF
+    """
+    json_files = [f for _, _, f in json_rows]
+    with stage(profiler, "json", "Chai-1") as record:
+        json_metrics = cached_map(json_extract, json_files, staged, workers, manifest)
+        record["files"] = len(json_files)
+
+    table = MetricTable(COLUMNS)
+    for (protein_id, rank, _), result in zip(json_rows, json_metrics):
+        table.set(protein_id, rank, result)
 
-    for json_file in json_files:
-        json_path = os.path.join(output_dir, json_file)
-        json_name = str(Path(json_file).stem)
+    # Process CIF files for chain information
+    cif_files = [f for _, _, f in cif_rows]
+    with stage(profiler, "cif", "Chai-1") as record:
+        cif_metrics = cached_map(cif_extract, cif_files, staged, workers, manifest)
+        record["files"] = len(cif_files)
+    for (protein_id, rank, _), result in zip(cif_rows, cif_metrics):
+        table.set(protein_id, rank, result, create=False)
+    return table
 
-        protein_id = "_".join(json_name.split("_")[:-1])
-        rank = json_name.split("_")[-1]
 
-        result = json_extract(json_path)
-        result.update({"id": protein_id, "rank": rank})
+def build_chai1_argparser():
+    return build_adapter_argparser("Chai-1 Benchmark Model")
 
-        all_results.append(result)
 
-    # Process CIF files for chain information
-    chain_results = []
-    for cif_file in cif_files:
-        cif_path = os.path.join(output_dir, cif_file)
-        plddt = plddt_cif_extract(cif_path)
-        plddt = round(plddt, 3)
-        cif_name = str(Path(cif_file).stem)
-
-        protein_id = "_".join(cif_name.split("_")[:-1])
-        rank = cif_name.split("_")[-1]
-        chains = chain_extract(cif_path)
-
-        chain_results.append(
-            {
-                "id": protein_id,
-                "rank": rank,
-                "chains": "".join(chains)[:2],
-                "plddt": plddt,
-            }
-        )
-
-    dfs = pd.DataFrame(all_results)
-    chain_df = pd.DataFrame(chain_results)
-
-    dfs = pd.merge(dfs, chain_df, on=["id", "rank"], how="left")
+ADAPTER = Adapter(
+    model="Chai-1",
+    prefix="Chai1",
+    index=index_chai1,
+    name=name,
+    structure="cif",
+    metrics=_metrics,
+    columns=COLUMNS,
+    residue_kind="cif",
+    residue_arrays=residue_arrays,
+)
 
-    try:
-        main_cols = [
-            "id",
-            "rank",
-            "chains",
-        ]
-        dfs = dfs[main_cols + [c for c in dfs.columns if c not in main_cols]]
-        dfs.sort_values(by=["id", "rank"], inplace=True)
-    except KeyError as e:
-        print(f"Missing expected columns: {e}")
-        print(f"Available columns: {list(dfs.columns)}")
 
-    dfs.to_csv(os.path.join(output_dir, "Chai1_metadata.csv"), index=False)
-    shutil.rmtree(tmp)
+def main_chai1(path, output_dir, url, **options):
+    """Process the Chai-1 outputs under path; options are those of runner.run_adapter."""
+    run_adapter(ADAPTER, path, output_dir, url, **options)
 
 
 if __name__ == "__main__":
-    parser = build_chai1_argparser()
-    args = parser.parse_args()
-    main_chai1(args.path, args.output_dir)
+    adapter_cli(ADAPTER, build_chai1_argparser())
     # python model/chai1.py --path https://github.com/pszgaspar/short_peptide_modeling_benchmark.git --output_dir data/processed/Chai-1
-    # cif_path = "data/Chai-1/Beta_endorphin-mu_opioid_1.cif"
-    # plddt_score = plddt_cif_extract(cif_path)
-    # print(f"Mean pLDDT from CIF: {plddt_score}")
\ No newline at end of file
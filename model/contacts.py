@@ -0,0 +1,154 @@
+import numpy as np
+
+# Neighbouring cell offsets, the cell itself included
+_OFFSETS = np.array(
+    [(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)], dtype=np.int64
+)
+
+
+def brute_force_pairs(a, b, cutoff):
+    """
+    Index pairs (i, j) of points closer than cutoff, from all N x M distances.
+
+    The reference for contact_pairs. Distances are computed over blocks of a,
+    so memory stays bounded, but time grows with N * M.
+
+    Args:
+        a (np.ndarray): (n, 3) points
+        b (np.ndarray): (m, 3) points
+        cutoff (float): Distance cutoff
+
+    Returns:
+        tuple: (i, j) index arrays into a and b, sorted by i then j
+    """
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    rows, cols = [np.zeros(0, dtype=np.intp)], [np.zeros(0, dtype=np.intp)]
+    step = max(1, (1 << 20) // max(1, len(b)))
+    for start in range(0, len(a), step):
+        d2 = ((a[start : start + step, None, :] - b[None, :, :]) ** 2).sum(axis=-1)
+        i, j = np.nonzero(d2 < cutoff * cutoff)
+        rows.append(i + start)
+        cols.append(j)
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+def contact_pairs(a, b, cutoff):
+    """
+    Index pairs (i, j) of points closer than cutoff, found with a cell list.
+
+    b is binned into cubic cells of side cutoff, so every neighbour of a
+    point of a lies in one of the 27 cells around it. Only the points of a
+    within cutoff of the bounding box of b are queried, and only the pairs
+    sharing neighbouring cells are measured, which makes the cost grow with
+    the number of close pairs rather than with N * M. Everything is
+    vectorized: cell lookups are a searchsorted into the sorted cell keys of
+    b and candidate pairs are expanded from cell ranges in one pass.
+
+    Args:
+        a (np.ndarray): (n, 3) points
+        b (np.ndarray): (m, 3) points
+        cutoff (float): Distance cutoff, > 0
+
+    Returns:
+        tuple: (i, j) index arrays into a and b, sorted by i then j
+    """
+    if cutoff <= 0:
+        raise ValueError(f"Contact cutoff must be positive: {cutoff}")
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    empty = (np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp))
+    if not len(a) or not len(b):
+        return empty
+
+    # Points of a that can reach b at all
+    low, high = b.min(axis=0) - cutoff, b.max(axis=0) + cutoff
+    query = np.flatnonzero(((a >= low) & (a <= high)).all(axis=1))
+    if not len(query):
+        return empty
+
+    # Cell coordinates, padded by one cell so that neighbours stay in range
+    cells_b = np.floor((b - low) / cutoff).astype(np.int64) + 1
+    cells_a = np.floor((a[query] - low) / cutoff).astype(np.int64) + 1
+    shape = np.maximum(cells_b.max(axis=0), cells_a.max(axis=0)) + 2
+
+    def key(cells):
+        return (cells[..., 0] * shape[1] + cells[..., 1]) * shape[2] + cells[..., 2]
+
+    order = np.argsort(key(cells_b), kind="stable")
+    keys, starts, counts = np.unique(key(cells_b)[order], return_index=True, return_counts=True)
+
+    # Cell ranges of b around every query point
+    neighbours = key(cells_a[:, None, :] + _OFFSETS[None, :, :]).ravel()
+    slot = np.minimum(np.searchsorted(keys, neighbours), len(keys) - 1)
+    found = keys[slot] == neighbours
+    owner = np.repeat(query, len(_OFFSETS))[found]
+    first, size = starts[slot[found]], counts[slot[found]]
+
+    # Expand every range into candidate pairs
+    total = size.sum()
+    pair_a = np.repeat(owner, size)
+    within = np.arange(total) - np.repeat(np.cumsum(size) - size, size)
+    pair_b = order[np.repeat(first, size) + within]
+
+    d2 = ((a[pair_a] - b[pair_b]) ** 2).sum(axis=1)
+    close = d2 < cutoff * cutoff
+    pair_a, pair_b = pair_a[close], pair_b[close]
+    sort = np.lexsort((pair_b, pair_a))
+    return pair_a[sort], pair_b[sort]
+
+
+def _chain_atoms(atoms, chain, heavy):
+    rows = np.flatnonzero(atoms.chain_index == chain)
+    if heavy and atoms.atom_names is not None:
+        names = np.char.lstrip(atoms.atom_names[rows].astype(str), "0123456789")
+        rows = rows[~np.char.startswith(names, "H")]
+    return rows
+
+
+def atom_contacts(atoms, chain_a=0, chain_b=1, cutoff=5.0, heavy=True):
+    """
+    Atom pairs between two chains of a structure closer than cutoff.
+
+    Args:
+        atoms (Atoms): Structure with coordinates
+        chain_a (int): Index into atoms.chains, e.g. the receptor
+        chain_b (int): Index into atoms.chains, e.g. the peptide
+        cutoff (float): Distance cutoff in Angstrom
+        heavy (bool): Ignore hydrogens
+
+    Returns:
+        tuple: (i, j) atom rows of chain_a and chain_b
+    """
+    rows_a = _chain_atoms(atoms, chain_a, heavy)
+    rows_b = _chain_atoms(atoms, chain_b, heavy)
+    i, j = contact_pairs(atoms.coords[rows_a], atoms.coords[rows_b], cutoff)
+    return rows_a[i], rows_b[j]
+
+
+def interface_residues(atoms, chain_a=0, chain_b=1, cutoff=5.0, heavy=True):
+    """
+    Residues of each chain with an atom within cutoff of the other chain.
+
+    Returns:
+        tuple: Sorted atoms.residue_index values of chain_a and of chain_b
+    """
+    i, j = atom_contacts(atoms, chain_a, chain_b, cutoff, heavy)
+    return np.unique(atoms.residue_index[i]), np.unique(atoms.residue_index[j])
+
+
+def contact_map(atoms, chain_a=0, chain_b=1, cutoff=5.0, heavy=True):
+    """
+    Residue contact map between two chains.
+
+    Returns:
+        np.ndarray: (residues of chain_a, residues of chain_b) boolean map, in
+        residue order within each chain
+    """
+    i, j = atom_contacts(atoms, chain_a, chain_b, cutoff, heavy)
+    residues_a = np.unique(atoms.residue_index[atoms.chain_index == chain_a])
+    residues_b = np.unique(atoms.residue_index[atoms.chain_index == chain_b])
+    contacts = np.zeros((len(residues_a), len(residues_b)), dtype=bool)
+    contacts[
+        np.searchsorted(residues_a, atoms.residue_index[i]),
+        np.searchsorted(residues_b, atoms.residue_index[j]),
+    ] = True
+    return contacts
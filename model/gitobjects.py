@@ -0,0 +1,204 @@
+import atexit
+import io
+import os
+import subprocess
+import threading
+from typing import NamedTuple
+
+from sources import SourceTree
+
+
+class Blob(NamedTuple):
+    """
+    A file of a git tree, read from the object store instead of a checkout.
+
+    Blobs are picklable, so they can be handed to worker processes as file
+    sources; each process streams their contents through its own
+    long-lived git cat-file --batch.
+    """
+
+    repo: str
+    oid: str
+    size: int
+    path: str
+
+    def __str__(self):
+        return f"{self.path}@{self.oid[:12]}"
+
+    def open(self):
+        """Binary file object streaming the blob contents."""
+        return _cat_file(self.repo).open(self)
+
+
+class _BlobReader(io.RawIOBase):
+    """Reads exactly one blob from a cat-file --batch stdout, then its trailing newline."""
+
+    def __init__(self, stdout, size):
+        self._stdout = stdout
+        self._left = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._left <= 0:
+            return 0
+        n = self._stdout.readinto(memoryview(b)[: min(len(b), self._left)])
+        if not n:
+            raise EOFError("git cat-file output ended early")
+        self._left -= n
+        return n
+
+    def close(self):
+        if not self.closed:
+            while self._left > 0:
+                self._left -= len(self._stdout.read(min(self._left, 1 << 20)))
+            self._stdout.read(1)
+        super().close()
+
+
+class _CatFile:
+    """One git cat-file --batch process serving blob reads of a repository."""
+
+    def __init__(self, repo):
+        self.proc = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=repo,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self._reader = None
+
+    def open(self, blob):
+        if self._reader is not None:
+            # Only one blob can be in flight; finish the previous one
+            self._reader.close()
+        self.proc.stdin.write(f"{blob.oid}\n".encode())
+        self.proc.stdin.flush()
+        header = self.proc.stdout.readline().split()
+        if len(header) != 3 or header[1] != b"blob":
+            raise FileNotFoundError(f"Blob {blob} is missing from {blob.repo}")
+        self._reader = _BlobReader(self.proc.stdout, int(header[2]))
+        return io.BufferedReader(self._reader)
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+        self.proc.stdin.close()
+        self.proc.wait()
+
+
+_CAT_FILES = {}
+
+
+def _cat_file(repo):
+    # Keyed on pid and thread: forked workers must not share their parent's
+    # pipes, and concurrent pipelines must not interleave requests
+    key = (os.getpid(), threading.get_ident(), repo)
+    if key not in _CAT_FILES:
+        _CAT_FILES[key] = _CatFile(repo)
+    return _CAT_FILES[key]
+
+
+@atexit.register
+def _close_cat_files():
+    for (pid, _, _), cat_file in list(_CAT_FILES.items()):
+        if pid == os.getpid():
+            cat_file.close()
+
+
+class GitTree(SourceTree):
+    """
+    Directory view of a git tree, listed once with git ls-tree.
+
+    Paths are relative to the repository root and resolve to Blobs. In a partial clone
+    the blobs missing from the listed folder are fetched in a single request
+    up front, rather than one request per object on first read.
+
+    Args:
+        repo (str): Repository (bare or not) holding the objects
+        rev (str): Revision to read
+        prefix (str): Only list this folder (e.g. models/AFMultimer)
+    """
+
+    def __init__(self, repo, rev="HEAD", prefix=""):
+        super().__init__()
+        self.repo = str(repo)
+        self.rev = rev
+        self.prefix = prefix
+        # No -l: object sizes of missing blobs would be fetched one by one
+        out = self._git("ls-tree", "-r", "-z", "--full-tree", rev, "--", prefix or ".")
+        oids = {}
+        for record in out.split(b"\0"):
+            if not record:
+                continue
+            meta, path = record.split(b"\t", 1)
+            _, kind, oid = meta.split()
+            if kind != b"blob":
+                continue
+            oids[path.decode()] = oid.decode()
+
+        self._prefetch(set(oids.values()))
+        sizes = {}
+        out = self._git(
+            "cat-file",
+            "--batch-check=%(objectname) %(objectsize)",
+            input="".join(f"{oid}\n" for oid in set(oids.values())).encode(),
+        )
+        for line in out.decode().splitlines():
+            oid, size = line.split()[:2]
+            sizes[oid] = int(size) if size.isdigit() else 0
+        for path, oid in oids.items():
+            self._add(path, Blob(self.repo, oid, sizes.get(oid, 0), path))
+
+    def __str__(self):
+        return f"{self.repo}@{self.rev}"
+
+    def _git(self, *args, input=None):
+        return subprocess.run(
+            ["git", *args], cwd=self.repo, input=input, check=True, stdout=subprocess.PIPE
+        ).stdout
+
+    def _prefetch(self, wanted):
+        missing = self._git(
+            "rev-list", "--objects", "--missing=print", self.rev, "--", self.prefix or "."
+        ).decode()
+        oids = [line[1:] for line in missing.splitlines() if line.startswith("?")]
+        oids = [oid for oid in oids if oid in wanted]
+        if oids:
+            self._git(
+                "-c",
+                "fetch.negotiationAlgorithm=noop",
+                "fetch",
+                "origin",
+                "--no-tags",
+                "--no-write-fetch-head",
+                "--recurse-submodules=no",
+                "--filter=blob:none",
+                "--stdin",
+                input="".join(f"{oid}\n" for oid in oids).encode(),
+            )
+
+
+def open_tree(path, folder, url=False, mirror=None):
+    """
+    GitTree of one folder of the dataset repository.
+
+    Args:
+        path (str): Repository URL, or path of a local repository
+        folder (str): Folder to list, e.g. models/AFMultimer
+        url (bool): path is a URL, read through the mirror cache
+        mirror (RepoMirror): Mirror cache, required for URLs
+
+    Returns:
+        GitTree: Tree of folder at HEAD
+    """
+    if url:
+        if mirror is None:
+            raise ValueError(
+                "Reading git objects of a remote repository requires the mirror cache (--repo_cache)."
+            )
+        repo = mirror.update(path)
+    else:
+        repo = path
+    return GitTree(repo, prefix=folder)
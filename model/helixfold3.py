@@ -1,39 +1,56 @@
-import shutil
-import json
-import subprocess
-import os, re
-import pandas as pd
-import argparse
+import os
 from pathlib import Path
 import sys
 
 parent_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(parent_dir))
-from utils import _process_file_helixfold3, _download
-
-
-def name(input_path, output_path):
-    """Process HelixFold3 results directory structure"""
-    os.makedirs(output_path, exist_ok=True)
-    
-    # Get all main result directories (helixfold3_result_to_download_*)
-    main_dirs = [
-        d for d in os.listdir(input_path) 
-        if os.path.isdir(os.path.join(input_path, d)) and d.startswith("helixfold3_result")
-    ]
-    
-    for main_dir in main_dirs:
-        main_dir_path = os.path.join(input_path, main_dir)
-        
-        # Get all job subdirectories within the main directory
-        job_dirs = [
-            d for d in os.listdir(main_dir_path)
-            if os.path.isdir(os.path.join(main_dir_path, d)) and d.startswith("job-")
-        ]
-        
-        for job_dir in job_dirs:
-            job_dir_path = os.path.join(main_dir_path, job_dir)
-            _process_file_helixfold3(input_path, job_dir_path, output_path)
+from utils import _stage_files
+from manifest import cached_map
+from jsonstream import read_json_keys
+from layouts import index_helixfold3
+from profiling import stage
+from metadata import MetricTable
+from runner import Adapter, adapter_cli, build_adapter_argparser, run_adapter
+from structure import cif_chains, read_cif_atoms, residue_plddt
+
+
+def name(
+    input_path,
+    output_path,
+    workers=1,
+    link_mode="auto",
+    archive=None,
+    manifest=None,
+    tree=None,
+    index=None,
+):
+    """
+    Process HelixFold3 results directory structure.
+
+    index is the InputIndex of input_path, scanned here if not given.
+
+    Returns:
+        dict: Staged destination path -> source path
+    """
+    if archive is None:
+        os.makedirs(output_path, exist_ok=True)
+    if index is None:
+        index = index_helixfold3(input_path, tree)
+    return _stage_files(index.pairs(output_path), workers, link_mode, archive, manifest)
+
+
+JSON_SCALARS = (
+    "mean_plddt",
+    "global_pae",
+    "global_pae_min",
+    "ptm",
+    "iptm",
+    "ranking_confidence",
+)
+
+# Metric columns of the metadata, in order
+COLUMNS = ("plddt", "ptm", "iptm", "composite_ptm", "global_pae", "global_pae_min")
+
 
 def json_extract(json_path):
     """
@@ -46,8 +63,7 @@ def json_extract(json_path):
         dict: Dictionary containing mean_plddt, max_pae, ptm, iptm, composite_ptm
     """
     try:
-        with open(json_path, "r") as f:
-            data = json.load(f)
+        data = read_json_keys(json_path, keys=JSON_SCALARS)
 
         # Extract pLDDT scores
         mean_plddt = data.get("mean_plddt", 0.0)
@@ -70,7 +86,7 @@ def json_extract(json_path):
             "global_pae_min": round(global_pae_min, 3),
         }
 
-    except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
+    except (FileNotFoundError, ValueError, KeyError) as e:
         print(f"Error processing {json_path}: {e}")
         return {
             "plddt": 0.00,
@@ -82,115 +98,87 @@ def json_extract(json_path):
         }
 
 
-def chain_extract(cif_path):
+def cif_extract(cif_path):
     """
-    Extract chain IDs from CIF file using _entity_poly section with regex
+    Extract chain identifiers from a CIF file.
+
+    Returns:
+        dict: Dictionary containing chains
     """
-    
-    chains = []
-    
     try:
-        with open(cif_path, 'r') as file:
-            content = file.read()
-            
-        # Use regex to find lines in _entity_poly section
-        # Pattern matches: number + chain_id + polypeptide(L)
-        pattern = r'^\d+\s+([A-Z])\s+polypeptide\(L\)'
-        matches = re.findall(pattern, content, re.MULTILINE)
-        
-        chains = matches
-        
-    except Exception as e:
+        # Only the first two chains go into the metadata
+        chains = cif_chains(cif_path, max_chains=2)
+    except (OSError, ValueError) as e:
         print(f"Error reading CIF file: {e}")
-        return []
-    
-    return chains
-
-def build_helixfold3_argparser():
-    parser = argparse.ArgumentParser(description="HelixFold3 Benchmark Model")
-
-    parser.add_argument(
-        "--path", required=True, type=str, help="Path to download the dataset."
-    )
+        chains = []
+    return {"chains": "".join(chains)[:2]}
 
-    parser.add_argument(
-        "--output_dir",
-        required=True,
-        type=str,
-        help="Directory to save the processed dataset.",
-    )
-    return parser
+def residue_arrays(cif_path):
+    """
+    Per-residue pLDDT of a CIF file (mean B-factor of each residue).
 
+    Args:
+        cif_path (str): Path to the CIF file
 
-def main_helixfold3(path, output_dir, url):
-    tmp = os.getcwd() + "/tmp"
-    os.makedirs(tmp, exist_ok=True)
-    os.makedirs(output_dir, exist_ok=True)
-    if url:
-        _download(path, tmp, folder_path="models/HelixFold3")
-        input_dir = os.path.join(tmp, "models/HelixFold3")
-    else:
-        input_dir = os.path.join(path, "HelixFold3")
-    # input_dir = os.path.join(tmp, "models/HelixFold3")
-    name(input_dir, output_dir)
-    json_files = [f for f in os.listdir(output_dir) if f.endswith(".json")]
-    cif_files = [f for f in os.listdir(output_dir) if f.endswith(".cif")]
+    Returns:
+        tuple: (plddt (n,), None)
+    """
+    return residue_plddt(read_cif_atoms(cif_path))[0], None
 
-    all_results = []
 
-    for json_file in json_files:
-        json_path = os.path.join(output_dir, json_file)
-        json_name = str(Path(json_file).stem)
+def _metrics(json_rows, cif_rows, staged, workers=1, manifest=None, profiler=None):
+    """
+    Score and structure metrics of a set of predictions.
 
-        protein_id = "_".join(json_name.split("_")[:-1])
-        rank = json_name.split("_")[-1]
+    Args:
+        json_rows (list): (id, rank, staged JSON) of the predictions
+        cif_rows (list): (id, rank, staged CIF) of the predictions
+        staged (dict): Staged file -> source, as returned by name()
 
-        result = json_extract(json_path)
-        result.update({"id": protein_id, "rank": rank})
+    Returns:
+        MetricTable: One row per score JSON, with the metrics of its CIF
+    """
+    json_files = [f for _, _, f in json_rows]
+    with stage(profiler, "json", "HelixFold3") as record:
+        json_metrics = cached_map(json_extract, json_files, staged, workers, manifest)
+        record["files"] = len(json_files)
 
-        all_results.append(result)
+    table = MetricTable(COLUMNS)
+    for (protein_id, rank, _), result in zip(json_rows, json_metrics):
+        table.set(protein_id, rank, result)
 
     # Process CIF files for chain information
-    chain_results = []
-    for cif_file in cif_files:
-        cif_path = os.path.join(output_dir, cif_file)
-        cif_name = str(Path(cif_file).stem)
+    cif_files = [f for _, _, f in cif_rows]
+    with stage(profiler, "cif", "HelixFold3") as record:
+        cif_metrics = cached_map(cif_extract, cif_files, staged, workers, manifest)
+        record["files"] = len(cif_files)
+    for (protein_id, rank, _), result in zip(cif_rows, cif_metrics):
+        table.set(protein_id, rank, result, create=False)
+    return table
 
-        protein_id = "_".join(cif_name.split("_")[:-1])
-        rank = cif_name.split("_")[-1]
-        chains = chain_extract(cif_path)
 
-        chain_results.append(
-            {
-                "id": protein_id,
-                "rank": rank,
-                "chains": "".join(chains)[:2],
-            }
-        )
+def build_helixfold3_argparser():
+    return build_adapter_argparser("HelixFold3 Benchmark Model")
 
-    dfs = pd.DataFrame(all_results)
-    chain_df = pd.DataFrame(chain_results)
 
-    dfs = pd.merge(dfs, chain_df, on=["id", "rank"], how="left")
+ADAPTER = Adapter(
+    model="HelixFold3",
+    prefix="HelixFold3",
+    index=index_helixfold3,
+    name=name,
+    structure="cif",
+    metrics=_metrics,
+    columns=COLUMNS,
+    residue_kind="cif",
+    residue_arrays=residue_arrays,
+)
 
-    try:
-        main_cols = [
-            "id",
-            "rank",
-            "chains",
-        ]
-        dfs = dfs[main_cols + [c for c in dfs.columns if c not in main_cols]]
-        dfs.sort_values(by=["id", "rank"], inplace=True)
-    except KeyError as e:
-        print(f"Missing expected columns: {e}")
-        print(f"Available columns: {list(dfs.columns)}")
 
-    dfs.to_csv(os.path.join(output_dir, "HelixFold3_metadata.csv"), index=False)
-    shutil.rmtree(tmp)
+def main_helixfold3(path, output_dir, url, **options):
+    """Process the HelixFold3 outputs under path; options are those of runner.run_adapter."""
+    run_adapter(ADAPTER, path, output_dir, url, **options)
 
 
 if __name__ == "__main__":
-    parser = build_helixfold3_argparser()
-    args = parser.parse_args()
-    main_helixfold3(args.path, args.output_dir)
+    adapter_cli(ADAPTER, build_helixfold3_argparser())
     # python model/helixfold3.py --path https://github.com/pszgaspar/short_peptide_modeling_benchmark.git --output_dir data/processed/HelixFold3
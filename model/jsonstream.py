@@ -0,0 +1,251 @@
+import json
+import re
+from array import array
+
+import numpy as np
+
+from sources import open_source
+
+CHUNK_SIZE = 1 << 16
+
+_WS = " \t\r\n"
+_SPAN = re.compile(r'[^"\[\]{}]*')
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+
+
+class _Reader:
+    """Chunked view of a text file that keeps only the unconsumed tail in memory."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.offset = 0
+        self.eof = False
+
+    def fill(self):
+        """Append the next chunk, dropping everything before pos. False at EOF."""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.offset += self.pos
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def error(self, msg):
+        return ValueError(f"{msg} at offset {self.offset + self.pos}")
+
+    def peek(self):
+        """Next non-whitespace character, without consuming it ('' at EOF)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self.error(f"Expected {char!r}")
+        self.pos += 1
+
+    def string(self):
+        """Consume a JSON string and return its raw text, quotes included."""
+        while True:
+            m = _STRING.match(self.buf, self.pos)
+            if m is not None:
+                self.pos = m.end()
+                return m.group()
+            if not self.fill():
+                raise self.error("Unterminated string")
+
+    def span(self):
+        """Consume a run of scalar text (numbers, literals, commas, colons)."""
+        start = self.pos
+        end = _SPAN.match(self.buf, start).end()
+        while end == len(self.buf) and self.fill():
+            start = 0
+            end = _SPAN.match(self.buf, start).end()
+        self.pos = end
+        return self.buf[start:end]
+
+    def skip(self, capture=None):
+        """
+        Consume one JSON value without decoding it.
+
+        Containers are skipped by bracket counting, so their contents are
+        never materialized. If capture is a list, the raw text is appended.
+        """
+        if self.peek() not in "[{":
+            text = self.string() if self.peek() == '"' else self._scalar()
+            if capture is not None:
+                capture.append(text)
+            return
+
+        depth = 0
+        while True:
+            char = self.peek()
+            if char == "":
+                raise self.error("Unexpected end of file")
+            if char == '"':
+                text = self.string()
+            elif char in "[{]}":
+                depth += 1 if char in "[{" else -1
+                self.pos += 1
+                text = char
+            else:
+                text = self._span_chunked(capture is None)
+            if capture is not None:
+                capture.append(text)
+            if depth == 0:
+                return
+
+    def _span_chunked(self, discard):
+        # When the text is discarded, a long span is consumed one chunk at a
+        # time instead of being accumulated in the buffer.
+        if not discard:
+            return self.span()
+        while True:
+            end = _SPAN.match(self.buf, self.pos).end()
+            self.pos = end
+            if end < len(self.buf) or not self.fill():
+                return ""
+
+    def _scalar(self):
+        # A top-level scalar ends at the next ',' or '}' of the enclosing object
+        text = self.span()
+        cut = text.find(",")
+        if cut >= 0:
+            self.pos -= len(text) - cut
+            text = text[:cut]
+        return text.strip()
+
+    def numbers(self):
+        """
+        Decode a (nested) numeric JSON array straight into a float64 buffer.
+
+        Returns:
+            np.ndarray: Array shaped after the nesting, which must be rectangular
+        """
+        if self.peek() != "[":
+            raise self.error("Expected a numeric array")
+        values = array("d")
+        opened = []  # '[' seen at each depth
+        depth = 0
+        row_start, row_length = 0, None
+        while True:
+            char = self.peek()
+            if char == "[":
+                if depth == len(opened):
+                    opened.append(0)
+                opened[depth] += 1
+                depth += 1
+                self.pos += 1
+                row_start = len(values)
+            elif char == "]":
+                if depth == len(opened):
+                    length = len(values) - row_start
+                    if row_length is not None and length != row_length:
+                        raise self.error("Ragged numeric array")
+                    row_length = length
+                depth -= 1
+                self.pos += 1
+                if depth == 0:
+                    break
+            elif char in ('"', "{", ""):
+                raise self.error("Expected a numeric array")
+            else:
+                self._decode_span(values)
+
+        shape = [opened[d + 1] // opened[d] for d in range(len(opened) - 1)]
+        inner = opened[-1]
+        if len(values) % inner or any(
+            opened[d + 1] % opened[d] for d in range(len(opened) - 1)
+        ):
+            raise self.error("Ragged numeric array")
+        shape.append(len(values) // inner)
+        return np.frombuffer(values, dtype=np.float64).reshape(shape)
+
+    def _decode_span(self, values):
+        start = self.pos
+        end = _SPAN.match(self.buf, start).end()
+        if end == len(self.buf) and not self.eof:
+            # Decode up to the last complete number, keep the tail for the next chunk
+            cut = self.buf.rfind(",", start, end)
+            if cut <= start:
+                self.fill()
+                return
+            end = cut
+        text = self.buf[start:end].strip(_WS + ",")
+        self.pos = end
+        if text:
+            # Depending on the NumPy version, np.fromstring either raises or
+            # stops at the first malformed number, so the count is checked too
+            try:
+                row = np.fromstring(text, dtype=np.float64, sep=",")
+            except ValueError:
+                row = None
+            if row is None or len(row) != text.count(",") + 1:
+                raise self.error("Non-numeric value in numeric array")
+            values.frombytes(memoryview(row).cast("B"))
+
+
+def read_json_keys(json_path, keys=(), arrays=(), chunk_size=CHUNK_SIZE):
+    """
+    Stream the top-level object of a JSON file and decode only selected keys.
+
+    Values of keys are decoded with the json module, values of arrays are
+    decoded straight into float64 NumPy arrays, and every other value is
+    skipped without being materialized. Reading stops as soon as all
+    requested keys have been found, so memory stays bounded by the chunk
+    size plus the requested arrays, whatever the size of the file.
+
+    Args:
+        json_path (str): Path to the JSON file
+        keys (iterable): Keys whose values are decoded as regular JSON
+        arrays (iterable): Keys whose values are numeric (nested) arrays
+        chunk_size (int): Characters read at a time
+
+    Returns:
+        dict: Requested keys present in the file -> decoded value
+
+    Raises:
+        ValueError: If the file is not a well-formed JSON object
+    """
+    keys, arrays = set(keys), set(arrays)
+    wanted = keys | arrays
+    result = {}
+    with open_source(json_path, "r") as f:
+        reader = _Reader(f, chunk_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return result
+        while wanted:
+            if reader.peek() != '"':
+                raise reader.error("Expected a key")
+            key = json.loads(reader.string())
+            reader.expect(":")
+            if key in arrays:
+                result[key] = reader.numbers()
+            elif key in keys:
+                text = []
+                reader.skip(capture=text)
+                result[key] = json.loads("".join(text))
+            else:
+                reader.skip()
+            wanted.discard(key)
+
+            char = reader.peek()
+            reader.pos += 1
+            if char == "}":
+                break
+            if char != ",":
+                reader.pos -= 1
+                raise reader.error("Expected ',' or '}'")
+    return result
@@ -0,0 +1,132 @@
+import os
+
+from utils import _extract
+
+
+class InputIndex:
+    """
+    Source files of every (id, rank) prediction of one model.
+
+    Built by a single scan of the model input folder (see index_afm,
+    index_chai1 and index_helixfold3), keeping the id and rank parsed from the
+    original names, so later stages neither list directories again nor split
+    them back out of the staged file names. Files are staged as
+    <id>_<rank>.<kind>, where kind is the file extension (json, pdb or cif).
+    """
+
+    def __init__(self):
+        self._files = {}
+
+    def __len__(self):
+        return len(self._files)
+
+    def add(self, protein_id, rank, kind, src):
+        """Register a source file; a later file with the same (id, rank, kind) replaces it."""
+        key = (protein_id, str(rank), kind)
+        self._files.pop(key, None)
+        self._files[key] = src
+
+    def pairs(self, output_path):
+        """(source, destination) of every file, for _stage_files."""
+        return [
+            (src, os.path.join(output_path, f"{protein_id}_{rank}.{kind}"))
+            for (protein_id, rank, kind), src in self._files.items()
+        ]
+
+    def files(self, output_path, kind):
+        """(id, rank, staged destination) of every file of one kind, in scan order."""
+        return [
+            (protein_id, rank, os.path.join(output_path, f"{protein_id}_{rank}.{kind}"))
+            for protein_id, rank, file_kind in self._files
+            if file_kind == kind
+        ]
+
+
+def _scan(path, tree=None):
+    """
+    (name, path, is_dir) of the entries of a directory.
+
+    One os.scandir call, whose entries usually know their type without a
+    stat, or the in-memory listing of a GitTree or ArchiveTree.
+    """
+    if tree is not None:
+        for name in tree.listdir(path):
+            child = os.path.join(path, name)
+            yield name, child, tree.isdir(child)
+        return
+    with os.scandir(path) as entries:
+        for entry in entries:
+            yield entry.name, entry.path, entry.is_dir()
+
+
+def _source(tree):
+    """Turn a scanned path into a staging source: the path itself, or its Blob or Member."""
+    return tree.blob if tree is not None else (lambda path: path)
+
+
+def index_afm(input_path, tree=None):
+    """
+    Index an AlphaFold-Multimer folder: one subdirectory per run holding
+    *_relaxed_rank_N_*.pdb structures and *_scores_rank_N_*.json scores.
+    """
+    source = _source(tree)
+    index = InputIndex()
+    for _, subdir, is_dir in _scan(input_path, tree):
+        if not is_dir:
+            continue
+        for filename, file_path, is_dir in _scan(subdir, tree):
+            if is_dir:
+                continue
+            for pattern, kind in (("_relaxed_", "pdb"), ("_scores_", "json")):
+                if pattern in filename and filename.endswith(f".{kind}"):
+                    protein_id, rank = _extract(filename, pattern)
+                    if protein_id and rank:
+                        index.add(protein_id, rank, kind, source(file_path))
+    return index
+
+
+def index_chai1(input_path, tree=None):
+    """
+    Index a Chai-1 folder: one subdirectory per id holding *.rank_N.cif
+    structures and *.rank_N.json scores, with zero-based N.
+    """
+    source = _source(tree)
+    index = InputIndex()
+    for protein_id, subdir, is_dir in _scan(input_path, tree):
+        if not is_dir:
+            continue
+        for filename, file_path, is_dir in _scan(subdir, tree):
+            kind = filename.rsplit(".", 1)[-1]
+            if is_dir or kind not in ("cif", "json") or ".rank_" not in filename:
+                continue
+            rank = int(filename.split(".rank_")[1].split(".")[0]) + 1
+            if protein_id and rank:
+                index.add(protein_id, rank, kind, source(file_path))
+    return index
+
+
+def index_helixfold3(input_path, tree=None):
+    """
+    Index a HelixFold3 folder: helixfold3_result* directories of
+    job-<id>-<n>-rank<rank> directories, each holding all_results.json and
+    predicted_structure.cif.
+    """
+    source = _source(tree)
+    index = InputIndex()
+    for main_dir, main_path, is_dir in _scan(input_path, tree):
+        if not (is_dir and main_dir.startswith("helixfold3_result")):
+            continue
+        for job_dir, job_path, is_dir in _scan(main_path, tree):
+            if not (is_dir and job_dir.startswith("job-") and "-rank" in job_dir):
+                continue
+            # Extract ID and rank from job directory name
+            parts = job_dir[4:]
+            rank_index = parts.rfind("-rank")
+            protein_id = "-".join(parts[:rank_index].split("-")[:-1])
+            rank = parts[rank_index + 5 :]
+
+            files = {name: path for name, path, is_dir in _scan(job_path, tree) if not is_dir}
+            for filename, kind in (("all_results.json", "json"), ("predicted_structure.cif", "cif")):
+                if filename in files:
+                    index.add(protein_id, rank, kind, source(files[filename]))
+    return index
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+
+from sources import is_stream_source, read_order
+from utils import _parallel_map
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path(output_dir):
+    """Manifest location, next to the output directory: <output_dir>.manifest.json"""
+    return os.path.normpath(output_dir) + ".manifest.json"
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _split(name):
+    """Split a staged file name id_rank.ext into the (id_rank, ext) manifest key."""
+    stem, ext = os.path.splitext(os.path.basename(name))
+    return stem, ext.lstrip(".")
+
+
+def _jsonable(value):
+    # As read back from the manifest, e.g. tuples as lists
+    return None if value is None else json.loads(json.dumps(value))
+
+
+class Manifest:
+    """
+    Persistent record of every staged file and the metrics extracted from it.
+
+    Entries are keyed on id_rank and then on the file kind (json, pdb, cif),
+    and hold the source path, size, mtime and optionally a content hash. A
+    file is considered unchanged when its source path, size and mtime match,
+    or, with use_hash, when its size and content hash match, which survives
+    fresh clones that reset mtimes. Files read from git objects are compared
+    by object id.
+    """
+
+    def __init__(self, path, use_hash=False):
+        self.path = path
+        self.use_hash = use_hash
+        self.entries = {}
+        self._seen = set()
+        self._unchanged = {}
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.entries = data.get("entries", {})
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, AttributeError) as e:
+            print(f"Ignoring unreadable manifest {path}: {e}")
+
+    def _state(self, src):
+        if is_stream_source(src):
+            # Git object ids and archive member headers already identify the content
+            return {"path": src.path, "size": src.size, "oid": src.oid}
+        st = os.stat(src)
+        state = {
+            "path": os.path.abspath(src),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+        }
+        if self.use_hash:
+            state["hash"] = _file_hash(src)
+        return state
+
+    def _entry(self, name):
+        key, kind = _split(name)
+        self._seen.add(key)
+        return self.entries.get(key, {}).get(kind)
+
+    def unchanged(self, name, src):
+        """True if src matches the manifest entry recorded for the staged name."""
+        if (name, src) not in self._unchanged:
+            self._unchanged[(name, src)] = self._compare(name, src)
+        return self._unchanged[(name, src)]
+
+    def _compare(self, name, src):
+        entry = self._entry(name)
+        if entry is None:
+            return False
+        if is_stream_source(src):
+            return entry.get("oid") == src.oid
+        try:
+            st = os.stat(src)
+        except FileNotFoundError:
+            return False
+        if entry["size"] != st.st_size:
+            return False
+        if self.use_hash:
+            return entry.get("hash") is not None and entry["hash"] == _file_hash(src)
+        return entry["path"] == os.path.abspath(src) and entry["mtime_ns"] == st.st_mtime_ns
+
+    def metrics(self, name, src, depends=None):
+        """
+        Cached metrics of an unchanged file, or None if it must be reparsed.
+
+        depends is any other JSON-serializable input the metrics were computed
+        from; metrics recorded with a different one are not reused.
+        """
+        if not self.unchanged(name, src):
+            return None
+        entry = self._entry(name)
+        if entry.get("depends") != _jsonable(depends):
+            return None
+        return entry.get("metrics")
+
+    def record(self, name, src, metrics, depends=None):
+        key, kind = _split(name)
+        self._seen.add(key)
+        entry = self._state(src)
+        entry["metrics"] = dict(metrics)
+        if depends is not None:
+            entry["depends"] = _jsonable(depends)
+        self.entries.setdefault(key, {})[kind] = entry
+        self._unchanged[(name, src)] = True
+
+    def save(self):
+        """Drop entries not seen in this run and write the manifest atomically."""
+        self.entries = {k: v for k, v in self.entries.items() if k in self._seen}
+        tmp = f"{self.path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "entries": self.entries}, f)
+        os.replace(tmp, self.path)
+
+
+def _ordered_map(func, items, sources, workers=1):
+    """
+    _parallel_map over items in the storage order of their sources (see
+    read_order), so archive members are read front to back; results are
+    returned in the order of items.
+    """
+    order = sorted(range(len(items)), key=lambda i: read_order(sources[i]))
+    results = [None] * len(items)
+    for i, result in zip(order, _parallel_map(func, [items[i] for i in order], workers)):
+        results[i] = result
+    return results
+
+
+def cached_map(func, files, staged, workers=1, manifest=None):
+    """
+    Apply an extraction function to the source of each staged file, reusing
+    manifest metrics for files that have not changed since the last run.
+
+    Args:
+        func: Picklable extraction function taking a source path
+        files: Staged destination paths, in output order
+        staged: Staged destination path -> source path
+        workers: Number of worker processes for the files that are reparsed
+        manifest: Manifest, or None to parse every file
+
+    Returns:
+        list: Metric dicts in the order of files
+    """
+    if manifest is None:
+        sources = [staged[f] for f in files]
+        return _ordered_map(func, sources, sources, workers)
+
+    results = [manifest.metrics(f, staged[f]) for f in files]
+    todo = [i for i, result in enumerate(results) if result is None]
+    sources = [staged[files[i]] for i in todo]
+    parsed = _ordered_map(func, sources, sources, workers)
+    for i, result in zip(todo, parsed):
+        manifest.record(files[i], staged[files[i]], result)
+        results[i] = result
+    return [dict(result) for result in results]
+
+
+def cached_batch_map(func, batches, staged, workers=1, manifest=None):
+    """
+    Apply a batch extraction function to groups of staged files, e.g. every
+    rank of one prediction, reusing manifest metrics for batches whose files
+    have all not changed since the last run. The arg of a batch is part of
+    the cache key, so a batch is reparsed when its arg changes too.
+
+    Args:
+        func: Picklable function taking (source paths, arg) and returning one
+            metric dict per source, independent of the order of the sources
+        batches: List of (staged destination paths, JSON-serializable arg)
+        staged: Staged destination path -> source path
+        workers: Number of worker processes for the batches that are reparsed
+        manifest: Manifest, or None to parse every batch
+
+    Returns:
+        list: (staged destination path, metric dict) for every file of every batch
+    """
+    results = [None] * len(batches)
+    if manifest is not None:
+        for i, (files, arg) in enumerate(batches):
+            cached = [manifest.metrics(f, staged[f], arg) for f in files]
+            if all(metrics is not None for metrics in cached):
+                results[i] = [dict(metrics) for metrics in cached]
+
+    todo = [i for i, result in enumerate(results) if result is None]
+    # Within a batch too, archive members are read front to back
+    ordered = {i: sorted(batches[i][0], key=lambda f: read_order(staged[f])) for i in todo}
+    items = [([staged[f] for f in ordered[i]], batches[i][1]) for i in todo]
+    first = [sources[0] if sources else None for sources, _ in items]
+    parsed = _ordered_map(func, items, first, workers)
+    for i, metrics in zip(todo, parsed):
+        by_file = dict(zip(ordered[i], metrics))
+        metrics = [by_file[f] for f in batches[i][0]]
+        if manifest is not None:
+            for f, result in zip(batches[i][0], metrics):
+                manifest.record(f, staged[f], result, batches[i][1])
+        results[i] = [dict(result) for result in metrics]
+
+    return [
+        (f, result)
+        for (files, _), metrics in zip(batches, results)
+        for f, result in zip(files, metrics)
+    ]
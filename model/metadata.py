@@ -0,0 +1,342 @@
+import csv
+import itertools
+import math
+import os
+import sys
+import tarfile
+import tempfile
+import time
+from array import array
+
+from scoring import SCORE_COLUMNS, index_natives, native_scores
+from utils import _arcname, _write_parquet
+
+# Leading columns of every metadata table
+MAIN_COLUMNS = ("id", "rank", "chains")
+
+
+class MetricTable:
+    """
+    Metrics of a set of predictions, stored column-wise.
+
+    One row per (id, rank). id, rank and chains are lists of strings; every
+    other column is a float64 array with NaN where a row has no value, so a
+    row costs one machine word per column instead of a dict of boxed floats.
+    Columns follow MAIN_COLUMNS in the order they are created, up front from
+    columns or else when first set, and a column set only to integers is
+    written as integers, as pandas does.
+
+    Args:
+        columns (iterable): Numeric columns to create up front, so that the
+            table has them even if no row sets them
+    """
+
+    def __init__(self, columns=()):
+        self.ids = []
+        self.ranks = []
+        self.chains = []
+        self._rows = {}
+        self._values = {}
+        self._integral = {}
+        for column in columns:
+            self.add_column(column)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def columns(self):
+        return [*MAIN_COLUMNS, *self._values]
+
+    def keys(self):
+        """(id, rank) of every row, in order."""
+        return list(zip(self.ids, self.ranks))
+
+    def add_column(self, column):
+        """Add a numeric column of NaN, if missing."""
+        if column not in self._values:
+            self._values[column] = array("d", [math.nan]) * len(self.ids)
+            self._integral[column] = True
+
+    def set(self, protein_id, rank, values, create=True):
+        """
+        Set values of the row of (protein_id, rank).
+
+        Args:
+            protein_id (str): Prediction id
+            rank (str): Rank
+            values (dict): Column -> value; chains is a string, every other
+                column a number, or None for a missing value
+            create (bool): Add the row if missing; otherwise values of rows
+                not in the table are dropped, like a left merge
+
+        Returns:
+            bool: Whether the row was set
+        """
+        row = self._rows.get((protein_id, rank))
+        if row is None:
+            if not create:
+                return False
+            row = self._rows[(protein_id, rank)] = len(self.ids)
+            self.ids.append(protein_id)
+            self.ranks.append(rank)
+            self.chains.append(None)
+            for column in self._values.values():
+                column.append(math.nan)
+
+        for column, value in values.items():
+            if column == "chains":
+                # A handful of distinct chain pairs, shared by every row
+                self.chains[row] = sys.intern(value) if isinstance(value, str) else None
+            elif column not in ("id", "rank"):
+                self.add_column(column)
+                if value is None:
+                    value = math.nan
+                if type(value) is not int:
+                    self._integral[column] = False
+                self._values[column][row] = value
+        return True
+
+    def sort(self):
+        """Order rows by (id, rank), like DataFrame.sort_values."""
+        # Sorting the existing key tuples avoids building a key per row
+        keys = sorted(self._rows)
+        order = [self._rows[key] for key in keys]
+        self._rows = {key: row for row, key in enumerate(keys)}
+        del keys
+        self.ids = [self.ids[row] for row in order]
+        self.ranks = [self.ranks[row] for row in order]
+        self.chains = [self.chains[row] for row in order]
+        for column, values in self._values.items():
+            self._values[column] = array("d", (values[row] for row in order))
+
+    def _is_integral(self, column):
+        values = self._values[column]
+        return self._integral[column] and not any(math.isnan(value) for value in values)
+
+    def column(self, column):
+        """
+        Values of a column, without copying it.
+
+        Returns:
+            iterable: Strings or None for MAIN_COLUMNS, floats (NaN where
+            missing) or ints for the others, None for unknown columns
+        """
+        if column == "id":
+            return self.ids
+        if column == "rank":
+            return self.ranks
+        if column == "chains":
+            return self.chains
+        if column not in self._values:
+            return itertools.repeat(None, len(self.ids))
+        if self._is_integral(column):
+            return map(int, self._values[column])
+        return self._values[column]
+
+    def rows(self, columns=None):
+        """Rows as tuples of the given columns, all columns by default, one at a time."""
+        return zip(*(self.column(column) for column in columns or self.columns))
+
+    def to_frame(self):
+        """The table as a DataFrame, built column by column."""
+        # Imported here so that the CLI starts without pandas
+        import numpy as np
+        import pandas as pd
+
+        data = {"id": self.ids, "rank": self.ranks, "chains": self.chains}
+        for column, values in self._values.items():
+            values = np.array(values, dtype=np.float64)
+            data[column] = values.astype(np.int64) if self._is_integral(column) else values
+        return pd.DataFrame(data, columns=self.columns)
+
+    def write(self, metadata_path, metadata_format="csv", archive=None):
+        """
+        Write the table as CSV and/or Parquet.
+
+        The CSV is written row by row from the columns; Parquet goes through
+        to_frame().
+
+        Args:
+            metadata_path (str): Output path without extension
+            metadata_format (str): One of METADATA_FORMATS
+            archive (tarfile.TarFile): Open archive to write into
+        """
+        if metadata_format in ("csv", "both"):
+            with CsvStream(metadata_path + ".csv", archive) as stream:
+                stream.write(self)
+        if metadata_format in ("parquet", "both"):
+            _write_parquet(self.to_frame(), metadata_path + ".parquet", archive)
+
+
+def score_table(table, structures, natives, workers=1):
+    """
+    Add the SCORE_COLUMNS of every prediction with a native to a table.
+
+    Args:
+        table (MetricTable): Metadata to score
+        structures (dict): (id, rank) -> predicted structure source
+        natives (dict): id -> native structure path, see index_natives
+        workers (int): Number of worker processes, one prediction id per task
+    """
+    for column in SCORE_COLUMNS:
+        table.add_column(column)
+    scored = native_scores(
+        {key: structures[key] for key in table.keys() if key in structures}, natives, workers
+    )
+    for (protein_id, rank), scores in scored.items():
+        table.set(protein_id, rank, scores, create=False)
+
+
+class CsvStream:
+    """
+    CSV file written a table at a time, in the layout of DataFrame.to_csv.
+
+    The header is columns if given, else that of the first table written,
+    with any trailing columns moved last. Tables may lack some of the header
+    columns; missing values and NaN are written as empty fields. Inside an
+    archive the rows are spooled to a temporary file, since tar members need
+    their size up front.
+
+    Args:
+        path (str): Output path
+        archive (tarfile.TarFile): Open archive to write into instead of path
+        columns (iterable): Header, MAIN_COLUMNS included
+        trailing (tuple): Columns that always come last
+    """
+
+    def __init__(self, path, archive=None, columns=None, trailing=()):
+        self.path = path
+        self.archive = archive
+        self.trailing = tuple(trailing)
+        self.columns = None
+        self.rows = 0
+        if archive is None:
+            self._file = open(path, "w", newline="")
+        else:
+            self._file = tempfile.TemporaryFile("w+", newline="")
+        self._writer = csv.writer(self._file, lineterminator=os.linesep)
+        self._header(columns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _field(value):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return ""
+        return value
+
+    def _header(self, columns):
+        if columns is None:
+            return
+        self.columns = [
+            *(column for column in columns if column not in self.trailing),
+            *self.trailing,
+        ]
+        self._writer.writerow(self.columns)
+
+    def write(self, table):
+        """Append the rows of a MetricTable."""
+        if self.columns is None:
+            self._header(table.columns)
+        field = self._field
+        for row in table.rows(self.columns):
+            self._writer.writerow([field(value) for value in row])
+        self.rows += len(table)
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self.columns is None:
+            # Like an empty DataFrame: a blank line and no columns
+            self._file.write(os.linesep)
+        if self.archive is not None:
+            self._file.flush()
+            data = self._file.buffer
+            info = tarfile.TarInfo(_arcname(self.path))
+            info.size = data.seek(0, os.SEEK_END)
+            info.mode = 0o644
+            info.mtime = int(time.time())
+            data.seek(0)
+            self.archive.addfile(info, data)
+        self._file.close()
+
+
+def _blocks(rows, size):
+    """Consecutive blocks of rows sorted by id, holding all ranks of at most size ids."""
+    block, ids = [], 0
+    for row in rows:
+        if block and row[0] != block[-1][0]:
+            ids += 1
+            if ids == size:
+                yield block
+                block, ids = [], 0
+        block.append(row)
+    if block:
+        yield block
+
+
+def write_streamed_metadata(
+    metadata_path,
+    rows,
+    structure_rows,
+    block_metrics,
+    columns=None,
+    structures=None,
+    native_dir=None,
+    workers=1,
+    archive=None,
+    block_size=256,
+):
+    """
+    Write a metadata CSV while it is computed, a block of ids at a time.
+
+    Rows are consumed in the order given, which must be (id, rank) order, the
+    order of the table built in memory, and only the MetricTable of the
+    current block is held. The metrics therefore take memory per block, but
+    the input rows and structure rows are still held in full by the caller,
+    one small tuple per file, so memory remains O(N) in the number of
+    predictions, at a much smaller constant than the table built in memory.
+
+    Args:
+        metadata_path (str): Output path without extension
+        rows (iterable): (id, rank, score file) of every prediction, one table
+            row each, sorted by (id, rank)
+        structure_rows (list): (id, rank, structure file) of every prediction
+        block_metrics (callable): Takes a block of rows, holding every rank of
+            its ids, and the structure rows of those ids, and returns their
+            MetricTable
+        columns (iterable): Metric columns of the header, after MAIN_COLUMNS;
+            taken from the first block if not given
+        structures (dict): (id, rank) -> predicted structure source, for scoring
+        native_dir (str): Directory of natives written by retrieve_natives;
+            adds the SCORE_COLUMNS
+        workers (int): Number of worker processes
+        archive (tarfile.TarFile): Open archive to write into
+        block_size (int): Ids per block
+
+    Returns:
+        int: Number of rows written
+    """
+    natives = index_natives(native_dir) if native_dir is not None else None
+    trailing = SCORE_COLUMNS if natives is not None else ()
+    by_id = {}
+    for row in structure_rows:
+        by_id.setdefault(row[0], []).append(row)
+
+    header = None if columns is None else [*MAIN_COLUMNS, *columns]
+    with CsvStream(metadata_path + ".csv", archive, header, trailing) as stream:
+        for block in _blocks(rows, block_size):
+            ids = dict.fromkeys(protein_id for protein_id, _, _ in block)
+            table = block_metrics(
+                block, [row for protein_id in ids for row in by_id.get(protein_id, [])]
+            )
+            table.sort()
+            if natives is not None:
+                score_table(table, structures, natives, workers)
+            stream.write(table)
+    return stream.rows
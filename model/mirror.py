@@ -0,0 +1,111 @@
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+DEFAULT_MIRROR_DIR = Path(
+    os.environ.get("REPO_CACHE_DIR")
+    or Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    / "benchmark_model_afm"
+    / "repos"
+)
+
+
+def _git(*args, cwd=None):
+    subprocess.run(["git", *args], cwd=cwd, check=True)
+
+
+class RepoMirror:
+    """
+    Persistent bare mirrors of dataset repositories, one per repository URL.
+
+    A mirror is created once as a blob-less partial clone and brought up to
+    date with git fetch on later runs, which only transfers new objects.
+    Checkouts are sparse git worktrees of the mirror: the blobs they need are
+    fetched on first use and kept in the mirror, so repeat runs read them
+    from the local object store. Mirror updates and worktree creation are
+    guarded by a per-mirror lock so concurrent runs can share the cache.
+
+    Args:
+        root (str or Path): Cache directory (created if missing)
+        fetch (bool): Fetch new objects for existing mirrors. Without it a
+            cached mirror is used as is and no network access is needed
+    """
+
+    def __init__(self, root=DEFAULT_MIRROR_DIR, fetch=True):
+        self.root = Path(root)
+        self.fetch = fetch
+
+    def path(self, repo_url):
+        """Mirror directory of a repository URL."""
+        url = repo_url.rstrip("/")
+        digest = hashlib.blake2b(url.encode(), digest_size=6).hexdigest()
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "_", url.split("://", 1)[-1]).strip("_")
+        return self.root / f"{slug[-80:]}-{digest}.git"
+
+    @contextmanager
+    def _lock(self, path):
+        if fcntl is None:
+            yield
+            return
+        with open(path.with_name(path.name + ".lock"), "w") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _update(self, repo_url, path):
+        if not path.exists():
+            tmp = path.with_name(path.name + ".part")
+            if tmp.exists():
+                # Left over from an interrupted clone
+                shutil.rmtree(tmp)
+            _git("clone", "--bare", "--filter=blob:none", repo_url, str(tmp))
+            _git("config", "remote.origin.fetch", "+refs/heads/*:refs/heads/*", cwd=tmp)
+            os.replace(tmp, path)
+        elif self.fetch:
+            try:
+                _git("fetch", "--prune", "origin", cwd=path)
+            except subprocess.CalledProcessError as e:
+                print(f"Fetch failed, using the cached mirror of {repo_url}: {e}")
+        # Forget worktrees whose directories have been removed
+        _git("worktree", "prune", cwd=path)
+
+    def update(self, repo_url):
+        """Create or fetch the mirror of repo_url and return its path."""
+        path = self.path(repo_url)
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock(path):
+            self._update(repo_url, path)
+        return path
+
+    def checkout(self, repo_url, destination, folders):
+        """
+        Create a sparse worktree of the default branch holding only folders.
+
+        Args:
+            repo_url (str): Repository URL
+            destination (str): Worktree directory, missing or empty
+            folders (list): Repository folders to check out
+
+        Returns:
+            Path: destination
+        """
+        path = self.path(repo_url)
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock(path):
+            self._update(repo_url, path)
+            _git("worktree", "add", "--no-checkout", "--detach", str(destination), "HEAD", cwd=path)
+        _git("sparse-checkout", "set", "--no-cone", *[f"{f}/*" for f in folders], cwd=destination)
+        _git("checkout", cwd=destination)
+        return Path(destination)
@@ -1,15 +1,35 @@
 import argparse
+import importlib
+import os
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-import tarfile
 import shutil
 
 parent_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(parent_dir))
-from afm import main_afm
-from chai1 import main_chai1
-from helixfold3 import main_helixfold3
-from native.download import retrieve_natives
+from native.cache import (
+    DEFAULT_BASE_URL,
+    DEFAULT_CACHE_DIR,
+    DEFAULT_CACHE_SIZE_MB,
+    FORMATS,
+    NativeCache,
+)
+from profiling import open_profiler, stage
+from utils import (
+    COMPRESSIONS,
+    _download,
+    _archive_dir,
+    _open_archive,
+    add_pipeline_args,
+    archive_suffix,
+    check_compression_args,
+    check_pipeline_args,
+    open_mirror,
+    pipeline_options,
+)
 
 def build_argparser():
     parser = argparse.ArgumentParser(description="AFM Benchmark Model")
@@ -18,13 +38,16 @@ def build_argparser():
         "--input_path", 
         default="https://github.com/pszgaspar/short_peptide_modeling_benchmark.git",
         type=str, 
-        help="GitHub repository URL to download the dataset or local path.")
+        help="GitHub repository URL to download the dataset, local path, or a "
+        ".tar[.gz|.xz|.bz2|.zst] or .zip archive read without extracting it.")
 
     parser.add_argument(
         "--model",
-        choices=["AFMultimer", "Chai-1", "HelixFold3"],
-        default="AFMultimer",
-        help="Choose the model type to process (default: AFMultimer)"
+        nargs="+",
+        choices=["AFMultimer", "Chai-1", "HelixFold3", "all"],
+        default=["AFMultimer"],
+        help="Model types to process, or 'all'. Several models are processed "
+        "concurrently from a single clone (default: AFMultimer)",
     )
 
     parser.add_argument(
@@ -46,55 +69,293 @@ def build_argparser():
         default="./native_metadata.csv",
         help="Path to input csv file with columns <id>, <pdb_id>.",
     )
+
+    parser.add_argument(
+        "--download_workers",
+        type=int,
+        default=8,
+        help="Number of concurrent native structure downloads. Default: 8.",
+    )
+
+    parser.add_argument(
+        "--native_base_url",
+        type=str,
+        default=DEFAULT_BASE_URL,
+        help=f"Server to download native structures from. Default: {DEFAULT_BASE_URL}.",
+    )
+
+    parser.add_argument(
+        "--native_format",
+        choices=["auto", *FORMATS],
+        default="auto",
+        help="Native structure format. 'auto' falls back to mmCIF for entries "
+        "without a PDB-format file. Default: auto.",
+    )
+
+    parser.add_argument(
+        "--native_keep_compressed",
+        action="store_true",
+        help="Keep native structures gzipped as transferred.",
+    )
+
+    parser.add_argument(
+        "--native_cache_dir",
+        type=str,
+        default=str(DEFAULT_CACHE_DIR),
+        help="Shared native structure cache. Default: $NATIVE_CACHE_DIR or "
+        "~/.cache/benchmark_model_afm/natives.",
+    )
+
+    parser.add_argument(
+        "--native_cache_size_mb",
+        type=int,
+        default=DEFAULT_CACHE_SIZE_MB,
+        help=f"Native cache size limit, least recently used entries are evicted. "
+        f"Default: {DEFAULT_CACHE_SIZE_MB}.",
+    )
+
+    parser.add_argument(
+        "--no_native_cache",
+        action="store_true",
+        help="Download natives without the shared cache.",
+    )
+
+    add_pipeline_args(parser)
+
+    parser.add_argument(
+        "--score",
+        action="store_true",
+        help="Retrieve the natives first and add RMSD, ligand and interface RMSD, Fnat "
+        "and DockQ columns against them to the metadata of every model.",
+    )
+
+    parser.add_argument(
+        "--stream_archive",
+        action="store_true",
+        help="Write renamed files and metadata straight into the tar archives "
+        "without an on-disk staging directory.",
+    )
+
+    parser.add_argument(
+        "--compression",
+        choices=list(COMPRESSIONS),
+        default="none",
+        help="Compression of the model and natives archives. Default: none.",
+    )
+
+    parser.add_argument(
+        "--compression_level",
+        type=int,
+        default=None,
+        help="Compression level. Default: codec default (gzip 6, xz 6, zstd 3).",
+    )
+
+    parser.add_argument(
+        "--compression_threads",
+        type=int,
+        default=0,
+        help="Compressor threads, 0 uses every core. Default: 0.",
+    )
     return parser
 
-def main():
-    parser = build_argparser()
-    args = parser.parse_args()
+# Adapter module and entry point of every model. Adapters are imported on
+# first use, so --help and single-model runs skip the others and their
+# dependencies.
+MODELS = {
+    "AFMultimer": ("afm", "main_afm"),
+    "Chai-1": ("chai1", "main_chai1"),
+    "HelixFold3": ("helixfold3", "main_helixfold3"),
+}
 
-    input_path = args.input_path
-    model = args.model
-    output_model = Path(args.output_dir) / model
 
+def model_main(model):
+    """Entry point of a model adapter, importing the adapter module on first use."""
+    module, function = MODELS[model]
+    return getattr(importlib.import_module(module), function)
+
+
+@contextmanager
+def shared_checkout(input_path, models, mirror=None, profiler=None):
+    """
+    Local directory holding one folder per model.
+
+    A GitHub URL is cloned once, with a sparse checkout of every requested
+    model folder, into a private temporary directory that is removed on exit,
+    or checked out as a sparse worktree of the cached mirror. A local path is
+    used as is.
+    """
     if isinstance(input_path, str) and input_path.startswith("https://github.com/"):
-        repo_url = input_path
-        url = True
-        # Download and process model results from repo
-        if model == "AFMultimer":
-            main_afm(repo_url, str(output_model), url=url)
-        elif model == "Chai-1":
-            main_chai1(repo_url, str(output_model), url=url)
-        elif model == "HelixFold3":
-            main_helixfold3(repo_url, str(output_model), url=url)
+        # Download model results from repo
+        clone = tempfile.mkdtemp(prefix="tmp_", dir=os.getcwd())
+        try:
+            with stage(profiler, "clone"):
+                _download(
+                    input_path, clone, folder_path=[f"models/{m}" for m in models], mirror=mirror
+                )
+            yield os.path.join(clone, "models"), True
+        finally:
+            shutil.rmtree(clone, ignore_errors=True)
     elif input_path and Path(input_path).exists():
         # Process local path directly
-        url = False
-        if model == "AFMultimer":
-            main_afm(input_path, str(output_model), url=url)
-        elif model == "Chai-1":
-            main_chai1(input_path, str(output_model), url=url)
-        elif model == "HelixFold3":
-            main_helixfold3(input_path, str(output_model), url=url)
+        yield input_path, False
     else:
         raise ValueError("input_path must be a valid GitHub repo URL or an existing local path.")
+
+
+def git_trees(input_path, models, mirror=None):
+    """GitTree of every model folder, read from the mirror or a local repository."""
+    from gitobjects import open_tree
+
+    if isinstance(input_path, str) and input_path.startswith("https://github.com/"):
+        if mirror is None:
+            raise ValueError("--from_git_objects with a repository URL requires --repo_cache.")
+        repo = mirror.update(input_path)
+    elif input_path and Path(input_path).exists():
+        repo = input_path
+    else:
+        raise ValueError("input_path must be a valid GitHub repo URL or an existing local path.")
+    return {model: open_tree(str(repo), f"models/{model}") for model in models}
+
+
+def run_model(source, model, output_model, cloned=False, **options):
+    """Process the results of one model from a local directory of model folders."""
+    if cloned and options.get("link_mode") == "symlink":
+        # Symlinks would dangle once the shared clone is removed
+        options["link_mode"] = "auto"
+    model_main(model)(source, str(output_model), url=False, **options)
+
+
+def run_pipeline(source, cloned, model, output_model, model_archive, stream, options, compression):
+    """Process one model and archive its output directory."""
+    profiler = options.get("profiler")
+    if stream:
+        # Write renamed files and metadata straight into the archive
+        with _open_archive(model_archive, **compression) as tar:
+            _archive_dir(tar, output_model.name)
+            run_model(source, model, output_model, cloned, archive=tar, **options)
+        return
+
+    run_model(source, model, output_model, cloned, **options)
     # Create tar archive
-    archive_name = output_model.parent / f"{args.name}.tar"
-    with tarfile.open(archive_name, "w") as tar:
-        tar.add(output_model, arcname=output_model.name)
-    if archive_name.exists():
+    with stage(profiler, "archive", model):
+        with _open_archive(model_archive, dereference=True, **compression) as tar:
+            tar.add(output_model, arcname=output_model.name)
+    if model_archive.exists():
         shutil.rmtree(output_model)
 
-    # Download native structures
+
+def main():
+    parser = build_argparser()
+    args = parser.parse_args()
+    check_pipeline_args(parser, args)
+    check_compression_args(parser, args)
+    # Not needed for --help or argument errors
+    from archives import ArchiveTree, is_archive
+    from native.download import TransferStats, retrieve_natives
+
+    input_path = args.input_path
+    models = list(MODELS) if "all" in args.model else list(dict.fromkeys(args.model))
     output_native = Path(args.output_dir) / "natives"
-    retrieve_natives(args.input, output_native)
-    shutil.copy2(args.input, output_native / Path(args.input).name)
+    profiler = open_profiler(args.profile, args.profile_stage, args.profile_memory)
+    options = pipeline_options(args, profiler)
 
-    # Create tar archive
-    archive_name = output_native.parent / f"{args.name}.{output_native.name}.tar"
-    with tarfile.open(archive_name, "w") as tar:
-        tar.add(output_native, arcname=output_native.name)
-    if archive_name.exists():
-        shutil.rmtree(output_native)
+    suffix = archive_suffix(args.compression)
+    native_archive = output_native.parent / f"{args.name}.{output_native.name}{suffix}"
+    download = {
+        "workers": args.download_workers,
+        "base_url": args.native_base_url,
+        "cache": None
+        if args.no_native_cache
+        else NativeCache(args.native_cache_dir, args.native_cache_size_mb * 1024 * 1024),
+        "fmt": args.native_format,
+        "keep_compressed": args.native_keep_compressed,
+        "stats": TransferStats(),
+    }
+    compression = {
+        "compression": args.compression,
+        "level": args.compression_level,
+        "threads": args.compression_threads,
+    }
+
+    if args.stream_archive:
+        Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+
+    natives_retrieved = False
+    if args.score:
+        # The scores are part of the model metadata, so natives come first
+        with stage(profiler, "natives"):
+            retrieve_natives(args.input, output_native, **download)
+        options["native_dir"] = str(output_native)
+        natives_retrieved = True
+
+    # One clone for every model, then one pipeline per model with its own
+    # output directory and archive. CPU-bound work inside each pipeline runs
+    # in its own worker processes (--workers).
+    mirror = open_mirror(args)
+    trees = {}
+    if args.from_git_objects:
+        # No checkout: every pipeline lists and reads its own model folder
+        with stage(profiler, "list"):
+            trees = git_trees(input_path, models, mirror)
+        checkout = nullcontext((input_path, False))
+    elif is_archive(input_path):
+        # Listed once and shared: every pipeline streams its members
+        with stage(profiler, "list"):
+            tree = ArchiveTree(input_path)
+        trees = {model: tree for model in models}
+        checkout = nullcontext((input_path, False))
+    else:
+        checkout = shared_checkout(input_path, models, mirror, profiler)
+    for model in models:
+        # Import the adapters here rather than concurrently in the pipelines
+        model_main(model)
+    with checkout as (source, cloned):
+        with ThreadPoolExecutor(max_workers=len(models)) as pool:
+            futures = []
+            for model in models:
+                output_model = Path(args.output_dir) / model
+                # A single model keeps the omnibenchmark name for its archive
+                archive_name = args.name if len(models) == 1 else model
+                model_archive = output_model.parent / f"{archive_name}{suffix}"
+                futures.append(
+                    pool.submit(
+                        run_pipeline,
+                        source,
+                        cloned,
+                        model,
+                        output_model,
+                        model_archive,
+                        args.stream_archive,
+                        {**options, "tree": trees.get(model)},
+                        compression,
+                    )
+                )
+            for future in futures:
+                future.result()
+
+    if args.stream_archive and not natives_retrieved:
+        with stage(profiler, "natives"), _open_archive(native_archive, **compression) as tar:
+            _archive_dir(tar, output_native.name)
+            retrieve_natives(args.input, output_native, archive=tar, **download)
+            tar.add(args.input, arcname=f"{output_native.name}/{Path(args.input).name}")
+        print(download["stats"].summary())
+    else:
+        # Download native structures
+        if not natives_retrieved:
+            with stage(profiler, "natives"):
+                retrieve_natives(args.input, output_native, **download)
+        print(download["stats"].summary())
+        shutil.copy2(args.input, output_native / Path(args.input).name)
+
+        # Create tar archive
+        with stage(profiler, "natives_archive"):
+            with _open_archive(native_archive, dereference=True, **compression) as tar:
+                tar.add(output_native, arcname=output_native.name)
+        if native_archive.exists():
+            shutil.rmtree(output_native)
+
+    if profiler is not None:
+        profiler.write(args.profile, args.profile_format)
 
 
 if __name__ == "__main__":
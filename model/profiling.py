@@ -0,0 +1,227 @@
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+PROFILE_FORMATS = ("json", "chrome")
+
+
+_probes = threading.local()
+
+
+def _thread_io():
+    """
+    (bytes read, bytes written) by the calling thread, or (None, None) off Linux.
+
+    The reads of /proc/thread-self/io made by earlier calls in the thread,
+    about 100 bytes each, are not counted, so a stage with nested stages
+    reports only its own reads.
+    """
+    try:
+        with open("/proc/thread-self/io", "rb") as f:
+            data = f.read()
+        fields = dict(line.split(b": ") for line in data.splitlines())
+        probed = getattr(_probes, "bytes", 0)
+        _probes.bytes = probed + len(data)
+        return int(fields[b"rchar"]) - probed, int(fields[b"wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Profiler:
+    """
+    Wall time, CPU time, I/O, file counts and memory of every pipeline stage.
+
+    Stages are opened with stage(); they may nest and run concurrently in
+    several threads (one per model in model.py). Per stage it records:
+
+    - wall_seconds and cpu_seconds of the calling thread
+    - children_cpu_seconds: CPU time of worker processes reaped meanwhile,
+      process-wide, so shared by concurrent stages
+    - read_bytes and written_bytes of the calling thread (Linux only); reads
+      done in worker processes are not included
+    - files: set by the stage itself through the yielded record
+    - tracemalloc_peak_bytes: with memory=True, peak Python allocations of
+      this process while the stage was open; allocations of worker processes
+      are not included
+
+    Memory tracing is off by default: it makes allocation-heavy stages about
+    ten times slower (JSON scoring from 0.4 s to 4 s), so a run that records
+    memory peaks does not give meaningful timings. Worker processes never
+    trace, see utils._parallel_map.
+
+    Args:
+        cprofile (str): Also run cProfile on the stages with this name, given
+            as <stage> or <model>:<stage>
+        cprofile_prefix (str): Path prefix of the cProfile dumps, written as
+            <prefix>.<model>.<stage>.prof
+        memory (bool): Record tracemalloc peaks
+    """
+
+    def __init__(self, cprofile=None, cprofile_prefix="profile", memory=False):
+        self.cprofile = cprofile
+        self.cprofile_prefix = cprofile_prefix
+        self.records = []
+        self._open = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._memory = memory and not tracemalloc.is_tracing()
+        if self._memory:
+            tracemalloc.start()
+
+    def _checkpoint(self):
+        # Credit the peak since the last checkpoint to every open stage, then
+        # start a new interval; called with the lock held
+        if not self._memory:
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        for record in self._open:
+            record["tracemalloc_peak_bytes"] = max(record["tracemalloc_peak_bytes"], peak)
+
+    def _wants_cprofile(self, name, model):
+        return self.cprofile is not None and self.cprofile in (name, f"{model}:{name}")
+
+    @contextmanager
+    def stage(self, name, model=None):
+        """
+        Measure the enclosed block as one stage.
+
+        Yields:
+            dict: The stage record; set its "files" entry to the number of files handled
+        """
+        record = {
+            "name": name,
+            "model": model,
+            "thread": threading.get_native_id(),
+            "start_seconds": 0.0,
+            "wall_seconds": 0.0,
+            "cpu_seconds": 0.0,
+            "children_cpu_seconds": 0.0,
+            "read_bytes": None,
+            "written_bytes": None,
+            "files": None,
+            "tracemalloc_peak_bytes": None,
+        }
+        with self._lock:
+            self._checkpoint()
+            if self._memory:
+                record["tracemalloc_peak_bytes"] = tracemalloc.get_traced_memory()[0]
+            self._open.append(record)
+
+        profile = None
+        if self._wants_cprofile(name, model):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                # Only one profiler can be active at a time since Python 3.12
+                print(f"Cannot profile stage {name}: {e}")
+                profile = None
+
+        read, written = _thread_io()
+        children = _children_cpu()
+        cpu = time.thread_time()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = time.perf_counter() - start
+            record["cpu_seconds"] = time.thread_time() - cpu
+            record["children_cpu_seconds"] = _children_cpu() - children
+            record["start_seconds"] = start - self._origin
+            if read is not None:
+                end_read, end_written = _thread_io()
+                record["read_bytes"] = end_read - read
+                record["written_bytes"] = end_written - written
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(f"{self.cprofile_prefix}.{model or 'pipeline'}.{name}.prof")
+            with self._lock:
+                self._checkpoint()
+                self._open.remove(record)
+                self.records.append(record)
+
+    def close(self):
+        """Stop memory tracing if this profiler started it."""
+        if self._memory:
+            tracemalloc.stop()
+            self._memory = False
+
+    def trace_events(self):
+        """Records as Chrome trace complete events, viewable in Perfetto or chrome://tracing."""
+        pid = os.getpid()
+        process = os.path.basename(sys.argv[0]) or "python"
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": process}}]
+        threads = {}
+        for record in sorted(self.records, key=lambda record: record["start_seconds"]):
+            if record["model"] is not None:
+                threads.setdefault(record["thread"], record["model"])
+            args = {
+                key: value
+                for key, value in record.items()
+                if key not in ("name", "model", "thread", "start_seconds") and value is not None
+            }
+            events.append(
+                {
+                    "name": record["name"],
+                    "cat": record["model"] or "pipeline",
+                    "ph": "X",
+                    "ts": round(record["start_seconds"] * 1e6, 1),
+                    "dur": round(record["wall_seconds"] * 1e6, 1),
+                    "pid": pid,
+                    "tid": record["thread"],
+                    "args": args,
+                }
+            )
+        events += [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": model}}
+            for tid, model in threads.items()
+        ]
+        return events
+
+    def write(self, path, fmt="json"):
+        """
+        Write the stage records.
+
+        Args:
+            path (str): Output file
+            fmt (str): "json" for a list of stage records, "chrome" for a
+                Chrome trace (Trace Event Format)
+        """
+        if fmt not in PROFILE_FORMATS:
+            raise ValueError(f"Unknown profile format: {fmt}")
+        with self._lock:
+            records = sorted(self.records, key=lambda record: record["start_seconds"])
+        if fmt == "chrome":
+            data = {"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}
+        else:
+            data = {"pid": os.getpid(), "stages": records}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+
+
+def stage(profiler, name, model=None):
+    """profiler.stage(name, model), or a no-op yielding a throwaway record if profiler is None."""
+    if profiler is None:
+        return nullcontext({})
+    return profiler.stage(name, model)
+
+
+def open_profiler(path, cprofile=None, memory=False):
+    """Profiler for a --profile path, with cProfile dumps next to it, or None without one."""
+    if path is None:
+        if cprofile is not None or memory:
+            print("--profile_stage and --profile_memory require --profile; not profiling.")
+        return None
+    return Profiler(cprofile, os.path.splitext(path)[0], memory)
@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from sources import read_order
+from utils import _arcname
+
+# Arrays of a residue store directory
+PLDDT = "plddt.npy"
+PAE = "pae.npy"
+INDEX = ("ids.npy", "ranks.npy", "plddt_offsets.npy", "pae_offsets.npy")
+
+_DTYPE = np.dtype("<f4")
+
+
+def _finalize(raw_path, npy_path, count):
+    """Prepend an NPY header to a file of raw float32 values."""
+    with open(npy_path, "wb") as out:
+        np.lib.format.write_array_header_1_0(
+            out, {"descr": _DTYPE.str, "fortran_order": False, "shape": (count,)}
+        )
+        with open(raw_path, "rb") as raw:
+            shutil.copyfileobj(raw, out, 1 << 20)
+    os.remove(raw_path)
+
+
+class ResidueStoreWriter:
+    """
+    Append-only writer of a per-residue array store.
+
+    A store is a directory of NPY files that can be opened memory-mapped:
+    plddt.npy and pae.npy hold the per-residue pLDDT vectors and flattened
+    PAE matrices of every row back to back as float32, and the index arrays
+    hold the (id, rank) of each row and its offsets into both. Rows are
+    written to disk as they are added, so memory use does not depend on the
+    number of rows.
+
+    Args:
+        path (str): Store directory (created if missing)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.ids, self.ranks = [], []
+        self.plddt_offsets, self.pae_offsets = [0], [0]
+        self._plddt = open(os.path.join(path, PLDDT + ".part"), "wb")
+        self._pae = open(os.path.join(path, PAE + ".part"), "wb")
+
+    def add(self, protein_id, rank, plddt, pae=None):
+        """
+        Append the arrays of one (id, rank) row.
+
+        Args:
+            protein_id (str): Prediction id
+            rank (str): Model rank
+            plddt (array-like): (n,) per-residue pLDDT
+            pae (array-like): (n, n) PAE matrix, or None if the model has none
+        """
+        plddt = np.ascontiguousarray(plddt, dtype=_DTYPE).reshape(-1)
+        self._plddt.write(plddt.tobytes())
+        self.plddt_offsets.append(self.plddt_offsets[-1] + len(plddt))
+        if pae is not None:
+            pae = np.ascontiguousarray(pae, dtype=_DTYPE).reshape(-1)
+            self._pae.write(pae.tobytes())
+        self.pae_offsets.append(self.pae_offsets[-1] + (0 if pae is None else len(pae)))
+        self.ids.append(str(protein_id))
+        self.ranks.append(str(rank))
+
+    def close(self):
+        """Write the NPY headers and the index."""
+        self._plddt.close()
+        self._pae.close()
+        _finalize(self._plddt.name, os.path.join(self.path, PLDDT), self.plddt_offsets[-1])
+        _finalize(self._pae.name, os.path.join(self.path, PAE), self.pae_offsets[-1])
+        index = (
+            np.array(self.ids, dtype=str),
+            np.array(self.ranks, dtype=str),
+            np.array(self.plddt_offsets, dtype=np.int64),
+            np.array(self.pae_offsets, dtype=np.int64),
+        )
+        for name, values in zip(INDEX, index):
+            np.save(os.path.join(self.path, name), values)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ResidueStore:
+    """
+    Read-only, memory-mapped view of a store written by ResidueStoreWriter.
+
+    Only the index is read when the store is opened; the arrays of a row are
+    paged in when they are accessed.
+
+    Example:
+        store = ResidueStore("AFMultimer/AFMultimer_residues")
+        plddt = store.plddt("Beta_endorphin-mu_opioid", 1)
+        pae = store.pae("Beta_endorphin-mu_opioid", 1)
+
+    Args:
+        path (str): Store directory
+    """
+
+    def __init__(self, path):
+        self.path = path
+        ids, ranks, self._plddt_offsets, self._pae_offsets = (
+            np.load(os.path.join(path, name)) for name in INDEX
+        )
+        self._rows = {key: i for i, key in enumerate(zip(ids.tolist(), ranks.tolist()))}
+        self._plddt = np.load(os.path.join(path, PLDDT), mmap_mode="r")
+        self._pae = np.load(os.path.join(path, PAE), mmap_mode="r")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        protein_id, rank = key
+        return (str(protein_id), str(rank)) in self._rows
+
+    def keys(self):
+        """(id, rank) of every row, in store order."""
+        return list(self._rows)
+
+    def _row(self, protein_id, rank):
+        try:
+            return self._rows[(str(protein_id), str(rank))]
+        except KeyError:
+            raise KeyError(f"No residue arrays for {protein_id} rank {rank}") from None
+
+    def plddt(self, protein_id, rank):
+        """(n,) per-residue pLDDT of a row."""
+        i = self._row(protein_id, rank)
+        return self._plddt[self._plddt_offsets[i] : self._plddt_offsets[i + 1]]
+
+    def pae(self, protein_id, rank):
+        """(n, n) PAE matrix of a row, or None if none was stored."""
+        i = self._row(protein_id, rank)
+        start, end = self._pae_offsets[i], self._pae_offsets[i + 1]
+        if start == end:
+            return None
+        n = int(round((end - start) ** 0.5))
+        return self._pae[start:end].reshape(n, n)
+
+
+def write_residue_store(path, rows, loader, archive=None):
+    """
+    Build a residue store from one source file per row.
+
+    Sources are loaded one at a time, so only a single row is held in memory.
+    Archive members are loaded, and so stored, in the order of the archive.
+
+    Args:
+        path (str): Store directory, or its name inside the archive
+        rows (iterable): (id, rank, source path), in store order
+        loader: Function taking a source path and returning (plddt, pae or None)
+        archive: Open tarfile to write the store into instead of path
+    """
+    if archive is not None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = os.path.join(tmp, os.path.basename(path))
+            write_residue_store(store, rows, loader)
+            archive.add(store, arcname=_arcname(path))
+        return
+
+    with ResidueStoreWriter(path) as writer:
+        for protein_id, rank, src in sorted(rows, key=lambda row: read_order(row[2])):
+            try:
+                plddt, pae = loader(src)
+            except (FileNotFoundError, ValueError, KeyError) as e:
+                print(f"Error processing {src}: {e}")
+                plddt, pae = [], None
+            writer.add(protein_id, rank, plddt, pae)
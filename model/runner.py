@@ -0,0 +1,256 @@
+import argparse
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, NamedTuple
+
+from archives import ArchiveTree, is_archive
+from gitobjects import open_tree
+from manifest import Manifest, manifest_path
+from metadata import score_table, write_streamed_metadata
+from profiling import open_profiler, stage
+from residues import write_residue_store
+from scoring import index_natives
+from utils import (
+    _download,
+    add_pipeline_args,
+    check_pipeline_args,
+    open_mirror,
+    pipeline_options,
+)
+
+
+class Adapter(NamedTuple):
+    """
+    What a model adapter plugs into the shared pipeline.
+
+    model : str
+        Folder of the model outputs and label of its profile stages, e.g. "Chai-1".
+    prefix : str
+        Prefix of the metadata and residue store files, e.g. "Chai1".
+    index : callable
+        (input_dir, tree) -> InputIndex of the model outputs.
+    name : callable
+        The adapter's name(), staging the indexed files into the output directory.
+    structure : str
+        Kind of the structure files, "pdb" or "cif".
+    metrics : callable
+        (json_rows, structure_rows, staged, workers, manifest, profiler) -> MetricTable.
+    columns : tuple
+        Metric columns of the metadata, in order, after MAIN_COLUMNS.
+    residue_kind : str
+        Kind of the files the residue store is read from.
+    residue_arrays : callable
+        Path -> (per-residue pLDDT, PAE matrix or None).
+    """
+
+    model: str
+    prefix: str
+    index: Callable
+    name: Callable
+    structure: str
+    metrics: Callable
+    columns: tuple
+    residue_kind: str
+    residue_arrays: Callable
+
+
+@contextmanager
+def model_input(model, path, url, tree=None, mirror=None, profiler=None):
+    """
+    Folder of the outputs of one model, and the tree it is read from.
+
+    Git trees and archives are read in place, nothing is checked out or
+    extracted. A repository URL is cloned into a private temporary directory,
+    so concurrent runs never share a clone, removed on exit. Other paths are
+    local directories of model folders.
+
+    Yields:
+        tuple: (input directory, SourceTree or None)
+    """
+    if tree is None and not url and is_archive(path):
+        tree = ArchiveTree(path)
+    if tree is not None:
+        input_dir = tree.find_dir(model)
+        if input_dir is None:
+            raise FileNotFoundError(f"No {model} folder in {tree}")
+        yield input_dir, tree
+    elif url:
+        with tempfile.TemporaryDirectory(prefix="tmp_", dir=os.getcwd()) as tmp:
+            with stage(profiler, "clone", model):
+                _download(path, tmp, folder_path=f"models/{model}", mirror=mirror)
+            yield os.path.join(tmp, "models", model), None
+    else:
+        yield os.path.join(path, model), None
+
+
+def run_adapter(
+    adapter,
+    path,
+    output_dir,
+    url,
+    workers=1,
+    link_mode="auto",
+    archive=None,
+    incremental=False,
+    use_hash=False,
+    metadata_format="csv",
+    residue_store=False,
+    mirror=None,
+    tree=None,
+    native_dir=None,
+    profiler=None,
+    stream_metadata=False,
+):
+    """
+    Stage the outputs of one model and write its metrics table.
+
+    Args:
+        adapter (Adapter): The model
+        path (str): Repository URL, local directory of model folders, or archive
+        output_dir (str): Output directory, or folder name inside archive
+        url (bool): path is a repository URL to clone
+        workers (int): Number of worker processes
+        link_mode (str): One of LINK_MODES
+        archive (tarfile.TarFile): Open archive to write into instead of output_dir
+        incremental (bool): Reuse metrics of unchanged files through the manifest
+        use_hash (bool): Compare files by hash instead of mtime in the manifest
+        metadata_format (str): One of METADATA_FORMATS
+        residue_store (bool): Also write the per-residue arrays
+        mirror (RepoMirror): Mirror cache to clone from
+        tree (SourceTree): Git tree or archive to read the model outputs from
+        native_dir (str): Directory of natives; adds the score columns
+        profiler (Profiler): Records the stages
+        stream_metadata (bool): Write the metrics table a block of ids at a time
+    """
+    model = adapter.model
+    if stream_metadata and metadata_format != "csv":
+        raise ValueError("Streamed metadata is written as CSV only")
+    if archive is None:
+        os.makedirs(output_dir, exist_ok=True)
+    if url and link_mode == "symlink":
+        # Symlinks would dangle once the temporary clone is removed
+        link_mode = "auto"
+    with model_input(model, path, url, tree, mirror, profiler) as (input_dir, tree):
+        manifest = Manifest(manifest_path(output_dir), use_hash) if incremental else None
+        # One scan of the input; every later stage works from this index
+        with stage(profiler, "index", model) as record:
+            index = adapter.index(input_dir, tree)
+            record["files"] = len(index)
+        with stage(profiler, "name", model) as record:
+            staged = adapter.name(
+                input_dir, output_dir, workers, link_mode, archive, manifest, tree, index
+            )
+            record["files"] = len(staged)
+        json_rows = index.files(output_dir, "json")
+        structure_rows = index.files(output_dir, adapter.structure)
+
+        structures = {(protein_id, rank): staged[f] for protein_id, rank, f in structure_rows}
+        metadata_path = os.path.join(output_dir, f"{adapter.prefix}_metadata")
+
+        if stream_metadata:
+            # Metrics are computed and written a block of ids at a time
+            def block_metrics(block, structure_block):
+                return adapter.metrics(block, structure_block, staged, workers, manifest, profiler)
+
+            # Sorted in place, so the rows are not copied
+            json_rows.sort()
+            with stage(profiler, "metadata", model) as record:
+                record["files"] = write_streamed_metadata(
+                    metadata_path,
+                    json_rows,
+                    structure_rows,
+                    block_metrics,
+                    adapter.columns,
+                    structures,
+                    native_dir,
+                    workers,
+                    archive,
+                )
+        else:
+            table = adapter.metrics(json_rows, structure_rows, staged, workers, manifest, profiler)
+            with stage(profiler, "sort", model):
+                table.sort()
+
+            if native_dir is not None:
+                with stage(profiler, "scoring", model) as record:
+                    score_table(table, structures, index_natives(native_dir), workers)
+                    record["files"] = len(structures)
+
+            with stage(profiler, "metadata", model):
+                table.write(metadata_path, metadata_format, archive)
+        if residue_store:
+            # In the row order of the metadata: predictions with a score JSON,
+            # by (id, rank)
+            keys = {(protein_id, rank) for protein_id, rank, _ in json_rows}
+            rows = sorted(
+                (protein_id, rank, staged[f])
+                for protein_id, rank, f in index.files(output_dir, adapter.residue_kind)
+                if (protein_id, rank) in keys
+            )
+            with stage(profiler, "residue_store", model) as record:
+                write_residue_store(
+                    os.path.join(output_dir, f"{adapter.prefix}_residues"),
+                    rows,
+                    adapter.residue_arrays,
+                    archive,
+                )
+                record["files"] = len(rows)
+        if manifest is not None:
+            manifest.save()
+
+
+def build_adapter_argparser(description):
+    """Command line of a single adapter: input, output, the shared options and natives."""
+    parser = argparse.ArgumentParser(description=description)
+
+    parser.add_argument(
+        "--path",
+        required=True,
+        type=str,
+        help="Path to download the dataset, or a .tar[.gz|.xz|.bz2|.zst] or .zip archive of it.",
+    )
+
+    parser.add_argument(
+        "--output_dir",
+        required=True,
+        type=str,
+        help="Directory to save the processed dataset.",
+    )
+
+    add_pipeline_args(parser)
+
+    parser.add_argument(
+        "--native_dir",
+        type=str,
+        default=None,
+        help="Directory of native structures named <id>_<PDB_ID>.<ext>, as written by "
+        "native/download.py. Adds RMSD, ligand and interface RMSD, Fnat and DockQ columns.",
+    )
+    return parser
+
+
+def adapter_cli(adapter, parser):
+    """Run one adapter from its command line."""
+    args = parser.parse_args()
+    check_pipeline_args(parser, args)
+    url = args.path.startswith("https://")
+    mirror = open_mirror(args)
+    tree = (
+        open_tree(args.path, f"models/{adapter.model}", url, mirror)
+        if args.from_git_objects
+        else None
+    )
+    profiler = open_profiler(args.profile, args.profile_stage, args.profile_memory)
+    run_adapter(
+        adapter,
+        args.path,
+        args.output_dir,
+        url=url,
+        native_dir=args.native_dir,
+        mirror=mirror,
+        tree=tree,
+        **pipeline_options(args, profiler),
+    )
+    if profiler is not None:
+        profiler.write(args.profile, args.profile_format)
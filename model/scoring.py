@@ -0,0 +1,360 @@
+import difflib
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from contacts import contact_pairs
+from manifest import _ordered_map
+from structure import read_cif_atoms, read_pdb_atoms
+
+# Metadata columns added by metadata.score_table
+SCORE_COLUMNS = ("rmsd", "lrmsd", "irmsd", "fnat", "dockq")
+
+# DockQ definitions: residue contacts within 5 A, interface residues within
+# 10 A of the partner chain (heavy atoms)
+CONTACT_CUTOFF = 5.0
+INTERFACE_CUTOFF = 10.0
+BACKBONE = ("N", "CA", "C", "O")
+
+# Native files written by retrieve_natives: <id>_<PDB_ID>.<ext>
+NATIVE_SUFFIXES = (".pdb.gz", ".cif.gz", ".pdb", ".cif")
+
+_ONE_LETTER = {
+    "ALA": "A", "ARG": "R", "ASN": "N", "ASP": "D", "CYS": "C",
+    "GLN": "Q", "GLU": "E", "GLY": "G", "HIS": "H", "ILE": "I",
+    "LEU": "L", "LYS": "K", "MET": "M", "PHE": "F", "PRO": "P",
+    "SER": "S", "THR": "T", "TRP": "W", "TYR": "Y", "VAL": "V",
+    "MSE": "M", "SEC": "U", "PYL": "O",
+}
+
+
+def index_natives(native_dir):
+    """
+    Native structure of every id in a directory written by retrieve_natives.
+
+    Returns:
+        dict: id -> native structure path
+    """
+    natives = {}
+    with os.scandir(native_dir) as entries:
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            lower = entry.name.lower()
+            suffix = next((s for s in NATIVE_SUFFIXES if lower.endswith(s)), None)
+            if suffix is None or not entry.is_file():
+                continue
+            # PDB IDs contain no underscore
+            protein_id = entry.name[: -len(suffix)].rsplit("_", 1)[0]
+            natives.setdefault(protein_id, entry.path)
+    return natives
+
+
+def read_structure(path):
+    """Atoms with coordinates and names of a PDB or mmCIF file, optionally gzipped."""
+    name = str(getattr(path, "path", path)).lower()
+    if name.endswith((".cif", ".cif.gz", ".mmcif")):
+        return read_cif_atoms(path, coordinates=True)
+    return read_pdb_atoms(path)
+
+
+class Match(NamedTuple):
+    """
+    Heavy-atom correspondence between a predicted complex and its native.
+
+    model : np.ndarray
+        (n,) matched atom rows of the prediction.
+    native : np.ndarray
+        (n,) matched atom rows of the native.
+    peptide : np.ndarray
+        (n,) True for peptide atoms, False for receptor atoms.
+    residue : np.ndarray
+        (n,) running index of the matched residue of every atom.
+    backbone : np.ndarray
+        (n,) True for N, CA, C and O atoms.
+    ca : np.ndarray
+        (n,) True for CA atoms.
+    """
+
+    model: np.ndarray
+    native: np.ndarray
+    peptide: np.ndarray
+    residue: np.ndarray
+    backbone: np.ndarray
+    ca: np.ndarray
+
+
+def _residues(atoms):
+    """First and last + 1 atom row, chain index and sequence of every residue."""
+    starts = np.flatnonzero(np.diff(atoms.residue_index, prepend=-1))
+    ends = np.append(starts[1:], len(atoms.residue_index))
+    sequence = "".join(_ONE_LETTER.get(name, "X") for name in atoms.residue_names[starts])
+    return starts, ends, atoms.chain_index[starts], sequence
+
+
+def _is_hydrogen(name):
+    return name.lstrip("0123456789").startswith("H")
+
+
+def match_atoms(model, native):
+    """
+    Pair the atoms of a predicted complex with those of its native.
+
+    The receptor and peptide are the longer and the shorter of the first two
+    model chains, as in the metadata. Each is assigned the native chain of
+    most similar sequence, residues are aligned with difflib and heavy atoms
+    are paired by name within aligned residues.
+
+    Args:
+        model (Atoms): Predicted structure
+        native (Atoms): Native structure
+
+    Returns:
+        Match: Atom correspondence, or None if the chains cannot be paired
+    """
+    if len(model.chains) < 2 or len(native.chains) < 2:
+        return None
+    m_starts, m_ends, m_chain, m_sequence = _residues(model)
+    n_starts, n_ends, n_chain, n_sequence = _residues(native)
+
+    lengths = np.bincount(m_chain, minlength=2)[:2]
+    roles = (0, 1) if lengths[0] >= lengths[1] else (1, 0)
+    m_residues = [np.flatnonzero(m_chain == chain) for chain in roles]
+    n_residues = [np.flatnonzero(n_chain == chain) for chain in range(len(native.chains))]
+    m_seqs = ["".join(m_sequence[i] for i in residues) for residues in m_residues]
+    n_seqs = ["".join(n_sequence[i] for i in residues) for residues in n_residues]
+
+    def similarity(a, b):
+        if a == b:
+            return 1.0
+        return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+    scores = [[similarity(m_seq, n_seq) for n_seq in n_seqs] for m_seq in m_seqs]
+    receptor, peptide = max(
+        ((r, p) for r in range(len(n_seqs)) for p in range(len(n_seqs)) if r != p),
+        key=lambda pair: scores[0][pair[0]] + scores[1][pair[1]],
+    )
+
+    rows = {"model": [], "native": [], "peptide": [], "residue": []}
+    residue = 0
+    for role, native_chain in enumerate((receptor, peptide)):
+        a, b = m_seqs[role], n_seqs[native_chain]
+        # Predictions usually carry the native sequence exactly
+        blocks = [(0, 0, len(a))] if a == b else difflib.SequenceMatcher(
+            None, a, b, autojunk=False
+        ).get_matching_blocks()
+        for a, b, size in blocks:
+            for k in range(size):
+                m_res = m_residues[role][a + k]
+                n_res = n_residues[native_chain][b + k]
+                # First occurrence wins, which drops alternate locations
+                native_atoms = {}
+                for row in range(n_starts[n_res], n_ends[n_res]):
+                    native_atoms.setdefault(native.atom_names[row], row)
+                matched = False
+                for row in range(m_starts[m_res], m_ends[m_res]):
+                    name = model.atom_names[row]
+                    if _is_hydrogen(name) or name not in native_atoms:
+                        continue
+                    rows["model"].append(row)
+                    rows["native"].append(native_atoms.pop(name))
+                    rows["peptide"].append(role == 1)
+                    rows["residue"].append(residue)
+                    matched = True
+                residue += matched
+
+    if not rows["model"]:
+        return None
+    names = model.atom_names[rows["model"]]
+    return Match(
+        model=np.array(rows["model"]),
+        native=np.array(rows["native"]),
+        peptide=np.array(rows["peptide"], dtype=bool),
+        residue=np.array(rows["residue"]),
+        backbone=np.isin(names, BACKBONE),
+        ca=names == "CA",
+    )
+
+
+def superpose(mobile, target):
+    """
+    Batched Kabsch superposition.
+
+    All point sets are fitted at once with a single stacked SVD.
+
+    Args:
+        mobile (np.ndarray): (B, n, 3) point sets to move
+        target (np.ndarray): (n, 3) or (B, n, 3) reference points
+
+    Returns:
+        tuple: (B, 3, 3) rotations and (B, 3) translations, so that
+        mobile @ R^T + t is the least-squares fit onto target
+    """
+    target = np.broadcast_to(target, mobile.shape)
+    mobile_center = mobile.mean(axis=1)
+    target_center = target.mean(axis=1)
+    h = np.einsum(
+        "bni,bnj->bij", mobile - mobile_center[:, None], target - target_center[:, None]
+    )
+    u, _, vt = np.linalg.svd(h)
+    # Flip the smallest axis where needed so that rotations are proper
+    sign = np.where(np.linalg.det(u @ vt) < 0, -1.0, 1.0)
+    vt[:, -1, :] *= sign[:, None]
+    rotation = np.einsum("bji,bkj->bik", vt, u)
+    translation = target_center - np.einsum("bij,bj->bi", rotation, mobile_center)
+    return rotation, translation
+
+
+def _transform(points, rotation, translation):
+    return np.einsum("bnj,bij->bni", points, rotation) + translation[:, None]
+
+
+def _rmsd(a, b):
+    return np.sqrt(((a - b) ** 2).sum(axis=-1).mean(axis=-1))
+
+
+def kabsch_rmsd(mobile, target):
+    """
+    RMSD of every point set after optimal superposition onto target.
+
+    Args:
+        mobile (np.ndarray): (B, n, 3) point sets
+        target (np.ndarray): (n, 3) reference points
+
+    Returns:
+        np.ndarray: (B,) RMSD, NaN when fewer than 3 points are given
+    """
+    if mobile.shape[1] < 3:
+        return np.full(len(mobile), np.nan)
+    rotation, translation = superpose(mobile, target)
+    return _rmsd(_transform(mobile, rotation, translation), target)
+
+
+def _residue_contacts(coords, match, cutoff):
+    """Receptor-peptide residue contacts, encoded as receptor * n + peptide."""
+    n = int(match.residue.max()) + 1
+    receptor, peptide = ~match.peptide, match.peptide
+    i, j = contact_pairs(coords[receptor], coords[peptide], cutoff)
+    return np.unique(match.residue[receptor][i] * n + match.residue[peptide][j]), n
+
+
+def dockq_scores(model_coords, native_coords, match):
+    """
+    Structural scores of B predictions of the same complex against its native.
+
+    rmsd is the CA RMSD after superposition, lrmsd the peptide backbone RMSD
+    after superposition of the receptor backbone, irmsd the backbone RMSD of
+    the native interface residues after their superposition, fnat the
+    fraction of native residue contacts that are reproduced and dockq their
+    combination (Basu & Wallner, 2016).
+
+    Args:
+        model_coords (np.ndarray): (B, n, 3) matched prediction coordinates
+        native_coords (np.ndarray): (n, 3) matched native coordinates
+        match (Match): Atom correspondence
+
+    Returns:
+        dict: SCORE_COLUMNS -> (B,) np.ndarray
+    """
+    receptor, peptide = ~match.peptide, match.peptide
+    native_contacts, n = _residue_contacts(native_coords, match, CONTACT_CUTOFF)
+    if len(native_contacts):
+        fnat = np.array(
+            [
+                np.isin(native_contacts, _residue_contacts(coords, match, CONTACT_CUTOFF)[0]).mean()
+                for coords in model_coords
+            ]
+        )
+    else:
+        fnat = np.full(len(model_coords), np.nan)
+
+    contacts, _ = _residue_contacts(native_coords, match, INTERFACE_CUTOFF)
+    interface = np.isin(match.residue, np.concatenate([contacts // n, contacts % n]))
+    selection = interface & match.backbone
+    irmsd = kabsch_rmsd(model_coords[:, selection], native_coords[selection])
+
+    fit = receptor & match.backbone
+    if fit.sum() >= 3 and (peptide & match.backbone).any():
+        rotation, translation = superpose(model_coords[:, fit], native_coords[fit])
+        moved = _transform(model_coords[:, peptide & match.backbone], rotation, translation)
+        lrmsd = _rmsd(moved, native_coords[peptide & match.backbone])
+    else:
+        lrmsd = np.full(len(model_coords), np.nan)
+
+    rmsd = kabsch_rmsd(model_coords[:, match.ca], native_coords[match.ca])
+    dockq = (fnat + 1 / (1 + (irmsd / 1.5) ** 2) + 1 / (1 + (lrmsd / 8.5) ** 2)) / 3
+    return {"rmsd": rmsd, "lrmsd": lrmsd, "irmsd": irmsd, "fnat": fnat, "dockq": dockq}
+
+
+def score_batch(task):
+    """
+    Score every rank of one prediction against its native.
+
+    The native is read and matched once; ranks sharing a topology (usually
+    all of them) are stacked and scored together.
+
+    Args:
+        task (tuple): (native path, list of predicted structure sources)
+
+    Returns:
+        list: One dict of SCORE_COLUMNS per source, NaN where it cannot be scored
+    """
+    native_path, sources = task
+    results = [dict.fromkeys(SCORE_COLUMNS, float("nan")) for _ in sources]
+    try:
+        native = read_structure(native_path)
+    except (OSError, ValueError) as e:
+        print(f"Error processing {native_path}: {e}")
+        return results
+
+    groups = {}
+    for k, src in enumerate(sources):
+        try:
+            atoms = read_structure(src)
+        except (OSError, ValueError) as e:
+            print(f"Error processing {src}: {e}")
+            continue
+        topology = (
+            tuple(atoms.chains),
+            atoms.chain_index.tobytes(),
+            atoms.residue_index.tobytes(),
+            atoms.residue_names.tobytes(),
+            atoms.atom_names.tobytes(),
+        )
+        groups.setdefault(topology, (atoms, []))[1].append((k, atoms.coords))
+
+    for atoms, members in groups.values():
+        match = match_atoms(atoms, native)
+        if match is None:
+            print(f"Cannot match {sources[members[0][0]]} to native {native_path}")
+            continue
+        coords = np.stack([coords[match.model] for _, coords in members])
+        scores = dockq_scores(coords, native.coords[match.native], match)
+        for row, (k, _) in enumerate(members):
+            results[k] = {column: round(float(scores[column][row]), 3) for column in SCORE_COLUMNS}
+    return results
+
+
+def native_scores(structures, natives, workers=1):
+    """
+    SCORE_COLUMNS of every prediction with a native.
+
+    Args:
+        structures (dict): (id, rank) -> predicted structure source
+        natives (dict): id -> native structure path, see index_natives
+        workers (int): Number of worker processes, one prediction id per task
+
+    Returns:
+        dict: (id, rank) -> dict of SCORE_COLUMNS
+    """
+    batches = {}
+    for (protein_id, rank), src in structures.items():
+        if protein_id in natives:
+            batches.setdefault(protein_id, []).append((rank, src))
+
+    tasks = [(natives[protein_id], [src for _, src in ranks]) for protein_id, ranks in batches.items()]
+    scored = _ordered_map(score_batch, tasks, [sources[0] for _, sources in tasks], workers)
+    return {
+        (protein_id, rank): scores
+        for (protein_id, ranks), batch in zip(batches.items(), scored)
+        for (rank, _), scores in zip(ranks, batch)
+    }
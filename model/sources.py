@@ -0,0 +1,81 @@
+import gzip
+import io
+import os
+import posixpath
+
+
+def is_stream_source(src):
+    """True for sources read through src.open() (git Blobs, archive Members) rather than paths."""
+    return not isinstance(src, (str, os.PathLike))
+
+
+def open_source(src, mode="r"):
+    """open() for file paths and stream sources alike ("r" or "rb"); .gz paths are decompressed."""
+    if not is_stream_source(src):
+        if str(src).endswith(".gz"):
+            return gzip.open(src, mode if "b" in mode else "rt")
+        return open(src, mode)
+    raw = src.open()
+    return raw if "b" in mode else io.TextIOWrapper(raw)
+
+
+def read_order(src):
+    """
+    Sort key placing stream sources in storage order.
+
+    Members of a compressed tar can only be reached by decompressing
+    everything before them, so reading them by increasing offset costs a
+    single pass instead of one per backward jump.
+    """
+    return getattr(src, "offset", 0)
+
+
+class SourceTree:
+    """
+    Directory view over a flat list of file paths and their stream sources.
+
+    listdir, isdir and exists mirror the os functions for paths relative to
+    the tree root, so directory walks written for a checkout work unchanged,
+    and blob() resolves a file path to its source.
+    """
+
+    def __init__(self):
+        self._blobs = {}
+        self._children = {}
+
+    def _add(self, path, source):
+        self._blobs[path] = source
+        # Register every parent directory
+        child = path
+        while child:
+            parent = posixpath.dirname(child)
+            self._children.setdefault(parent, set()).add(posixpath.basename(child))
+            child = parent
+
+    def _key(self, path):
+        return posixpath.normpath(path).lstrip("/") if path not in ("", ".") else ""
+
+    def listdir(self, path):
+        try:
+            return sorted(self._children[self._key(path)])
+        except KeyError:
+            raise FileNotFoundError(f"No directory {path} in {self}") from None
+
+    def isdir(self, path):
+        return self._key(path) in self._children
+
+    def exists(self, path):
+        key = self._key(path)
+        return key in self._blobs or key in self._children
+
+    def blob(self, path):
+        return self._blobs[self._key(path)]
+
+    def blobs(self):
+        """Every listed source."""
+        return list(self._blobs.values())
+
+    def find_dir(self, name):
+        """Shallowest directory called name, or None."""
+        matches = [d for d in self._children if posixpath.basename(d) == name]
+        return min(matches, key=lambda d: (d.count("/"), d)) if matches else None
@@ -0,0 +1,370 @@
+import re
+from array import array
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from sources import open_source
+
+
+class Atoms(NamedTuple):
+    """
+    Per-atom arrays read from a predicted structure.
+
+    chains : list
+        Chain identifiers in order of first appearance.
+    chain_index : np.ndarray
+        (n_atoms,) index into chains for every atom.
+    residue_index : np.ndarray
+        (n_atoms,) running residue number, unique across chains.
+    b_factors : np.ndarray
+        (n_atoms,) B-factor column, which holds pLDDT for predicted models.
+    resseq : np.ndarray, optional
+        (n_atoms,) author residue sequence number.
+    coords : np.ndarray, optional
+        (n_atoms, 3) Cartesian coordinates.
+    atom_names : np.ndarray, optional
+        (n_atoms,) atom names, e.g. "CA".
+    residue_names : np.ndarray, optional
+        (n_atoms,) residue names, e.g. "ALA".
+    """
+
+    chains: list
+    chain_index: np.ndarray
+    residue_index: np.ndarray
+    b_factors: np.ndarray
+    resseq: Optional[np.ndarray] = None
+    coords: Optional[np.ndarray] = None
+    atom_names: Optional[np.ndarray] = None
+    residue_names: Optional[np.ndarray] = None
+
+
+_CIF_CHAIN_COLUMNS = ("_atom_site.auth_asym_id", "_atom_site.label_asym_id")
+_CIF_RESIDUE_COLUMNS = ("_atom_site.auth_seq_id", "_atom_site.label_seq_id")
+_CIF_B_COLUMNS = ("_atom_site.B_iso_or_equiv", "_atom_site.pLDDT")
+_CIF_COORD_COLUMNS = ("_atom_site.Cartn_x", "_atom_site.Cartn_y", "_atom_site.Cartn_z")
+_CIF_ATOM_COLUMNS = ("_atom_site.label_atom_id", "_atom_site.auth_atom_id")
+_CIF_COMP_COLUMNS = ("_atom_site.label_comp_id", "_atom_site.auth_comp_id")
+
+
+def _column(columns, candidates):
+    for name in candidates:
+        if name in columns:
+            return columns.index(name)
+    return None
+
+
+def _to_atoms(chains, chain_index, residue_index, b_factors, extra=None):
+    atoms = Atoms(
+        chains=chains,
+        chain_index=np.frombuffer(chain_index, dtype=np.int32),
+        residue_index=np.frombuffer(residue_index, dtype=np.int32),
+        b_factors=np.frombuffer(b_factors, dtype=np.float64),
+    )
+    if extra is None:
+        return atoms
+    resseq, coords, atom_names, residue_names = extra
+    return atoms._replace(
+        resseq=np.frombuffer(resseq, dtype=np.int32),
+        coords=np.frombuffer(coords, dtype=np.float64).reshape(-1, 3),
+        atom_names=np.array(atom_names, dtype=str),
+        residue_names=np.array(residue_names, dtype=str),
+    )
+
+
+def read_cif_atoms(cif_path, coordinates=False):
+    """
+    Read the _atom_site loop of an mmCIF file in a single streaming pass.
+
+    Only the atom_site rows are kept, packed into typed arrays, and the file is
+    closed as soon as the loop ends, so memory stays proportional to the atom
+    count rather than the file size.
+
+    Args:
+        cif_path (str): Path to the CIF file
+        coordinates (bool): Also read resseq, coordinates, atom and residue
+            names. Only the ATOM records of the first model are kept then
+
+    Returns:
+        Atoms: Per-atom chain index, residue index and B-factor arrays
+    """
+    chains = []
+    chain_ids = {}
+    chain_index = array("i")
+    residue_index = array("i")
+    b_factors = array("d")
+    extra = (array("i"), array("d"), [], []) if coordinates else None
+
+    with open_source(cif_path, "r") as f:
+        # Find the atom_site column header
+        columns = []
+        line = ""
+        for line in f:
+            stripped = line.strip()
+            if stripped.startswith("loop_"):
+                columns = []
+            elif stripped.startswith("_atom_site."):
+                columns.append(stripped.split()[0])
+            elif columns:
+                break
+        else:
+            line = ""
+
+        b_col = _column(columns, _CIF_B_COLUMNS)
+        chain_col = _column(columns, _CIF_CHAIN_COLUMNS)
+        res_col = _column(columns, _CIF_RESIDUE_COLUMNS)
+        if b_col is None or chain_col is None or res_col is None:
+            return _to_atoms(chains, chain_index, residue_index, b_factors, extra)
+        n_required = max(b_col, chain_col, res_col) + 1
+        if coordinates:
+            coord_cols = [_column(columns, (name,)) for name in _CIF_COORD_COLUMNS]
+            atom_col = _column(columns, _CIF_ATOM_COLUMNS)
+            comp_col = _column(columns, _CIF_COMP_COLUMNS)
+            group_col = _column(columns, ("_atom_site.group_PDB",))
+            model_col = _column(columns, ("_atom_site.pdbx_PDB_model_num",))
+            if None in coord_cols or atom_col is None or comp_col is None:
+                return _to_atoms(chains, chain_index, residue_index, b_factors, extra)
+            n_required = max(n_required, *coord_cols, atom_col, comp_col) + 1
+            first_model = None
+
+        # Parse data rows until the loop ends
+        residue = -1
+        previous = None
+        while line:
+            row = line.strip()
+            if not row or row[0] in "#_" or row.startswith("loop_"):
+                break
+            fields = row.split()
+            line = f.readline()
+            if len(fields) < n_required:
+                continue
+            try:
+                b = float(fields[b_col])
+            except ValueError:
+                continue
+            if coordinates:
+                if group_col is not None and fields[group_col] != "ATOM":
+                    continue
+                if model_col is not None:
+                    if first_model is None:
+                        first_model = fields[model_col]
+                    elif fields[model_col] != first_model:
+                        break
+                try:
+                    xyz = [float(fields[col]) for col in coord_cols]
+                    resseq = int(fields[res_col])
+                except ValueError:
+                    continue
+                extra[0].append(resseq)
+                extra[1].extend(xyz)
+                extra[2].append(fields[atom_col].strip('"'))
+                extra[3].append(fields[comp_col])
+
+            chain = fields[chain_col]
+            if chain not in chain_ids:
+                chain_ids[chain] = len(chains)
+                chains.append(chain)
+            key = (chain, fields[res_col])
+            if key != previous:
+                residue += 1
+                previous = key
+
+            chain_index.append(chain_ids[chain])
+            residue_index.append(residue)
+            b_factors.append(b)
+
+    return _to_atoms(chains, chain_index, residue_index, b_factors, extra)
+
+
+# One mmCIF value: a quoted string, ending at a quote followed by a blank, or a bare word
+_CIF_TOKEN = re.compile(r"""'(.*?)'(?=\s|$)|"(.*?)"(?=\s|$)|(\S+)""")
+
+
+def _cif_tokens(line):
+    return [single or double or bare for single, double, bare in _CIF_TOKEN.findall(line)]
+
+
+def cif_chains(cif_path, max_chains=None):
+    """
+    Chain identifiers of the polypeptide entities of an mmCIF file.
+
+    Only the _entity_poly loop is read; the file is closed once it ends, or
+    once max_chains chains are found, so the atom records are never parsed.
+    Rows may span several lines, as the one-letter sequences are usually
+    ;-delimited text fields.
+
+    Args:
+        cif_path (str): Path to the CIF file
+        max_chains (int, optional): Stop reading once this many chains are found
+
+    Returns:
+        list: Strand identifiers of the polypeptide(L) entities, in entity order
+    """
+    chains = []
+    columns = []
+    values = []
+    text = None
+    with open_source(cif_path, "r") as f:
+        for line in f:
+            if text is not None:
+                # Inside a text field, which ends at a line starting with ;
+                if not line.startswith(";"):
+                    text.append(line)
+                    continue
+                values.append("".join(text).rstrip("\n"))
+                text = None
+                values.extend(_cif_tokens(line[1:]))
+            elif columns and line.startswith(";"):
+                text = [line[1:]]
+                continue
+            else:
+                stripped = line.strip()
+                if stripped.startswith("_entity_poly."):
+                    columns.append(stripped.split()[0])
+                    continue
+                if not columns:
+                    continue
+                if not stripped or stripped[0] in "#_" or stripped.startswith("loop_"):
+                    break
+                values.extend(_cif_tokens(stripped))
+
+            strand_col = _column(columns, ("_entity_poly.pdbx_strand_id",))
+            type_col = _column(columns, ("_entity_poly.type",))
+            if strand_col is None or type_col is None:
+                break
+            while len(values) >= len(columns):
+                row, values = values[: len(columns)], values[len(columns) :]
+                if row[type_col] == "polypeptide(L)":
+                    chains.extend(row[strand_col].split(","))
+                    if max_chains and len(chains) >= max_chains:
+                        return chains[:max_chains]
+    return chains
+
+
+def read_pdb_atoms(pdb_path):
+    """
+    Read the ATOM records of the first model of a PDB file.
+
+    Records are padded to the fixed 80-column layout and viewed as a single
+    (n_atoms, 80) byte array, so chain, residue number, coordinates and
+    B-factor are sliced out column-wise instead of parsed line by line.
+
+    Args:
+        pdb_path (str): Path to the PDB file
+
+    Returns:
+        Atoms: Per-atom chain index, residue index, resseq, B-factor,
+        coordinate, atom name and residue name arrays
+    """
+    records = []
+    with open_source(pdb_path, "rb") as f:
+        for line in f:
+            if line.startswith(b"ATOM"):
+                records.append(line[:80].rstrip(b"\r\n").ljust(80))
+            elif line.startswith(b"ENDMDL"):
+                break
+
+    n_atoms = len(records)
+    if not n_atoms:
+        return Atoms(
+            chains=[],
+            chain_index=np.zeros(0, dtype=np.int32),
+            residue_index=np.zeros(0, dtype=np.int32),
+            b_factors=np.zeros(0),
+            resseq=np.zeros(0, dtype=np.int32),
+            coords=np.zeros((0, 3)),
+            atom_names=np.zeros(0, dtype=str),
+            residue_names=np.zeros(0, dtype=str),
+        )
+    table = np.frombuffer(b"".join(records), dtype="S1").reshape(n_atoms, 80)
+
+    def field(start, end, width):
+        return np.ascontiguousarray(table[:, start:end]).view(f"S{width}")
+
+    chain_codes = table[:, 21]
+    resseq = field(22, 26, 4)[:, 0].astype(np.int32)
+    insertion = table[:, 26]
+    coords = field(30, 54, 8).astype(np.float64)
+    b_factors = field(60, 66, 6)[:, 0].astype(np.float64)
+    atom_names = np.char.strip(field(12, 16, 4)[:, 0].astype(str))
+    residue_names = np.char.strip(field(17, 20, 3)[:, 0].astype(str))
+
+    # Chains in order of first appearance
+    codes, first = np.unique(chain_codes, return_index=True)
+    order = np.argsort(first)
+    chains = [codes[i].decode() for i in order]
+    rank = np.empty(len(codes), dtype=np.int32)
+    rank[order] = np.arange(len(codes), dtype=np.int32)
+    chain_index = rank[np.searchsorted(codes, chain_codes)]
+
+    # A new residue starts wherever chain, resseq or insertion code changes
+    new_residue = np.ones(n_atoms, dtype=bool)
+    new_residue[1:] = (
+        (chain_codes[1:] != chain_codes[:-1])
+        | (resseq[1:] != resseq[:-1])
+        | (insertion[1:] != insertion[:-1])
+    )
+    residue_index = (np.cumsum(new_residue) - 1).astype(np.int32)
+
+    return Atoms(
+        chains=chains,
+        chain_index=chain_index,
+        residue_index=residue_index,
+        b_factors=b_factors,
+        resseq=resseq,
+        coords=coords,
+        atom_names=atom_names,
+        residue_names=residue_names,
+    )
+
+
+def residue_plddt(atoms):
+    """
+    Mean pLDDT of every residue.
+
+    Returns:
+        tuple: (per-residue pLDDT, per-residue chain index) as np.ndarray
+    """
+    if not len(atoms.b_factors):
+        return np.zeros(0), np.zeros(0, dtype=np.int32)
+    counts = np.bincount(atoms.residue_index)
+    sums = np.bincount(atoms.residue_index, weights=atoms.b_factors)
+    residue_chain = np.zeros(len(counts), dtype=np.int32)
+    residue_chain[atoms.residue_index] = atoms.chain_index
+    return sums / counts, residue_chain
+
+
+def chain_plddt(atoms):
+    """
+    Mean residue pLDDT and residue count of every chain.
+
+    Returns:
+        tuple: (per-chain pLDDT, per-chain residue count) aligned with atoms.chains
+    """
+    plddt, residue_chain = residue_plddt(atoms)
+    n_chains = len(atoms.chains)
+    lengths = np.bincount(residue_chain, minlength=n_chains)
+    sums = np.bincount(residue_chain, weights=plddt, minlength=n_chains)
+    return np.divide(sums, lengths, out=np.zeros(n_chains), where=lengths > 0), lengths
+
+
+def peptide_receptor_plddt(atoms):
+    """
+    pLDDT of the receptor and peptide chains.
+
+    The peptide is the shorter of the first two chains and the receptor the
+    other one, matching the two-letter chains column of the metadata.
+
+    Returns:
+        dict: receptor_plddt, peptide_plddt
+    """
+    plddt, lengths = chain_plddt(atoms)
+    if len(plddt) == 0:
+        return {"receptor_plddt": 0.0, "peptide_plddt": 0.0}
+    if len(plddt) == 1:
+        return {"receptor_plddt": round(float(plddt[0]), 3), "peptide_plddt": 0.0}
+    receptor, peptide = (0, 1) if lengths[0] >= lengths[1] else (1, 0)
+    return {
+        "receptor_plddt": round(float(plddt[receptor]), 3),
+        "peptide_plddt": round(float(plddt[peptide]), 3),
+    }
@@ -1,5 +1,14 @@
 import os, shutil, re
+import importlib.util
+import io
 import subprocess
+import tarfile
+import time
+from contextlib import contextmanager
+
+from mirror import DEFAULT_MIRROR_DIR, RepoMirror
+from profiling import PROFILE_FORMATS
+from sources import is_stream_source, read_order
 
 
 def _extract(filename, separator, pattern=r"_rank_(\d+)_"):
@@ -23,72 +32,326 @@ def _extract(filename, separator, pattern=r"_rank_(\d+)_"):
     return None, None
 
 
-def _process_file_afm(file_path, filename, output_path, pattern="_relaxed_", format="pdb"):
+def _init_worker():
+    # Forked workers inherit the tracemalloc hooks of a --profile_memory run;
+    # their allocations never reach the parent's peaks, so it only slows them
+    import tracemalloc
+
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _parallel_map(func, items, workers=1):
     """
-    Process a single file for renaming and copying.
+    Apply func to every item, optionally spread over a process pool.
+
+    Results are returned in the order of items regardless of the number of
+    workers, so downstream output is identical to a serial run.
 
     Args:
-        file_path: Full path to the file
-        filename: Just the filename
-        output_path: Output directory path
+        func: Picklable module-level function taking a single argument
+        items: Iterable of arguments
+        workers: Number of worker processes (<= 1 runs in-process)
+
+    Returns:
+        list: func(item) for each item
+    """
+    items = list(items)
+    if not workers or workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    # multiprocessing is only loaded by runs that use it
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(workers, len(items))
+    chunksize = max(1, len(items) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(func, items, chunksize=chunksize))
+
+
+LINK_MODES = ("auto", "reflink", "hardlink", "symlink", "copy")
+
+# Linux FICLONE ioctl: share the source extents (btrfs, XFS, overlayfs, ...)
+_FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    import fcntl
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+    shutil.copystat(src, dst)
+
+
+def _stage_file(src, dst, link_mode="auto"):
+    """
+    Place src at dst without copying data whenever the filesystem allows it.
+
+    "auto" tries a reflink, then a hardlink and finally falls back to
+    shutil.copy2. An explicit mode that is not supported (e.g. a hardlink
+    across devices) also falls back to a copy.
+
+    Args:
+        src: Source file path
+        dst: Destination file path, replaced if it exists
+        link_mode: One of LINK_MODES
+
+    Returns:
+        str: The mode that was actually used
+    """
+    if link_mode not in LINK_MODES:
+        raise ValueError(f"Invalid link mode: {link_mode!r}")
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    if is_stream_source(src):
+        # Nothing to link to: stream the object or member contents
+        with src.open() as fsrc, open(dst, "wb") as fdst:
+            shutil.copyfileobj(fsrc, fdst, 1 << 20)
+        return "copy"
+
+    if link_mode in ("auto", "reflink"):
+        try:
+            _reflink(src, dst)
+            return "reflink"
+        except (OSError, ImportError):
+            if os.path.lexists(dst):
+                os.remove(dst)
+    if link_mode in ("auto", "hardlink"):
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+    if link_mode == "symlink":
+        try:
+            os.symlink(os.path.abspath(src), dst)
+            return "symlink"
+        except OSError:
+            pass
+
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def _stage_pair(task):
+    src, dst, link_mode = task
+    return _stage_file(src, dst, link_mode)
+
+
+def _arcname(dst):
+    """Archive member name of a staged file: <output folder>/<filename>."""
+    return "/".join([os.path.basename(os.path.dirname(dst)), os.path.basename(dst)])
+
+
+def _archive_dir(archive, arcname):
+    """Add a directory entry to an open tar archive."""
+    info = tarfile.TarInfo(arcname)
+    info.type = tarfile.DIRTYPE
+    info.mode = 0o755
+    info.mtime = int(time.time())
+    archive.addfile(info)
+
+
+def _archive_bytes(archive, arcname, data):
+    """Add an in-memory file to an open tar archive."""
+    info = tarfile.TarInfo(arcname)
+    info.size = len(data)
+    info.mode = 0o644
+    info.mtime = int(time.time())
+    archive.addfile(info, io.BytesIO(data))
+
+
+def _archive_blob(archive, arcname, blob):
+    """Stream a git Blob or archive Member into an open tar archive."""
+    info = tarfile.TarInfo(arcname)
+    info.size = blob.size
+    info.mode = 0o644
+    info.mtime = int(time.time())
+    with blob.open() as f:
+        archive.addfile(info, f)
+
+
+def _stage_files(pairs, workers=1, link_mode="auto", archive=None, manifest=None):
+    """
+    Stage (source, destination) pairs, optionally in parallel.
+
+    When several sources map to the same destination the last one wins, as it
+    would when copying one file at a time. If an open tar archive is given the
+    sources are written straight into it under their new names and nothing is
+    created on disk. Sources may also be git Blobs or archive Members, which
+    are streamed from the object store or archive in storage order.
+
+    With a manifest, destinations that already exist and whose source is
+    unchanged since the last run are left as they are.
+
+    Returns:
+        dict: destination path -> source path for every staged file
+    """
+    targets = {}
+    for src, dst in pairs:
+        targets.pop(dst, None)
+        targets[dst] = src
+    ordered = sorted(targets.items(), key=lambda item: read_order(item[1]))
+
+    if archive is not None:
+        for dst, src in ordered:
+            if is_stream_source(src):
+                _archive_blob(archive, _arcname(dst), src)
+            else:
+                archive.add(src, arcname=_arcname(dst), recursive=False)
+    else:
+        tasks = [
+            (src, dst, link_mode)
+            for dst, src in ordered
+            if manifest is None
+            or not (os.path.exists(dst) and manifest.unchanged(dst, src))
+        ]
+        _parallel_map(_stage_pair, tasks, workers)
+    return targets
+
+
+METADATA_FORMATS = ("csv", "parquet", "both")
+
+
+def parquet_engine():
+    """Installed pandas Parquet engine, or None."""
+    for engine in ("pyarrow", "fastparquet"):
+        if importlib.util.find_spec(engine) is not None:
+            return engine
+    return None
+
+
+def _typed(dfs):
+    """Metadata DataFrame with explicit column types for columnar output."""
+    dfs = dfs.astype({c: "string" for c in ("id", "chains") if c in dfs.columns})
+    if "rank" in dfs.columns:
+        try:
+            dfs["rank"] = dfs["rank"].astype("int32")
+        except ValueError:
+            dfs["rank"] = dfs["rank"].astype("string")
+    return dfs.reset_index(drop=True)
+
+
+def _write_parquet(dfs, parquet_path, archive=None):
+    """Write a metadata DataFrame to parquet_path, or into the archive under the same name."""
+    if archive is not None:
+        buffer = io.BytesIO()
+        _typed(dfs).to_parquet(buffer, index=False)
+        _archive_bytes(archive, _arcname(parquet_path), buffer.getvalue())
+    else:
+        _typed(dfs).to_parquet(parquet_path, index=False)
+
+
+# Archive suffix and default level of each supported compression codec
+COMPRESSIONS = {
+    "none": ("", None),
+    "gzip": (".gz", 6),
+    "xz": (".xz", 6),
+    "zstd": (".zst", 3),
+}
+
+
+def archive_suffix(compression="none"):
+    """File suffix of a tar archive written with the given compression."""
+    return ".tar" + COMPRESSIONS[compression][0]
+
+
+def _compressor_command(compression, level, threads):
     """
-    # Process PDB files with "_relaxed_"
-    if pattern in filename and filename.endswith(f".{format}"):
-        id_part, rank = _extract(filename, pattern)
-        if id_part and rank:
-            new_filename = f"{id_part}_{rank}.{format}"
-            dst_path = os.path.join(output_path, new_filename)
-            shutil.copy2(file_path, dst_path)
-
-def _process_file_chai1(id, file_path, filename, output_path, pattern=".rank_", format="cif"):
+    Command line of a multithreaded external compressor writing to stdout, or
+    None if no suitable binary is installed.
     """
-    Process a single file for renaming and copying.
+    threads = threads or os.cpu_count() or 1
+    if compression == "zstd" and shutil.which("zstd"):
+        ultra = ["--ultra"] if level > 19 else []
+        return ["zstd", "-q", "-c", *ultra, f"-{level}", f"-T{threads}"]
+    if compression == "xz" and shutil.which("xz"):
+        return ["xz", "-c", f"-{level}", f"-T{threads}"]
+    if compression == "gzip" and shutil.which("pigz"):
+        return ["pigz", "-c", f"-{level}", "-p", str(threads)]
+    return None
+
+
+def compression_available(compression):
+    """Whether archives can be written with compression here, see _open_archive."""
+    if compression == "zstd":
+        return bool(shutil.which("zstd")) or importlib.util.find_spec("zstandard") is not None
+    return compression in COMPRESSIONS
+
+
+@contextmanager
+def _open_archive(path, compression="none", level=None, threads=0, dereference=False):
+    """
+    Open a tar archive for writing, optionally compressed.
+
+    The tar stream is piped through a multithreaded compressor (zstd -T,
+    xz -T or pigz) when one is installed. Otherwise gzip and xz fall back to
+    the single-threaded standard library codecs and zstd to the optional
+    zstandard package.
 
     Args:
-        file_path: Full path to the file
-        filename: Just the filename
-        output_path: Output directory path
+        path: Archive path
+        compression: One of COMPRESSIONS
+        level: Compression level, codec default if None
+        threads: Compressor threads, 0 uses every core
+
+    Yields:
+        tarfile.TarFile: Archive open for writing
     """
-    # Process PDB files with "_relaxed_"
-    if filename.endswith(f".{format}"):
-        rank = int(filename.split(pattern)[1].split(".")[0]) + 1
-        if id and rank:
-            new_filename = f"{id}_{rank}.{format}"
-            dst_path = os.path.join(output_path, new_filename)
-            shutil.copy2(file_path, dst_path)      
-
-
-
-def _process_file_helixfold3(input_path, subdir_path, output_path):
-    """Process individual job subdirectories within a main result folder"""
-    subdir_name = os.path.basename(subdir_path)
-    
-    # Extract ID and rank from job directory name 
-    if subdir_name.startswith("job-") and "-rank" in subdir_name:
-        parts = subdir_name[4:]  # Remove "job-" prefix
-        rank_index = parts.rfind("-rank")
-        if rank_index != -1:
-            ids = parts[:rank_index].split("-")[:-1]
-            id = "-".join(ids)
-            rank = parts[rank_index + 5:]
-
-            json_src = os.path.join(subdir_path, "all_results.json")
-            cif_src = os.path.join(subdir_path, "predicted_structure.cif")
-
-            json_dst = os.path.join(output_path, f"{id}_{rank}.json")
-            cif_dst = os.path.join(output_path, f"{id}_{rank}.cif")
-            
-            if os.path.exists(json_src):
-                shutil.copy2(json_src, json_dst)
-            if os.path.exists(cif_src):
-                shutil.copy2(cif_src, cif_dst)
-
-
-def _download(repo_url, destination, folder_path="models/AFMultimer"):
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Invalid compression: {compression!r}")
+    if level is None:
+        level = COMPRESSIONS[compression][1]
+
+    if compression == "none":
+        with tarfile.open(path, "w", dereference=dereference) as tar:
+            yield tar
+        return
+
+    command = _compressor_command(compression, level, threads)
+    if command:
+        with open(path, "wb") as out:
+            proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=out)
+            try:
+                with tarfile.open(
+                    fileobj=proc.stdin, mode="w|", dereference=dereference
+                ) as tar:
+                    yield tar
+            finally:
+                proc.stdin.close()
+                returncode = proc.wait()
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, command)
+    elif compression == "gzip":
+        with tarfile.open(path, "w:gz", compresslevel=level, dereference=dereference) as tar:
+            yield tar
+    elif compression == "xz":
+        with tarfile.open(path, "w:xz", preset=level, dereference=dereference) as tar:
+            yield tar
+    else:
+        import zstandard
+
+        compressor = zstandard.ZstdCompressor(level=level, threads=threads or -1)
+        with open(path, "wb") as out, compressor.stream_writer(out) as writer:
+            with tarfile.open(fileobj=writer, mode="w|", dereference=dereference) as tar:
+                yield tar
+
+
+def _download(repo_url, destination, folder_path="models/AFMultimer", mirror=None):
     """
     Download a specific folder using partial clone with tree filter.
+
+    folder_path may also be a list of folders, which are all checked out from
+    the same clone. With a RepoMirror, the folders are checked out as a sparse
+    worktree of the cached mirror instead of a fresh clone.
     """
+    folders = [folder_path] if isinstance(folder_path, str) else folder_path
     try:
+        if mirror is not None:
+            mirror.checkout(repo_url, destination, folders)
+            return
+
         # Create destination directory
         os.makedirs(destination, exist_ok=True)
 
@@ -117,7 +380,8 @@ def _download(repo_url, destination, folder_path="models/AFMultimer"):
             destination, ".git", "info", "sparse-checkout"
         )
         with open(sparse_checkout_file, "w") as f:
-            f.write(f"{folder_path}/*\n")
+            for folder in folders:
+                f.write(f"{folder}/*\n")
 
         # Checkout only the specified folder
         subprocess.run(["git", "checkout"], cwd=destination, check=True)
@@ -126,5 +390,150 @@ def _download(repo_url, destination, folder_path="models/AFMultimer"):
         print(f"Partial clone failed: {e}")
         raise
 
-if __name__ == "__main__":
-    pass
+
+def add_pipeline_args(parser):
+    """Add the options shared by model.py and every adapter CLI to parser."""
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes for copying and metric extraction. Default: 1.",
+    )
+
+    parser.add_argument(
+        "--link_mode",
+        choices=LINK_MODES,
+        default="auto",
+        help="How files are staged into the output directory. 'auto' tries reflink, "
+        "then hardlink, then copy. Default: auto.",
+    )
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse metrics of files unchanged since the last run, using a manifest "
+        "stored next to the model output.",
+    )
+
+    parser.add_argument(
+        "--hash",
+        action="store_true",
+        help="With --incremental, compare file contents by hash instead of mtime.",
+    )
+
+    parser.add_argument(
+        "--metadata_format",
+        choices=METADATA_FORMATS,
+        default="csv",
+        help="Format of the metrics table. Parquet requires pyarrow or fastparquet. "
+        "Default: csv.",
+    )
+
+    parser.add_argument(
+        "--residue_store",
+        action="store_true",
+        help="Also write per-residue pLDDT (and PAE where available) arrays to a "
+        "memory-mapped store next to the metrics table.",
+    )
+
+    parser.add_argument(
+        "--stream_metadata",
+        action="store_true",
+        help="Write the metrics table a block of predictions at a time instead of "
+        "building it in memory first. CSV only.",
+    )
+
+    parser.add_argument(
+        "--repo_cache",
+        action="store_true",
+        help="Check the dataset repository out of a persistent bare mirror, kept in "
+        "--repo_cache_dir and updated with git fetch, instead of cloning it afresh.",
+    )
+
+    parser.add_argument(
+        "--repo_cache_dir",
+        type=str,
+        default=str(DEFAULT_MIRROR_DIR),
+        help="Directory of the --repo_cache mirrors. Default: "
+        "$REPO_CACHE_DIR or ~/.cache/benchmark_model_afm/repos.",
+    )
+
+    parser.add_argument(
+        "--no_fetch",
+        action="store_true",
+        help="With --repo_cache, use the cached mirror as is, without fetching new commits.",
+    )
+
+    parser.add_argument(
+        "--from_git_objects",
+        action="store_true",
+        help="Read model outputs straight from git objects of the --repo_cache mirror, "
+        "or of a local repository root given as the input path, instead of a checkout.",
+    )
+
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="Write wall and CPU time, bytes read and written and file counts of "
+        "every stage to this file.",
+    )
+
+    parser.add_argument(
+        "--profile_memory",
+        action="store_true",
+        help="With --profile, also record the tracemalloc peak of every stage. "
+        "Tracing makes the run about ten times slower, so its timings are not "
+        "representative; worker processes are not traced.",
+    )
+
+    parser.add_argument(
+        "--profile_format",
+        choices=PROFILE_FORMATS,
+        default="json",
+        help="Format of the --profile file: stage records, or a Chrome trace for "
+        "Perfetto and chrome://tracing. Default: json.",
+    )
+
+    parser.add_argument(
+        "--profile_stage",
+        type=str,
+        default=None,
+        help="With --profile, also dump cProfile stats of this stage, as <stage> or "
+        "<model>:<stage> (e.g. json or Chai-1:cif), next to the profile.",
+    )
+    return parser
+
+
+def check_pipeline_args(parser, args):
+    """Reject combinations of the shared options that cannot run."""
+    if args.metadata_format != "csv" and parquet_engine() is None:
+        parser.error("--metadata_format parquet requires pyarrow or fastparquet")
+    if args.stream_metadata and args.metadata_format != "csv":
+        parser.error("--stream_metadata writes CSV only")
+
+
+def check_compression_args(parser, args):
+    """Reject a --compression that cannot be written, before any work is done."""
+    if not compression_available(args.compression):
+        # Only zstd has no standard library fallback
+        parser.error("--compression zstd requires the zstd command or the zstandard package")
+
+
+def open_mirror(args):
+    """RepoMirror of the shared options, or None without --repo_cache."""
+    return RepoMirror(args.repo_cache_dir, not args.no_fetch) if args.repo_cache else None
+
+
+def pipeline_options(args, profiler=None):
+    """Keyword arguments of run_adapter taken from the shared options."""
+    return {
+        "workers": args.workers,
+        "link_mode": args.link_mode,
+        "incremental": args.incremental,
+        "use_hash": args.hash,
+        "metadata_format": args.metadata_format,
+        "residue_store": args.residue_store,
+        "stream_metadata": args.stream_metadata,
+        "profiler": profiler,
+    }
@@ -0,0 +1,118 @@
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Optional
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get("NATIVE_CACHE_DIR")
+    or Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    / "benchmark_model_afm"
+    / "natives"
+)
+DEFAULT_CACHE_SIZE_MB = 10240
+# Server and formats of the cached entries, here rather than in download.py so
+# that command lines can offer them without importing http.client
+DEFAULT_BASE_URL = "https://files.rcsb.org/download"
+FORMATS = ("pdb", "cif")
+
+
+class NativeCache:
+    """
+    User-level cache of native structures shared across runs and models.
+
+    Files are stored as <root>/<format>/<PDB_ID>.<format>, are written
+    atomically (download to a .part file, then rename) and are guarded by a
+    per-entry lock so concurrent runs never fetch the same entry twice. The
+    modification time of an entry is refreshed on every hit and serves as
+    the recency key when the cache grows beyond max_bytes.
+
+    root : str or Path, default DEFAULT_CACHE_DIR
+        Cache directory (created if missing).
+    max_bytes : int, optional
+        Size limit enforced by evict(). None disables eviction.
+    """
+
+    def __init__(self, root: str | Path = DEFAULT_CACHE_DIR, max_bytes: Optional[int] = None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def path(self, pdb_id: str, fmt: str = "pdb") -> Path:
+        return self.root / fmt / f"{pdb_id.upper()}.{fmt}"
+
+    @contextmanager
+    def _lock(self, path: Path):
+        if fcntl is None:
+            yield
+            return
+        with open(path.with_name(path.name + ".lock"), "w") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def get(self, pdb_id: str, fmt: str = "pdb") -> Optional[Path]:
+        """Path of a cached entry, marked as recently used, or None on a miss."""
+        path = self.path(pdb_id, fmt)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def ensure(self, pdb_id: str, fmt: str, fill: Callable[[Path], object]) -> Path:
+        """
+        Return the cached entry, calling fill(path) to create it on a miss.
+
+        fill must write the file atomically, e.g. via download().
+        """
+        cached = self.get(pdb_id, fmt)
+        if cached is not None:
+            return cached
+        path = self.path(pdb_id, fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock(path):
+            if not path.exists():
+                fill(path)
+        return path
+
+    def evict(self) -> int:
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+
+        Returns int
+            Number of bytes freed.
+        """
+        if self.max_bytes is None or not self.root.exists():
+            return 0
+        entries = []
+        for fmt_dir in self.root.iterdir():
+            if not fmt_dir.is_dir():
+                continue
+            for entry in os.scandir(fmt_dir):
+                if entry.name.endswith((".part", ".lock")) or not entry.is_file():
+                    continue
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                continue
+            try:
+                os.remove(path + ".lock")
+            except FileNotFoundError:
+                pass
+        return freed
@@ -1,66 +1,387 @@
 from pathlib import Path
-import re, shutil
-import urllib.request
-import urllib.error
+import gzip, re, shutil, time
+import http.client
+import threading
+import urllib.parse
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Optional
-import pandas as pd
+import sys
 import tarfile
 
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "model"))
+from utils import (
+    COMPRESSIONS,
+    _archive_bytes,
+    _open_archive,
+    _stage_file,
+    archive_suffix,
+    check_compression_args,
+)
+from native.cache import (
+    DEFAULT_BASE_URL,
+    DEFAULT_CACHE_DIR,
+    DEFAULT_CACHE_SIZE_MB,
+    FORMATS,
+    NativeCache,
+)
 
-def download(pdb_id: str, out_dir: str | Path = ".") -> Path:
+
+def _validate(pdb_id: str) -> str:
+    if not re.fullmatch(r"[0-9A-Za-z]{4}", pdb_id or ""):
+        raise ValueError(f"Invalid PDB ID: {pdb_id!r}")
+    return pdb_id.upper()
+
+
+class TransientHTTPError(OSError):
+    """Server answered with a status worth retrying (429 or 5xx)."""
+
+
+class HTTPSession:
+    """
+    Keep-alive HTTP(S) connections shared by a pool of download threads.
+
+    Each thread keeps one persistent connection per host, so consecutive
+    requests reuse the same TCP/TLS session instead of reconnecting.
+    """
+
+    def __init__(self, timeout: float = 60.0, max_redirects: int = 5):
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self._local = threading.local()
+
+    def _connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        connections = self._local.__dict__.setdefault("connections", {})
+        key = (scheme, netloc)
+        if key not in connections:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            connections[key] = cls(netloc, timeout=self.timeout)
+        return connections[key]
+
+    def _drop(self, scheme: str, netloc: str) -> None:
+        connection = self._local.__dict__.get("connections", {}).pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def reset(self) -> None:
+        """
+        Close the connections of the calling thread.
+
+        Needed when a response body was not read to the end: the rest of it
+        is still on the socket and would be taken as the next response.
+        """
+        for connection in self._local.__dict__.pop("connections", {}).values():
+            connection.close()
+
+    def get(self, url: str, headers: Optional[dict] = None) -> http.client.HTTPResponse:
+        """
+        Send a GET request and return the response, following redirects.
+
+        The response body must be read to the end before the next request is
+        made from the same thread.
+        """
+        for _ in range(self.max_redirects + 1):
+            parts = urllib.parse.urlsplit(url)
+            path = parts.path + (f"?{parts.query}" if parts.query else "")
+            connection = self._connection(parts.scheme, parts.netloc)
+            try:
+                connection.request("GET", path, headers=headers or {})
+                resp = connection.getresponse()
+            except (OSError, http.client.HTTPException):
+                self._drop(parts.scheme, parts.netloc)
+                raise
+            if resp.status in (301, 302, 303, 307, 308) and resp.getheader("Location"):
+                resp.read()
+                url = urllib.parse.urljoin(url, resp.getheader("Location"))
+                continue
+            if resp.getheader("Connection", "").lower() == "close":
+                # Let the next request open a fresh connection
+                self._local.connections.pop((parts.scheme, parts.netloc), None)
+            return resp
+        raise http.client.HTTPException(f"Too many redirects for {url}")
+
+
+def _check_status(resp: http.client.HTTPResponse, pdb_id: str, url: str) -> None:
+    if resp.status in (200, 206):
+        return
+    resp.read()
+    if resp.status == 404:
+        raise FileNotFoundError(f"PDB entry {pdb_id} not found at {url}.")
+    if resp.status == 429 or resp.status >= 500:
+        raise TransientHTTPError(f"HTTP {resp.status} for {url}")
+    raise http.client.HTTPException(f"HTTP {resp.status} for {url}")
+
+
+@contextmanager
+def _reading(session: HTTPSession):
+    """Reset the session of the calling thread if reading a response body fails."""
+    try:
+        yield
+    except (FileNotFoundError, TransientHTTPError):
+        # Raised by _check_status once the body is read; the connection is clean
+        raise
+    except (OSError, http.client.HTTPException):
+        session.reset()
+        raise
+
+
+def _with_retries(func, retries: int = 3, backoff: float = 0.5):
+    """
+    Call func, retrying connection errors and transient HTTP statuses with
+    exponential backoff. Missing entries (FileNotFoundError) are not retried.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except FileNotFoundError:
+            raise
+        except (OSError, http.client.HTTPException) as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2**attempt
+            print(f"Retrying in {delay:.1f}s after error: {e}")
+            time.sleep(delay)
+
+
+class TransferStats:
+    """Thread-safe counters of network bytes received and bytes written to disk."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = 0
+        self.bytes_transferred = 0
+        self.bytes_written = 0
+
+    def add(self, transferred: int = 0, written: int = 0, entries: int = 0) -> None:
+        with self._lock:
+            self.bytes_transferred += transferred
+            self.bytes_written += written
+            self.entries += entries
+
+    def summary(self) -> str:
+        return (
+            f"Retrieved {self.entries} natives: "
+            f"{self.bytes_transferred / 1e6:.2f} MB transferred, "
+            f"{self.bytes_written / 1e6:.2f} MB written"
+        )
+
+
+def _formats(fmt: str) -> tuple:
+    """Formats to try in order: "auto" falls back from PDB to mmCIF."""
+    if fmt == "auto":
+        return FORMATS
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format: {fmt!r}")
+    return (fmt,)
+
+
+def _extension(fmt: str, keep_compressed: bool = False) -> str:
+    return f"{fmt}.gz" if keep_compressed else fmt
+
+
+def _url(pdb_id: str, base_url: str, fmt: str = "pdb", compressed: bool = False) -> str:
+    return f"{base_url.rstrip('/')}/{pdb_id}.{fmt}" + (".gz" if compressed else "")
+
+
+def _copy_counted(src, dst, stats: Optional[TransferStats]) -> int:
+    total = 0
+    for chunk in iter(lambda: src.read(1 << 16), b""):
+        dst.write(chunk)
+        total += len(chunk)
+    if stats is not None:
+        stats.add(transferred=total)
+    if getattr(src, "length", None):
+        # Chunked reads end quietly when the server closes mid-body
+        raise http.client.IncompleteRead(b"", src.length)
+    return total
+
+
+def fetch(
+    pdb_id: str,
+    base_url: str = DEFAULT_BASE_URL,
+    session: Optional[HTTPSession] = None,
+    retries: int = 3,
+    fmt: str = "pdb",
+    compressed: bool = True,
+    keep_compressed: bool = False,
+    stats: Optional[TransferStats] = None,
+) -> bytes:
+    """
+    Fetch the contents of a structure file from RCSB by PDB ID.
+
+    pdb_id : str
+        4-character PDB accession (case-insensitive), e.g., "1CRN".
+    base_url : str, default DEFAULT_BASE_URL
+        Server to download from, e.g. a local mirror.
+    session : HTTPSession, optional
+        Connection pool to reuse. A private one is used if omitted.
+    retries : int, default 3
+        Attempts after the first one on connection errors and 429/5xx.
+    fmt : str, default "pdb"
+        "pdb" or "cif".
+    compressed : bool, default True
+        Transfer the gzipped file (<PDB_ID>.<fmt>.gz).
+    keep_compressed : bool, default False
+        Return the gzipped bytes instead of decompressing them (implies
+        compressed).
+    stats : TransferStats, optional
+        Counters updated with the bytes received.
+    Returns bytes
+        The file contents.
+
+    """
+    pdb_id = _validate(pdb_id)
+    compressed = compressed or keep_compressed
+    url = _url(pdb_id, base_url, fmt, compressed)
+    session = session or HTTPSession()
+
+    def attempt():
+        resp = session.get(url)
+        with _reading(session):
+            _check_status(resp, pdb_id, url)
+            return resp.read()
+
+    data = _with_retries(attempt, retries)
+    if stats is not None:
+        stats.add(transferred=len(data))
+    if compressed and not keep_compressed:
+        data = gzip.decompress(data)
+    return data
+
+
+def download(
+    pdb_id: str,
+    out_dir: str | Path = ".",
+    filename: Optional[str] = None,
+    base_url: str = DEFAULT_BASE_URL,
+    session: Optional[HTTPSession] = None,
+    retries: int = 3,
+    fmt: str = "pdb",
+    compressed: bool = True,
+    keep_compressed: bool = False,
+    stats: Optional[TransferStats] = None,
+) -> Path:
     """
-    Download a .pdb file from RCSB by PDB ID.
+    Download a structure file from RCSB by PDB ID.
+
+    Existing files are skipped. The transferred bytes are written to a .part
+    file first; an interrupted transfer is resumed from the partial file with
+    an HTTP Range request when the server supports it. Gzipped transfers are
+    then decompressed in chunks into the target unless keep_compressed is set.
 
     pdb_id : str
         4-character PDB accession (case-insensitive), e.g., "1CRN".
     out_dir : str or Path, default "."
         Directory to save into (created if missing).
-    Returns None.
+    filename : str, optional
+        Name of the saved file. Default: <PDB_ID>.<fmt>[.gz].
+    base_url, session, retries, fmt, compressed, keep_compressed, stats
+        See fetch.
+    Returns Path
+        Path to the downloaded file.
 
     """
-    if not re.fullmatch(r"[0-9A-Za-z]{4}", pdb_id or ""):
-        raise ValueError(f"Invalid PDB ID: {pdb_id!r}")
-
-    pdb_id = pdb_id.upper()
+    pdb_id = _validate(pdb_id)
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    target = out_dir / f"{pdb_id}.pdb"
+    target = out_dir / (filename or f"{pdb_id}.{_extension(fmt, keep_compressed)}")
     if target.exists():
-        pass
+        return target
 
-    url = f"https://files.rcsb.org/download/{pdb_id}.pdb"
-    tmp = target.with_suffix(".pdb.part")
+    compressed = compressed or keep_compressed
+    url = _url(pdb_id, base_url, fmt, compressed)
+    gunzip = compressed and not keep_compressed
+    tmp = target.with_name(target.name + (".gz" if gunzip else "") + ".part")
+    session = session or HTTPSession()
 
-    try:
-        with urllib.request.urlopen(url) as resp, open(tmp, "wb") as fh:
-            shutil.copyfileobj(resp, fh)
-        tmp.replace(target)
+    def attempt():
+        offset = tmp.stat().st_size if tmp.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        resp = session.get(url, headers)
+        with _reading(session):
+            if resp.status == 416:
+                # Partial file is already complete (or invalid): start over
+                resp.read()
+                tmp.unlink()
+                raise TransientHTTPError(f"HTTP 416 for {url}")
+            _check_status(resp, pdb_id, url)
+            mode = "ab" if resp.status == 206 else "wb"
+            with open(tmp, mode) as fh:
+                _copy_counted(resp, fh, stats)
 
-    except urllib.error.HTTPError as e:
-        if e.code == 404:
-            raise FileNotFoundError(f"PDB entry {pdb_id} not found at RCSB.") from e
-        raise
+    _with_retries(attempt, retries)
+
+    if gunzip:
+        unpacked = target.with_name(target.name + ".tmp")
+        with gzip.open(tmp, "rb") as src, open(unpacked, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 16)
+        unpacked.replace(target)
+        tmp.unlink()
+    else:
+        tmp.replace(target)
+    if stats is not None:
+        stats.add(written=target.stat().st_size)
+    return target
 
 
-def retrieve_natives(input: str, outdir: str | Path = ".") -> Path:
+def retrieve_natives(
+    input: str,
+    outdir: str | Path = ".",
+    archive: Optional[tarfile.TarFile] = None,
+    workers: int = 8,
+    base_url: str = DEFAULT_BASE_URL,
+    retries: int = 3,
+    cache: Optional[NativeCache] = None,
+    fmt: str = "auto",
+    compressed: bool = True,
+    keep_compressed: bool = False,
+    stats: Optional[TransferStats] = None,
+) -> Path:
     """
-    Retrieve native PDB files given a PDB ID or a file containing multiple PDB IDs.
+    Retrieve native structure files given a PDB ID or a file containing multiple PDB IDs.
 
     input : str
         A single PDB ID or a path to a file with multiple PDB IDs (one per line).
     out_dir : str or Path, default "."
         Directory to save into (created if missing).
+    archive : tarfile.TarFile, optional
+        Open tar archive. If given, each structure is written straight into it
+        as <outdir name>/<id>_<PDB_ID>.<ext> and nothing is written to outdir.
+    workers : int, default 8
+        Number of concurrent downloads.
+    base_url : str, default DEFAULT_BASE_URL
+        Server to download from.
+    retries : int, default 3
+        Retries per entry on connection errors and 429/5xx responses.
+    cache : NativeCache, optional
+        Shared structure cache. Entries are downloaded into it on a miss and
+        linked (or copied across devices) into outdir, so a warm cache needs
+        no network access.
+    fmt : str, default "auto"
+        "pdb", "cif", or "auto" to fall back to mmCIF for entries that have
+        no PDB-format file.
+    compressed : bool, default True
+        Transfer gzipped files.
+    keep_compressed : bool, default False
+        Save <id>_<PDB_ID>.<fmt>.gz files instead of decompressing them.
+    stats : TransferStats, optional
+        Counters updated with the bytes received and written.
     Returns Path
-        Path to the directory containing downloaded PDB files.
+        Path to the directory containing downloaded structure files.
 
     """
     outdir = Path(outdir)
-    outdir.mkdir(parents=True, exist_ok=True)
+    if archive is None:
+        outdir.mkdir(parents=True, exist_ok=True)
 
     input_path = Path(input)
     if input_path.exists() and input_path.suffix == ".csv":
+        import pandas as pd
+
         df = pd.read_csv(input_path)
         df.dropna(subset=["pdb_id"], inplace=True)
         pdb_ids = df["pdb_id"].tolist()
@@ -72,13 +393,78 @@ def retrieve_natives(input: str, outdir: str | Path = ".") -> Path:
 
     else:
         pdb_ids = [input.strip()]
+        ids = pdb_ids
 
-    for pdb_id, id in zip(pdb_ids, ids):
-        download(pdb_id, outdir)
-        shutil.move(
-            outdir / f"{pdb_id}.pdb",
-            outdir / f"{id}_{pdb_id.upper()}.pdb",
-        )
+    session = HTTPSession()
+    options = {
+        "base_url": base_url,
+        "session": session,
+        "retries": retries,
+        "compressed": compressed,
+        "keep_compressed": keep_compressed,
+        "stats": stats,
+    }
+    formats = _formats(fmt)
+
+    def filename(pdb_id, id, fmt):
+        return f"{id}_{pdb_id.upper()}.{_extension(fmt, keep_compressed)}"
+
+    def resolve(pdb_id, id):
+        """Return (filename, cached path or file contents), trying formats in order."""
+        if cache is not None:
+            for fmt in formats:
+                hit = cache.get(pdb_id, _extension(fmt, keep_compressed))
+                if hit is not None:
+                    return filename(pdb_id, id, fmt), hit
+        error = None
+        for fmt in formats:
+            try:
+                if cache is None:
+                    return filename(pdb_id, id, fmt), fetch(pdb_id, fmt=fmt, **options)
+                path = cache.ensure(
+                    pdb_id,
+                    _extension(fmt, keep_compressed),
+                    lambda path: download(pdb_id, path.parent, path.name, fmt=fmt, **options),
+                )
+                return filename(pdb_id, id, fmt), path
+            except FileNotFoundError as e:
+                error = e
+        raise error
+
+    def retrieve(pdb_id, id):
+        for fmt in formats:
+            target = outdir / filename(pdb_id, id, fmt)
+            if target.exists():
+                return target
+        if cache is not None:
+            # Materialize from the cache by link rather than by copy
+            name, path = resolve(pdb_id, id)
+            _stage_file(path, outdir / name, "auto")
+            return outdir / name
+        error = None
+        for fmt in formats:
+            try:
+                return download(pdb_id, outdir, filename(pdb_id, id, fmt), fmt=fmt, **options)
+            except FileNotFoundError as e:
+                error = e
+        raise error
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        if archive is not None:
+            # Downloads run concurrently, archive members are added in input order
+            for name, source in pool.map(resolve, pdb_ids, ids):
+                arcname = f"{outdir.name}/{name}"
+                if isinstance(source, bytes):
+                    _archive_bytes(archive, arcname, source)
+                else:
+                    archive.add(source, arcname=arcname)
+        else:
+            list(pool.map(retrieve, pdb_ids, ids))
+
+    if stats is not None:
+        stats.add(entries=len(pdb_ids))
+    if cache is not None:
+        cache.evict()
     return outdir
 
 
@@ -106,19 +492,123 @@ def build_download_parser() -> argparse.ArgumentParser:
         default="natives",
         help="Name for the downloaded files. Default: natives.",
     )
+    parser.add_argument(
+        "--stream_archive",
+        action="store_true",
+        help="Write structures straight into the tar archive without a staging directory.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of concurrent downloads. Default: 8.",
+    )
+    parser.add_argument(
+        "--base_url",
+        type=str,
+        default=DEFAULT_BASE_URL,
+        help=f"Server to download structures from. Default: {DEFAULT_BASE_URL}.",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Retries per entry on connection errors and 429/5xx. Default: 3.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["auto", *FORMATS],
+        default="auto",
+        help="Structure format. 'auto' falls back to mmCIF for entries without a "
+        "PDB-format file. Default: auto.",
+    )
+    parser.add_argument(
+        "--uncompressed_transfer",
+        action="store_true",
+        help="Download plain files instead of gzipped ones.",
+    )
+    parser.add_argument(
+        "--keep_compressed",
+        action="store_true",
+        help="Save the gzipped files as transferred instead of decompressing them.",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=str(DEFAULT_CACHE_DIR),
+        help="Shared native structure cache. Default: $NATIVE_CACHE_DIR or "
+        "~/.cache/benchmark_model_afm/natives.",
+    )
+    parser.add_argument(
+        "--cache_size_mb",
+        type=int,
+        default=DEFAULT_CACHE_SIZE_MB,
+        help=f"Cache size limit, least recently used entries are evicted. "
+        f"Default: {DEFAULT_CACHE_SIZE_MB}.",
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Download straight into the output directory without the shared cache.",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=list(COMPRESSIONS),
+        default="none",
+        help="Compression of the natives archive. Default: none.",
+    )
+    parser.add_argument(
+        "--compression_level",
+        type=int,
+        default=None,
+        help="Compression level. Default: codec default (gzip 6, xz 6, zstd 3).",
+    )
+    parser.add_argument(
+        "--compression_threads",
+        type=int,
+        default=0,
+        help="Compressor threads, 0 uses every core. Default: 0.",
+    )
     return parser
 
 
 def main():
     parser = build_download_parser()
     args = parser.parse_args()
+    check_compression_args(parser, args)
     output_dir = Path(args.output_dir) / "natives"
-    retrieve_natives(args.input, output_dir)
+    archive_name = output_dir.parent / f"{output_dir.name}{archive_suffix(args.compression)}"
+    compression = {
+        "compression": args.compression,
+        "level": args.compression_level,
+        "threads": args.compression_threads,
+    }
+    options = {
+        "workers": args.workers,
+        "base_url": args.base_url,
+        "retries": args.retries,
+        "cache": None
+        if args.no_cache
+        else NativeCache(args.cache_dir, args.cache_size_mb * 1024 * 1024),
+        "fmt": args.format,
+        "compressed": not args.uncompressed_transfer,
+        "keep_compressed": args.keep_compressed,
+        "stats": TransferStats(),
+    }
+    if args.stream_archive:
+        output_dir.parent.mkdir(parents=True, exist_ok=True)
+        with _open_archive(archive_name, **compression) as tar:
+            retrieve_natives(args.input, output_dir, archive=tar, **options)
+            tar.add(args.input, arcname=f"{output_dir.name}/{Path(args.input).name}")
+        print(options["stats"].summary())
+        return
+
+    retrieve_natives(args.input, output_dir, **options)
+    print(options["stats"].summary())
     shutil.copy2(args.input, output_dir / Path(args.input).name)
     
-    # Create tar archive
-    archive_name = output_dir.parent / f"{output_dir.name}.tar"
-    with tarfile.open(archive_name, "w") as tar:
+    # Create tar archive; natives linked from the cache are stored as files
+    with _open_archive(archive_name, dereference=True, **compression) as tar:
         tar.add(output_dir, arcname=output_dir.name)
     shutil.rmtree(output_dir)
 
@@ -0,0 +1,41 @@
+import csv
+import gzip
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(parent_dir / "model"))
+sys.path.append(str(parent_dir / "benchmarks"))
+import synthetic
+
+
+@pytest.fixture(scope="session")
+def dataset(tmp_path_factory):
+    """Small synthetic dataset of the three models plus natives, see synthetic.generate."""
+    root = tmp_path_factory.mktemp("dataset")
+    synthetic.generate(root, n_ids=3, ranks=2, receptor_length=(30, 40), peptide_length=(6, 8))
+    return root
+
+
+@pytest.fixture(scope="session")
+def native_dir(dataset, tmp_path_factory):
+    """Natives of dataset named <id>_<PDB_ID>.pdb, as native/download.py writes them."""
+    root = tmp_path_factory.mktemp("natives")
+    with open(dataset / "natives.csv") as f:
+        for row in csv.DictReader(f):
+            with gzip.open(dataset / "natives" / f"{row['pdb_id']}.pdb.gz") as src:
+                (root / f"{row['id']}_{row['pdb_id']}.pdb").write_bytes(src.read())
+    return root
+
+
+@pytest.fixture(scope="session")
+def model_cli():
+    """The model/model.py script as a module; "model" on sys.path is the package directory."""
+    spec = importlib.util.spec_from_file_location("model_cli", parent_dir / "model" / "model.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,72 @@
+import shutil
+import subprocess
+import tarfile
+import zipfile
+
+import pytest
+
+import afm
+import chai1
+import helixfold3
+from archives import ArchiveTree
+from runner import run_adapter
+from sources import open_source
+
+ADAPTERS = [afm.ADAPTER, chai1.ADAPTER, helixfold3.ADAPTER]
+MODELS = [adapter.model for adapter in ADAPTERS]
+SUFFIXES = [".tar", ".tar.gz", ".tar.zst", ".zip"]
+
+
+def _make_archive(dataset, path, prefix=""):
+    """Archive of the model folders of dataset, member names starting with prefix."""
+    if path.name.endswith(".zip"):
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for model in MODELS:
+                for file in sorted((dataset / model).rglob("*")):
+                    archive.write(file, prefix + str(file.relative_to(dataset)))
+    elif path.name.endswith(".tar.zst"):
+        tar = path.with_name(path.name[: -len(".zst")])
+        _make_archive(dataset, tar, prefix)
+        subprocess.run(["zstd", "-q", "--rm", str(tar), "-o", str(path)], check=True)
+    else:
+        with tarfile.open(path, "w:gz" if path.name.endswith(".gz") else "w") as archive:
+            for model in MODELS:
+                archive.add(dataset / model, arcname=prefix + model)
+    return path
+
+
+@pytest.fixture(scope="module", params=SUFFIXES)
+def archive(request, dataset, tmp_path_factory):
+    if request.param == ".tar.zst" and shutil.which("zstd") is None:
+        pytest.skip("zstd is not installed")
+    root = tmp_path_factory.mktemp("archives")
+    # Tars written with tar -C <dir> . name their members ./<path>
+    prefix = "./" if request.param == ".tar.gz" else ""
+    return _make_archive(dataset, root / f"dataset{request.param}", prefix)
+
+
+def _files(root):
+    return sorted(str(p.relative_to(root)) for p in root.rglob("*") if p.is_file())
+
+
+def test_listing_and_reads(archive, dataset):
+    tree = ArchiveTree(archive)
+    assert sorted(tree.listdir("")) == MODELS
+    expected = sorted(f"{model}/{path}" for model in MODELS for path in _files(dataset / model))
+    assert sorted(member.path.removeprefix("./") for member in tree.blobs()) == expected
+
+    # Backward reads restart the stream of compressed tars
+    for path in sorted(expected, reverse=True):
+        with open_source(tree.blob(path), "rb") as f:
+            assert f.read() == (dataset / path).read_bytes()
+
+
+@pytest.mark.parametrize("adapter", ADAPTERS, ids=MODELS)
+def test_matches_extracted_directory(archive, dataset, tmp_path, adapter):
+    run_adapter(adapter, str(dataset), str(tmp_path / "extracted"), False)
+    run_adapter(adapter, str(archive), str(tmp_path / "archive"), False)
+
+    assert _files(tmp_path / "archive") == _files(tmp_path / "extracted")
+    for path in _files(tmp_path / "extracted"):
+        extracted = (tmp_path / "extracted" / path).read_bytes()
+        assert (tmp_path / "archive" / path).read_bytes() == extracted
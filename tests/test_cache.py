@@ -0,0 +1,62 @@
+import os
+
+from native.cache import NativeCache
+
+
+def _entry(cache, pdb_id, fmt, size, mtime):
+    path = cache.path(pdb_id, fmt)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    path.with_name(path.name + ".lock").touch()
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = NativeCache(tmp_path, max_bytes=250)
+    old = _entry(cache, "1aaa", "pdb", 100, 1000)
+    used = _entry(cache, "2BBB", "cif", 100, 2000)
+    new = _entry(cache, "3CCC", "pdb", 100, 3000)
+    # Left over from an interrupted download, never counted or evicted
+    part = cache.path("4DDD", "pdb").with_suffix(".pdb.part")
+    part.write_bytes(b"x" * 1000)
+
+    # A hit makes the oldest entry the most recently used
+    assert cache.get("1AAA", "pdb") == old
+    assert cache.evict() == 100
+
+    assert old.exists() and new.exists() and part.exists()
+    assert not used.exists()
+    assert not used.with_name(used.name + ".lock").exists()
+    assert old.with_name(old.name + ".lock").exists()
+    assert cache.get("2BBB", "cif") is None
+    # Already within the limit
+    assert cache.evict() == 0
+
+
+def test_evicts_until_within_limit(tmp_path):
+    cache = NativeCache(tmp_path, max_bytes=150)
+    paths = [_entry(cache, f"{i}ABC", "pdb", 100, 1000 + i) for i in range(4)]
+    assert cache.evict() == 300
+    assert [path.exists() for path in paths] == [False, False, False, True]
+
+
+def test_no_limit_keeps_everything(tmp_path):
+    cache = NativeCache(tmp_path)
+    path = _entry(cache, "1ABC", "pdb", 100, 1000)
+    assert cache.evict() == 0 and path.exists()
+    assert NativeCache(tmp_path / "missing", max_bytes=0).evict() == 0
+
+
+def test_ensure_fills_a_miss_once(tmp_path):
+    cache = NativeCache(tmp_path / "cache")
+    fills = []
+
+    def fill(path):
+        fills.append(path)
+        path.write_text("ATOM")
+
+    first = cache.ensure("1abc", "pdb", fill)
+    second = cache.ensure("1ABC", "pdb", fill)
+    assert first == second == tmp_path / "cache" / "pdb" / "1ABC.pdb"
+    assert fills == [first] and first.read_text() == "ATOM"
@@ -0,0 +1,86 @@
+import importlib.util
+import io
+import shutil
+import subprocess
+import sys
+import tarfile
+
+import pytest
+
+import utils
+from archives import _tar_stream
+from utils import _open_archive, archive_suffix
+
+FILES = {"Chai-1/Pep0-Rec0_1.json": b'{"ptm": 0.5}\n' * 200, "Chai-1/empty.cif": b""}
+
+
+def _write(path, compression, **options):
+    with _open_archive(path, compression, **options) as tar:
+        for name, data in FILES.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def _read(path):
+    with _tar_stream(str(path)) as stream, tarfile.open(fileobj=stream, mode="r|") as tar:
+        return {member.name: tar.extractfile(member).read() for member in tar}
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip", "xz", "zstd"])
+def test_round_trip_external(tmp_path, compression):
+    command = utils._compressor_command(compression, 3, 2)
+    if compression != "none" and command is None:
+        pytest.skip(f"no multithreaded {compression} compressor installed")
+    path = tmp_path / f"models{archive_suffix(compression)}"
+    _write(path, compression, level=3, threads=2)
+    assert _read(path) == FILES
+
+
+@pytest.mark.parametrize("compression", ["gzip", "xz", "zstd"])
+def test_round_trip_fallback(tmp_path, monkeypatch, compression):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    monkeypatch.setattr(utils, "_compressor_command", lambda *args: None)
+    path = tmp_path / f"models{archive_suffix(compression)}"
+    _write(path, compression)
+    assert _read(path) == FILES
+
+
+def test_compressor_failure(tmp_path, monkeypatch):
+    command = ["sh", "-c", "cat > /dev/null; exit 3"]
+    monkeypatch.setattr(utils, "_compressor_command", lambda *args: command)
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        _write(tmp_path / "models.tar.zst", "zstd")
+    assert error.value.returncode == 3
+
+
+def test_invalid_compression(tmp_path):
+    with pytest.raises(ValueError):
+        _write(tmp_path / "models.tar.bz2", "bz2")
+
+
+def _without_zstd(monkeypatch):
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(shutil, "which", lambda name: None)
+    monkeypatch.setattr(
+        importlib.util,
+        "find_spec",
+        lambda name, *args: None if name == "zstandard" else find_spec(name, *args),
+    )
+
+
+def test_zstd_unavailable_fails_before_any_work(model_cli, dataset, tmp_path, monkeypatch, capsys):
+    _without_zstd(monkeypatch)
+    assert not utils.compression_available("zstd")
+    assert utils.compression_available("gzip") and utils.compression_available("xz")
+
+    output_dir = tmp_path / "out"
+    argv = ["model.py", "--input_path", str(dataset), "--model", "Chai-1"]
+    argv += ["--output_dir", str(output_dir), "--compression", "zstd"]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit) as error:
+        model_cli.main()
+    assert error.value.code == 2
+    assert "--compression zstd requires" in capsys.readouterr().err
+    assert not output_dir.exists()
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from contacts import brute_force_pairs, contact_pairs
+
+
+@pytest.mark.parametrize("cutoff", [0.5, 2.0, 5.0, 40.0])
+@pytest.mark.parametrize("seed", range(3))
+def test_contact_pairs_matches_brute_force(seed, cutoff):
+    rng = np.random.default_rng(seed)
+    # Overlapping clouds, plus points of a far outside the reach of b
+    a = np.concatenate([rng.uniform(0, 20, (300, 3)), rng.uniform(100, 120, (20, 3))])
+    b = rng.uniform(10, 30, (200, 3))
+    for got, expected in zip(contact_pairs(a, b, cutoff), brute_force_pairs(a, b, cutoff)):
+        np.testing.assert_array_equal(got, expected)
+
+
+def test_contact_pairs_on_a_grid():
+    # Lattice points at exactly the cutoff are not in contact, as in brute_force_pairs
+    grid = np.stack(np.meshgrid(*[np.arange(5.0)] * 3), axis=-1).reshape(-1, 3)
+    for got, expected in zip(contact_pairs(grid, grid, 1.0), brute_force_pairs(grid, grid, 1.0)):
+        np.testing.assert_array_equal(got, expected)
+
+
+def test_contact_pairs_empty():
+    points = np.zeros((4, 3))
+    for a, b in ((np.zeros((0, 3)), points), (points, np.zeros((0, 3)))):
+        i, j = contact_pairs(a, b, 5.0)
+        assert len(i) == len(j) == 0
+    with pytest.raises(ValueError):
+        contact_pairs(points, points, 0)
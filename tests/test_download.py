@@ -0,0 +1,182 @@
+import gzip
+import os
+import socket
+import sys
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from native import download as download_cli
+from native.cache import NativeCache
+from native.download import HTTPSession, TransferStats, download, fetch, retrieve_natives
+
+
+@pytest.fixture
+def truncating_server():
+    """Keep-alive server whose first response is cut off mid-body; (base URL, body)."""
+    body = gzip.compress(os.urandom(4096))
+    requests = []
+    server = socket.create_server(("127.0.0.1", 0))
+
+    def serve(conn):
+        with conn, conn.makefile("rb") as f:
+            while f.readline():
+                while f.readline() not in (b"\r\n", b""):
+                    pass
+                requests.append(conn)
+                head = f"HTTP/1.1 200 OK\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                if len(requests) == 1:
+                    conn.sendall(head + body[:100])
+                    return
+                conn.sendall(head + body)
+
+    def accept():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield f"http://127.0.0.1:{server.getsockname()[1]}", body
+    server.close()
+
+
+def test_fetch_retries_on_a_fresh_connection(truncating_server):
+    base_url, body = truncating_server
+    data = fetch("1ABC", base_url, HTTPSession(timeout=5), retries=1)
+    assert data == gzip.decompress(body)
+
+
+def test_download_retries_on_a_fresh_connection(truncating_server, tmp_path):
+    base_url, body = truncating_server
+    path = download("1ABC", tmp_path, base_url=base_url, session=HTTPSession(timeout=5), retries=1)
+    assert path.read_bytes() == gzip.decompress(body)
+
+
+@pytest.fixture
+def rcsb():
+    """RCSB-like server of {path: bytes} with Range support; (base URL, files, request log)."""
+    files = {}
+    log = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            log.append((self.path, self.headers.get("Range")))
+            data = files.get(self.path)
+            if data is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status, start = 200, 0
+            if self.headers.get("Range"):
+                start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+                status = 206
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(data) - start))
+            self.end_headers()
+            self.wfile.write(data[start:])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", files, log
+    server.shutdown()
+    server.server_close()
+
+
+def test_gzip_transfer(rcsb, tmp_path):
+    base_url, files, log = rcsb
+    pdb = b"ATOM      1  N   ALA A   1\n" * 200
+    files["/1ABC.pdb.gz"] = gzip.compress(pdb)
+    files["/1ABC.pdb"] = pdb
+    stats = TransferStats()
+
+    path = download("1abc", tmp_path / "gunzip", base_url=base_url, stats=stats)
+    assert path.name == "1ABC.pdb" and path.read_bytes() == pdb
+    assert stats.bytes_transferred == len(files["/1ABC.pdb.gz"])
+    assert stats.bytes_written == len(pdb)
+    assert os.listdir(tmp_path / "gunzip") == ["1ABC.pdb"]
+
+    path = download("1ABC", tmp_path / "kept", base_url=base_url, keep_compressed=True)
+    assert path.name == "1ABC.pdb.gz" and path.read_bytes() == files["/1ABC.pdb.gz"]
+
+    path = download("1ABC", tmp_path / "plain", base_url=base_url, compressed=False)
+    assert path.read_bytes() == pdb
+    assert [request for request, _ in log] == ["/1ABC.pdb.gz", "/1ABC.pdb.gz", "/1ABC.pdb"]
+
+
+def test_resume_partial_gzip_transfer(rcsb, tmp_path):
+    base_url, files, log = rcsb
+    pdb = os.urandom(6000)
+    body = gzip.compress(pdb)
+    files["/1ABC.pdb.gz"] = body
+    (tmp_path / "1ABC.pdb.gz.part").write_bytes(body[:1000])
+    stats = TransferStats()
+
+    path = download("1ABC", tmp_path, base_url=base_url, stats=stats)
+    assert path.read_bytes() == pdb
+    assert log == [("/1ABC.pdb.gz", "bytes=1000-")]
+    assert stats.bytes_transferred == len(body) - 1000
+    assert not (tmp_path / "1ABC.pdb.gz.part").exists()
+
+
+@pytest.mark.parametrize("cached", [False, True], ids=["no_cache", "cache"])
+@pytest.mark.parametrize("stream", [False, True], ids=["files", "archive"])
+def test_auto_falls_back_to_mmcif(rcsb, tmp_path, cached, stream):
+    base_url, files, log = rcsb
+    cif = b"data_2XYZ\n"
+    files["/2XYZ.cif.gz"] = gzip.compress(cif)
+    cache = NativeCache(tmp_path / "cache") if cached else None
+    options = {"base_url": base_url, "cache": cache, "workers": 1, "retries": 0}
+
+    if stream:
+        with tarfile.open(tmp_path / "natives.tar", "w") as tar:
+            retrieve_natives("2XYZ", tmp_path / "natives", archive=tar, **options)
+        with tarfile.open(tmp_path / "natives.tar") as tar:
+            assert tar.getnames() == ["natives/2XYZ_2XYZ.cif"]
+            assert tar.extractfile("natives/2XYZ_2XYZ.cif").read() == cif
+    else:
+        retrieve_natives("2XYZ", tmp_path / "natives", **options)
+        assert os.listdir(tmp_path / "natives") == ["2XYZ_2XYZ.cif"]
+        assert (tmp_path / "natives" / "2XYZ_2XYZ.cif").read_bytes() == cif
+    assert [request for request, _ in log] == ["/2XYZ.pdb.gz", "/2XYZ.cif.gz"]
+    if cached:
+        assert cache.get("2XYZ", "cif").read_bytes() == cif
+
+    with pytest.raises(FileNotFoundError):
+        retrieve_natives("2XYZ", tmp_path / "pdb_only", fmt="pdb", **options)
+
+
+def test_main_archives_linked_natives_as_files(rcsb, tmp_path, monkeypatch):
+    base_url, files, _ = rcsb
+    files["/1ABC.pdb.gz"] = gzip.compress(b"ATOM 1ABC\n")
+    csv_path = tmp_path / "natives.csv"
+    csv_path.write_text("id,pdb_id\nx,1ABC\ny,2DEF\n")
+    # A native already present in the output directory as a symlink
+    outside = tmp_path / "2DEF.pdb"
+    outside.write_bytes(b"ATOM 2DEF\n")
+    output_dir = tmp_path / "out"
+    (output_dir / "natives").mkdir(parents=True)
+    (output_dir / "natives" / "y_2DEF.pdb").symlink_to(outside)
+
+    argv = ["download.py", "--input", str(csv_path), "--output_dir", str(output_dir)]
+    argv += ["--base_url", base_url, "--cache_dir", str(tmp_path / "cache")]
+    monkeypatch.setattr(sys, "argv", argv)
+    download_cli.main()
+
+    with tarfile.open(output_dir / "natives.tar") as tar:
+        members = {m.name: m for m in tar}
+        assert all(m.isreg() or m.isdir() for m in members.values())
+        assert tar.extractfile("natives/x_1ABC.pdb").read() == b"ATOM 1ABC\n"
+        assert tar.extractfile("natives/y_2DEF.pdb").read() == b"ATOM 2DEF\n"
+        assert "natives/natives.csv" in members
+    assert not (output_dir / "natives").exists()
@@ -0,0 +1,102 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import chai1
+from gitobjects import Blob, GitTree, open_tree
+from runner import run_adapter
+from sources import open_source
+
+
+def _git(*args, cwd):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture(scope="module")
+def repo(dataset, tmp_path_factory):
+    """Repository holding the Chai-1 and HelixFold3 folders of dataset under models/."""
+    root = tmp_path_factory.mktemp("repo")
+    for model in ("Chai-1", "HelixFold3"):
+        shutil.copytree(dataset / model, root / "models" / model)
+    _git("init", "-q", cwd=root)
+    _git("config", "uploadpack.allowFilter", "true", cwd=root)
+    _git("add", "-A", cwd=root)
+    _git("commit", "-q", "-m", "dataset", cwd=root)
+    return root
+
+
+def _files(root):
+    return sorted(str(p.relative_to(root)) for p in root.rglob("*") if p.is_file())
+
+
+def test_listing(repo, dataset):
+    tree = open_tree(str(repo), "models/Chai-1")
+    assert tree.listdir("models/Chai-1") == sorted(os.listdir(dataset / "Chai-1"))
+    assert sorted(blob.path for blob in tree.blobs()) == [
+        f"models/Chai-1/{path}" for path in _files(dataset / "Chai-1")
+    ]
+    assert tree.find_dir("Chai-1") == "models/Chai-1"
+    assert not tree.exists("models/HelixFold3")
+    for blob in tree.blobs():
+        assert blob.size == (repo / blob.path).stat().st_size
+
+
+def test_member_reads(repo):
+    tree = open_tree(str(repo), "models/Chai-1")
+    blobs = sorted(tree.blobs(), key=lambda blob: blob.path)
+    for blob in blobs:
+        with open_source(blob, "rb") as f:
+            assert f.read() == (repo / blob.path).read_bytes()
+
+    # Opening the next blob finishes a partly read one first
+    first = open_source(blobs[0], "rb")
+    assert first.read(10) == (repo / blobs[0].path).read_bytes()[:10]
+    with open_source(blobs[1], "r") as f:
+        assert f.read() == (repo / blobs[1].path).read_text()
+    first.close()
+
+
+def test_missing_path(repo):
+    tree = open_tree(str(repo), "models/Chai-1")
+    with pytest.raises(FileNotFoundError):
+        tree.listdir("models/AFMultimer")
+    with pytest.raises(KeyError):
+        tree.blob("models/Chai-1/missing.json")
+
+    blob = tree.blobs()[0]
+    with pytest.raises(FileNotFoundError):
+        Blob(str(repo), "0" * 40, 1, "missing.json").open()
+    # The cat-file process is still usable after a missing object
+    with open_source(blob, "rb") as f:
+        assert f.read() == (repo / blob.path).read_bytes()
+
+
+def test_partial_clone_prefetch(repo, tmp_path):
+    clone = tmp_path / "clone"
+    subprocess.run(
+        ["git", "clone", "-q", "--bare", "--filter=blob:none", f"file://{repo}", str(clone)],
+        check=True,
+    )
+    tree = GitTree(clone, prefix="models/HelixFold3")
+    assert tree.blobs()
+    for blob in tree.blobs():
+        assert blob.size == (repo / blob.path).stat().st_size
+        with open_source(blob, "rb") as f:
+            assert f.read() == (repo / blob.path).read_bytes()
+
+
+def test_run_from_git_objects(repo, dataset, tmp_path):
+    run_adapter(chai1.ADAPTER, str(dataset), str(tmp_path / "checkout"), False)
+    tree = open_tree(str(repo), "models/Chai-1")
+    run_adapter(chai1.ADAPTER, str(repo), str(tmp_path / "git"), False, tree=tree)
+
+    assert _files(tmp_path / "git") == _files(tmp_path / "checkout")
+    for path in _files(tmp_path / "checkout"):
+        assert (tmp_path / "git" / path).read_bytes() == (tmp_path / "checkout" / path).read_bytes()
@@ -0,0 +1,84 @@
+import json
+import os
+import shutil
+
+import pytest
+
+import afm
+import chai1
+import helixfold3
+from runner import run_adapter
+
+ADAPTERS = [afm.ADAPTER, chai1.ADAPTER, helixfold3.ADAPTER]
+
+
+def _tree(root):
+    """Relative path -> contents of every file under root."""
+    files = {}
+    for folder, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(folder, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+def _edit_score(input_dir):
+    # Rewritten through a new file, as a checkout does, so staged links keep
+    # the old contents; same size, so only mtime or hash can tell
+    path = sorted(input_dir.rglob("*.json"))[0]
+    data = json.loads(path.read_text())
+    data["ptm"] = 0.999
+    new = path.with_name(path.name + ".new")
+    new.write_text(json.dumps(data))
+    stat = path.stat()
+    os.utime(new, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    os.replace(new, path)
+
+
+@pytest.mark.parametrize("use_hash", [False, True], ids=["mtime", "hash"])
+@pytest.mark.parametrize("adapter", ADAPTERS, ids=lambda adapter: adapter.model)
+def test_incremental_rerun_matches_fresh_run(dataset, native_dir, tmp_path, adapter, use_hash):
+    data = tmp_path / "data"
+    shutil.copytree(dataset / adapter.model, data / adapter.model)
+    options = {"residue_store": True, "native_dir": str(native_dir)}
+    cached = dict(options, incremental=True, use_hash=use_hash)
+
+    incremental = str(tmp_path / "incremental")
+    run_adapter(adapter, str(data), incremental, False, **cached)
+    assert os.path.exists(incremental + ".manifest.json")
+    _edit_score(data / adapter.model)
+    run_adapter(adapter, str(data), incremental, False, **cached)
+
+    fresh = str(tmp_path / "fresh")
+    run_adapter(adapter, str(data), fresh, False, **options)
+    assert _tree(incremental) == _tree(fresh)
+    metadata = _tree(fresh)[f"{adapter.prefix}_metadata.csv"].decode().splitlines()
+    assert any(",0.999," in row for row in metadata)
+    # Scored against the natives
+    assert metadata[0].endswith(",dockq") and not metadata[1].endswith(",")
+
+
+def _drop_last_residue(pdb_path):
+    lines = pdb_path.read_text().splitlines(keepends=True)
+    atoms = [line for line in lines if line.startswith("ATOM")]
+    # Chain and residue number of the last ATOM record
+    last = atoms[-1][21:27]
+    kept = [line for line in lines if not (line.startswith("ATOM") and line[21:27] == last)]
+    pdb_path.write_text("".join(kept))
+
+
+def test_incremental_rerun_after_pdb_change(dataset, tmp_path):
+    # Interface metrics come from the unchanged JSONs and the chain lengths
+    # of the regenerated PDBs
+    data = tmp_path / "data"
+    shutil.copytree(dataset / "AFMultimer", data / "AFMultimer")
+    incremental = str(tmp_path / "incremental")
+    run_adapter(afm.ADAPTER, str(data), incremental, False, incremental=True)
+    for pdb_path in sorted((data / "AFMultimer").rglob("*.pdb")):
+        _drop_last_residue(pdb_path)
+    run_adapter(afm.ADAPTER, str(data), incremental, False, incremental=True)
+
+    fresh = str(tmp_path / "fresh")
+    run_adapter(afm.ADAPTER, str(data), fresh, False)
+    assert _tree(incremental) == _tree(fresh)
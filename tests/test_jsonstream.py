@@ -0,0 +1,59 @@
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from jsonstream import read_json_keys
+
+DOCUMENT = {
+    "skipped": {"nested": [1, {"a": "}"}, [[]]], "text": 'braces { [ and "quotes"'},
+    "escaped": 'tab\t, quote \\" and unicode é☃',
+    "ptm": 0.8125,
+    "iptm": -1.5e-3,
+    "flag": True,
+    "missing": None,
+    "counts": [1, 2, 3],
+    "plddt": [91.5, 88.25, 70.0, 1e2],
+    "pae": [[0.25, 12.5], [13.0, 0.5]],
+    "after": "value after the arrays",
+}
+KEYS = ("escaped", "ptm", "iptm", "flag", "missing", "counts", "after", "not_there")
+ARRAYS = ("plddt", "pae")
+
+
+@pytest.fixture(params=[".json", ".json.gz"])
+def json_path(request, tmp_path):
+    path = tmp_path / f"scores{request.param}"
+    text = json.dumps(DOCUMENT, indent=1)
+    if request.param.endswith(".gz"):
+        path.write_bytes(gzip.compress(text.encode()))
+    else:
+        path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 16])
+def test_read_json_keys_matches_json_load(json_path, chunk_size):
+    data = read_json_keys(json_path, keys=KEYS, arrays=ARRAYS, chunk_size=chunk_size)
+    assert set(data) == (set(KEYS) | set(ARRAYS)) & set(DOCUMENT)
+    for key in KEYS:
+        if key in DOCUMENT:
+            assert data[key] == DOCUMENT[key]
+    for key in ARRAYS:
+        assert data[key].dtype == np.float64
+        np.testing.assert_array_equal(data[key], np.array(DOCUMENT[key], dtype=np.float64))
+
+
+def test_read_json_keys_empty_object(tmp_path):
+    path = tmp_path / "empty.json"
+    path.write_text("{ }")
+    assert read_json_keys(str(path), keys=["ptm"]) == {}
+
+
+@pytest.mark.parametrize("text", ["[1, 2]", '{"ptm": 0.5', '{"plddt": [1, "a"]}'])
+def test_read_json_keys_malformed(tmp_path, text):
+    path = tmp_path / "bad.json"
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        read_json_keys(str(path), keys=["ptm", "other"], arrays=["plddt"])
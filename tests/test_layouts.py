@@ -0,0 +1,104 @@
+import os
+import tarfile
+
+import pytest
+
+import afm
+import chai1
+import helixfold3
+from archives import ArchiveTree
+
+AFM_RUN = "alphafold2_multimer_v3_model_2_seed_000"
+BETA = "Beta_endorphin-mu_opioid"
+HF1 = "helixfold3_result_to_download_1"
+HF2 = "helixfold3_result_to_download_2"
+
+# Input file -> staged name, or None for files that are not staged, following
+# the _process_file_afm, _process_file_chai1 and _process_file_helixfold3
+# rules of the original utils.py
+LAYOUTS = {
+    "AFMultimer": {
+        f"run1/{BETA}_relaxed_rank_001_{AFM_RUN}.pdb": f"{BETA}_1.pdb",
+        f"run1/{BETA}_scores_rank_001_{AFM_RUN}.json": f"{BETA}_1.json",
+        f"run1/{BETA}_relaxed_rank_002_{AFM_RUN}.pdb": f"{BETA}_2.pdb",
+        f"run1/{BETA}_unrelaxed_rank_003_{AFM_RUN}.pdb": None,
+        f"run1/{BETA}_relaxed_rank_000_{AFM_RUN}.pdb": None,
+        f"run1/{BETA}_relaxed_{AFM_RUN}.pdb": None,
+        f"run1/{BETA}_scores_rank_001_{AFM_RUN}.json.bak": None,
+        f"run1/{BETA}_pae_rank_001_{AFM_RUN}.json": None,
+        f"run1/nested/Nested_relaxed_rank_001_{AFM_RUN}.pdb": None,
+        f"run2/Pep_2-Rec_2_relaxed_rank_010_{AFM_RUN}.pdb": "Pep_2-Rec_2_10.pdb",
+        f"run2/Pep_2-Rec_2_scores_rank_010_{AFM_RUN}.json": "Pep_2-Rec_2_10.json",
+        f"Loose_relaxed_rank_001_{AFM_RUN}.pdb": None,
+    },
+    "Chai-1": {
+        "Pep1-Rec1/pred.rank_0.cif": "Pep1-Rec1_1.cif",
+        "Pep1-Rec1/scores.rank_0.json": "Pep1-Rec1_1.json",
+        "Pep1-Rec1/pred.model_idx_3.rank_4.cif": "Pep1-Rec1_5.cif",
+        "Pep1-Rec1/scores.model_idx_3.rank_4.json": "Pep1-Rec1_5.json",
+        "Pep1-Rec1/pred.rank_1.pdb": None,
+        "Pep1-Rec1/msa/pred.rank_2.cif": None,
+        "Pep_2/pred.rank_9.cif": "Pep_2_10.cif",
+        "pred.rank_0.cif": None,
+    },
+    "HelixFold3": {
+        f"{HF1}/job-Pep1-Rec1-x1-rank1/all_results.json": "Pep1-Rec1_1.json",
+        f"{HF1}/job-Pep1-Rec1-x1-rank1/predicted_structure.cif": "Pep1-Rec1_1.cif",
+        f"{HF1}/job-Pep1-Rec1-x1-rank1/ranked_0.cif": None,
+        f"{HF2}/job-Pep_2-Rec-2-abc-rank10/all_results.json": "Pep_2-Rec-2_10.json",
+        f"{HF2}/job-Pep3-Rec3-x-norank/all_results.json": None,
+        f"{HF2}/Pep4-Rec4-x-rank1/all_results.json": None,
+        "other_results/job-Pep5-Rec5-x-rank1/all_results.json": None,
+    },
+}
+ADAPTERS = {adapter.model: adapter for adapter in (afm.ADAPTER, chai1.ADAPTER, helixfold3.ADAPTER)}
+
+
+def _write_layout(root, model):
+    input_dir = root / model
+    for path in LAYOUTS[model]:
+        (input_dir / path).parent.mkdir(parents=True, exist_ok=True)
+        (input_dir / path).write_text(path)
+    return input_dir
+
+
+def _staged(index, input_dir):
+    """Staged name -> input file relative to input_dir."""
+    return {
+        os.path.basename(dst): os.path.relpath(str(src), input_dir)
+        for src, dst in index.pairs("out")
+    }
+
+
+def _expected(model):
+    return {name: path for path, name in LAYOUTS[model].items() if name is not None}
+
+
+@pytest.mark.parametrize("model", list(LAYOUTS))
+def test_index_names(tmp_path, model):
+    input_dir = _write_layout(tmp_path, model)
+    index = ADAPTERS[model].index(str(input_dir), None)
+    assert _staged(index, str(input_dir)) == _expected(model)
+    assert len(index) == len(_expected(model))
+
+
+@pytest.mark.parametrize("model", list(LAYOUTS))
+def test_index_names_from_archive(tmp_path, model):
+    input_dir = _write_layout(tmp_path, model)
+    with tarfile.open(tmp_path / "input.tar", "w") as tar:
+        tar.add(input_dir, arcname=model)
+    tree = ArchiveTree(tmp_path / "input.tar")
+    index = ADAPTERS[model].index(tree.find_dir(model), tree)
+    staged = {os.path.basename(dst): src.path for src, dst in index.pairs("out")}
+    assert staged == {name: f"{model}/{path}" for name, path in _expected(model).items()}
+
+
+@pytest.mark.parametrize("model", list(LAYOUTS))
+def test_name_stages_index(tmp_path, model):
+    input_dir = _write_layout(tmp_path, model)
+    output_dir = tmp_path / "out"
+    module = {"AFMultimer": afm, "Chai-1": chai1, "HelixFold3": helixfold3}[model]
+    module.name(str(input_dir), str(output_dir))
+    assert sorted(os.listdir(output_dir)) == sorted(_expected(model))
+    for name, path in _expected(model).items():
+        assert (output_dir / name).read_text() == path
@@ -0,0 +1,81 @@
+import os
+import shutil
+
+import pytest
+
+import afm
+import chai1
+import helixfold3
+from metadata import MetricTable, write_streamed_metadata
+from runner import run_adapter
+
+ADAPTERS = [afm.ADAPTER, chai1.ADAPTER, helixfold3.ADAPTER]
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("adapter", ADAPTERS, ids=lambda adapter: adapter.model)
+@pytest.mark.parametrize("scored", [False, True], ids=["plain", "scored"])
+def test_streamed_matches_in_memory(dataset, native_dir, tmp_path, adapter, scored):
+    natives = str(native_dir) if scored else None
+    for mode, stream in (("memory", False), ("stream", True)):
+        run_adapter(
+            adapter,
+            str(dataset),
+            str(tmp_path / mode),
+            False,
+            native_dir=natives,
+            stream_metadata=stream,
+        )
+    name = f"{adapter.prefix}_metadata.csv"
+    assert _read(tmp_path / "stream" / name) == _read(tmp_path / "memory" / name)
+
+
+def _chai1_without_first_structures(dataset, tmp_path):
+    # The first id in (id, rank) order has no structures, so a first block
+    # holds none of the CIF columns
+    input_dir = tmp_path / "Chai-1"
+    shutil.copytree(dataset / "Chai-1", input_dir)
+    first = sorted(os.listdir(input_dir))[0]
+    for path in (input_dir / first).glob("*.cif"):
+        path.unlink()
+    output_dir = str(tmp_path / "out")
+    index = chai1.ADAPTER.index(str(input_dir), None)
+    staged = chai1.name(str(input_dir), output_dir, index=index)
+    return sorted(index.files(output_dir, "json")), index.files(output_dir, "cif"), staged
+
+
+def test_streamed_header_without_first_structures(dataset, tmp_path):
+    json_rows, cif_rows, staged = _chai1_without_first_structures(dataset, tmp_path)
+
+    table = chai1._metrics(json_rows, cif_rows, staged)
+    table.sort()
+    table.write(str(tmp_path / "memory"))
+    write_streamed_metadata(
+        str(tmp_path / "stream"),
+        json_rows,
+        cif_rows,
+        lambda block, cif_block: chai1._metrics(block, cif_block, staged),
+        chai1.COLUMNS,
+        block_size=1,
+    )
+
+    memory = _read(tmp_path / "memory.csv")
+    assert memory.splitlines()[0].split(",") == ["id", "rank", "chains", *chai1.COLUMNS]
+    assert _read(tmp_path / "stream.csv") == memory
+
+
+def test_streamed_header_from_columns(tmp_path):
+    def block_metrics(block, _):
+        table = MetricTable()
+        for protein_id, rank, _ in block:
+            if protein_id != "a":
+                table.set(protein_id, rank, {"chains": "AB", "x": 1.5})
+        return table
+
+    rows = [("a", "1", None), ("b", "1", None)]
+    write_streamed_metadata(str(tmp_path / "m"), rows, [], block_metrics, ["x"], block_size=1)
+    assert _read(tmp_path / "m.csv").splitlines() == ["id,rank,chains,x", "b,1,AB,1.5"]
@@ -0,0 +1,91 @@
+import shutil
+import subprocess
+
+import pytest
+
+from mirror import RepoMirror
+from utils import _download
+
+
+def _git(*args, cwd):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+def _commit(repo, files, message):
+    for name, text in files.items():
+        path = repo / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    _git("add", "-A", cwd=repo)
+    _git("commit", "-q", "-m", message, cwd=repo)
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    """file:// URL of a repository with two model folders; (URL, repository path)."""
+    repo = tmp_path / "upstream"
+    repo.mkdir()
+    _git("init", "-q", "-b", "main", cwd=repo)
+    _git("config", "uploadpack.allowFilter", "true", cwd=repo)
+    _commit(
+        repo,
+        {"models/AFMultimer/a/ranking_debug.json": "{}", "models/Chai-1/b/scores.json": "{}"},
+        "initial",
+    )
+    return f"file://{repo}", repo
+
+
+def _files(root):
+    return sorted(
+        str(p.relative_to(root)) for p in root.rglob("*") if p.is_file() and p.name != ".git"
+    )
+
+
+def test_clone_and_sparse_checkout(upstream, tmp_path):
+    url, _ = upstream
+    mirror = RepoMirror(tmp_path / "cache")
+    destination = mirror.checkout(url, tmp_path / "checkout", ["models/AFMultimer"])
+
+    assert _files(destination) == ["models/AFMultimer/a/ranking_debug.json"]
+    path = mirror.path(url)
+    assert path.parent == tmp_path / "cache" and path.name.endswith(".git")
+    assert (path / "HEAD").is_file() and not (path / ".git").exists()
+
+
+def test_update_fetches_new_commits(upstream, tmp_path):
+    url, repo = upstream
+    mirror = RepoMirror(tmp_path / "cache")
+    mirror.update(url)
+    _commit(repo, {"models/AFMultimer/c/ranking_debug.json": "{}"}, "add c")
+
+    # Without fetch the cached mirror is used as is
+    stale = RepoMirror(tmp_path / "cache", fetch=False)
+    stale.checkout(url, tmp_path / "stale", ["models/AFMultimer"])
+    assert _files(tmp_path / "stale") == ["models/AFMultimer/a/ranking_debug.json"]
+
+    mirror.checkout(url, tmp_path / "fresh", ["models/AFMultimer"])
+    assert _files(tmp_path / "fresh") == [
+        "models/AFMultimer/a/ranking_debug.json",
+        "models/AFMultimer/c/ranking_debug.json",
+    ]
+
+
+def test_download_through_mirror(upstream, tmp_path):
+    url, _ = upstream
+    mirror = RepoMirror(tmp_path / "cache")
+    folders = ["models/AFMultimer", "models/Chai-1"]
+    _download(url, str(tmp_path / "first"), folder_path=folders, mirror=mirror)
+    assert _files(tmp_path / "first") == [
+        "models/AFMultimer/a/ranking_debug.json",
+        "models/Chai-1/b/scores.json",
+    ]
+
+    # A removed worktree is pruned, so the next checkout can reuse the mirror
+    shutil.rmtree(tmp_path / "first")
+    _download(url, str(tmp_path / "second"), folder_path="models/Chai-1", mirror=mirror)
+    assert _files(tmp_path / "second") == ["models/Chai-1/b/scores.json"]
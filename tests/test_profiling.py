@@ -0,0 +1,101 @@
+import json
+import os
+
+import pytest
+
+import chai1
+from profiling import Profiler, _thread_io, open_profiler, stage
+from runner import run_adapter
+
+linux_io = pytest.mark.skipif(_thread_io()[0] is None, reason="needs /proc/thread-self/io")
+
+
+@linux_io
+def test_stage_io_excludes_its_own_probes(tmp_path):
+    path = tmp_path / "data"
+    path.write_bytes(os.urandom(5000))
+    profiler = Profiler()
+    with profiler.stage("outer"):
+        for i in range(3):
+            with profiler.stage("inner", f"m{i}") as record:
+                with open(path, "rb") as f:
+                    f.read()
+                record["files"] = 1
+        with open(tmp_path / "out", "wb") as f:
+            f.write(b"x" * 300)
+    with profiler.stage("empty"):
+        pass
+
+    records = {(record["name"], record["model"]): record for record in profiler.records}
+    for i in range(3):
+        assert records[("inner", f"m{i}")]["read_bytes"] == 5000
+        assert records[("inner", f"m{i}")]["written_bytes"] == 0
+    assert records[("outer", None)]["read_bytes"] == 3 * 5000
+    assert records[("outer", None)]["written_bytes"] == 300
+    assert records[("empty", None)]["read_bytes"] == 0
+
+
+def test_stage_records(tmp_path):
+    profiler = Profiler(cprofile="Chai-1:cif", cprofile_prefix=str(tmp_path / "run"))
+    with profiler.stage("list") as record:
+        record["files"] = 4
+    with profiler.stage("cif", "Chai-1"):
+        sum(range(1000))
+    with stage(None, "ignored") as record:
+        record["files"] = 1
+
+    assert [record["name"] for record in profiler.records] == ["list", "cif"]
+    first, second = profiler.records
+    assert first["files"] == 4 and second["files"] is None
+    assert second["model"] == "Chai-1"
+    assert second["start_seconds"] >= first["start_seconds"] + first["wall_seconds"]
+    for record in profiler.records:
+        assert record["wall_seconds"] >= 0 and record["cpu_seconds"] >= 0
+        assert record["tracemalloc_peak_bytes"] is None
+    assert (tmp_path / "run.Chai-1.cif.prof").is_file()
+    assert not (tmp_path / "run.pipeline.list.prof").exists()
+
+
+def test_memory_peaks():
+    profiler = Profiler(memory=True)
+    try:
+        with profiler.stage("alloc"):
+            data = bytearray(1 << 22)
+            del data
+    finally:
+        profiler.close()
+    assert profiler.records[0]["tracemalloc_peak_bytes"] >= 1 << 22
+
+
+def test_write_formats(dataset, tmp_path):
+    profiler = open_profiler(str(tmp_path / "run.json"))
+    run_adapter(chai1.ADAPTER, str(dataset), str(tmp_path / "out"), False, profiler=profiler)
+    profiler.write(str(tmp_path / "run.json"))
+    profiler.write(str(tmp_path / "run.trace.json"), "chrome")
+
+    with open(tmp_path / "run.json") as f:
+        records = json.load(f)["stages"]
+    assert records and all(record["model"] == "Chai-1" for record in records)
+    starts = [record["start_seconds"] for record in records]
+    assert starts == sorted(starts)
+
+    with open(tmp_path / "run.trace.json") as f:
+        trace = json.load(f)
+    events = trace["traceEvents"]
+    complete = [event for event in events if event["ph"] == "X"]
+    assert [event["name"] for event in complete] == [record["name"] for record in records]
+    for event, record in zip(complete, records):
+        assert event["cat"] == "Chai-1"
+        assert event["dur"] == round(record["wall_seconds"] * 1e6, 1)
+        assert "name" not in event["args"] and "thread" not in event["args"]
+    names = {event["name"] for event in events if event["ph"] == "M"}
+    assert names == {"process_name", "thread_name"}
+
+    with pytest.raises(ValueError):
+        profiler.write(str(tmp_path / "run.txt"), "text")
+
+
+def test_open_profiler_without_path(capsys):
+    assert open_profiler(None) is None
+    assert open_profiler(None, memory=True) is None
+    assert "require --profile" in capsys.readouterr().out
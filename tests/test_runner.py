@@ -0,0 +1,74 @@
+import tarfile
+
+import pytest
+
+import afm
+import chai1
+import helixfold3
+from runner import run_adapter
+
+ADAPTERS = [afm.ADAPTER, chai1.ADAPTER, helixfold3.ADAPTER]
+
+
+def _files(root):
+    return sorted(str(p.relative_to(root)) for p in root.rglob("*") if p.is_file())
+
+
+def _assert_same_tree(left, right):
+    assert _files(left) == _files(right)
+    for path in _files(left):
+        assert (left / path).read_bytes() == (right / path).read_bytes(), path
+
+
+@pytest.mark.parametrize("adapter", ADAPTERS, ids=lambda adapter: adapter.model)
+def test_workers_match_serial(dataset, native_dir, tmp_path, adapter):
+    for workers in (1, 3):
+        run_adapter(
+            adapter,
+            str(dataset),
+            str(tmp_path / f"workers{workers}"),
+            False,
+            workers=workers,
+            residue_store=True,
+            native_dir=str(native_dir),
+        )
+    _assert_same_tree(tmp_path / "workers1", tmp_path / "workers3")
+
+
+def _members(path):
+    """Regular file members of a tar archive -> contents, and its directory names."""
+    with tarfile.open(path) as archive:
+        files = {m.name: archive.extractfile(m).read() for m in archive if m.isreg()}
+        dirs = {m.name for m in archive if m.isdir()}
+    return files, dirs
+
+
+@pytest.mark.parametrize("adapter", ADAPTERS, ids=lambda adapter: adapter.model)
+def test_stream_archive_matches_staged_archive(model_cli, dataset, native_dir, tmp_path, adapter):
+    options = {"residue_store": True, "native_dir": str(native_dir)}
+    compression = {"compression": "gzip", "level": 1, "threads": 0}
+    archives = {}
+    for mode, stream in (("staged", False), ("stream", True)):
+        output_model = tmp_path / mode / adapter.model
+        output_model.parent.mkdir()
+        archives[mode] = tmp_path / mode / f"{adapter.model}.tar.gz"
+        model_cli.run_pipeline(
+            str(dataset),
+            False,
+            adapter.model,
+            output_model,
+            archives[mode],
+            stream,
+            dict(options),
+            compression,
+        )
+        # Either way only the archive is left
+        assert not output_model.exists()
+
+    staged_files, staged_dirs = _members(archives["staged"])
+    stream_files, stream_dirs = _members(archives["stream"])
+    assert sorted(stream_files) == sorted(staged_files)
+    assert f"{adapter.model}/{adapter.prefix}_metadata.csv" in staged_files
+    for name, data in staged_files.items():
+        assert stream_files[name] == data, name
+    assert stream_dirs <= staged_dirs and adapter.model in stream_dirs
@@ -0,0 +1,53 @@
+import numpy as np
+
+from scoring import kabsch_rmsd, superpose
+
+
+def _rotation(rng):
+    q, r = np.linalg.qr(rng.normal(size=(3, 3)))
+    q *= np.sign(np.diag(r))
+    if np.linalg.det(q) < 0:
+        q[:, 0] *= -1
+    return q
+
+
+def _point_sets(rng, batch=6, n=40):
+    target = rng.normal(scale=10, size=(n, 3))
+    mobile = np.stack(
+        [
+            target @ _rotation(rng).T + rng.normal(scale=5, size=3) + rng.normal(size=(n, 3))
+            for _ in range(batch)
+        ]
+    )
+    # A mirror image needs the reflection correction
+    mobile[-1] = -mobile[-1]
+    return mobile, target
+
+
+def test_batched_kabsch_matches_single():
+    mobile, target = _point_sets(np.random.default_rng(0))
+    batched = kabsch_rmsd(mobile, target)
+    single = [kabsch_rmsd(mobile[k : k + 1], target)[0] for k in range(len(mobile))]
+    np.testing.assert_allclose(batched, single, rtol=1e-12)
+
+    rotation, translation = superpose(mobile, target)
+    for k in range(len(mobile)):
+        r, t = superpose(mobile[k : k + 1], target)
+        np.testing.assert_allclose(rotation[k], r[0], atol=1e-12)
+        np.testing.assert_allclose(translation[k], t[0], atol=1e-9)
+
+
+def test_kabsch_rotations_are_proper():
+    mobile, target = _point_sets(np.random.default_rng(1))
+    rotation, _ = superpose(mobile, target)
+    np.testing.assert_allclose(np.linalg.det(rotation), 1.0)
+    identity = np.broadcast_to(np.eye(3), rotation.shape)
+    np.testing.assert_allclose(rotation @ rotation.transpose(0, 2, 1), identity, atol=1e-12)
+
+
+def test_kabsch_recovers_rigid_motion():
+    rng = np.random.default_rng(2)
+    target = rng.normal(scale=10, size=(25, 3))
+    mobile = np.stack([target @ _rotation(rng).T + rng.normal(size=3) for _ in range(4)])
+    np.testing.assert_allclose(kabsch_rmsd(mobile, target), 0.0, atol=1e-9)
+    assert np.isnan(kabsch_rmsd(mobile[:, :2], target[:2])).all()
@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+import utils
+from utils import _stage_file
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / "src.json"
+    path.write_text('{"iptm": 0.5}')
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    return path
+
+
+def _fail(*args):
+    raise OSError("not supported")
+
+
+def _partial_reflink(src, dst):
+    # A failed FICLONE leaves the empty destination behind
+    open(dst, "wb").close()
+    raise OSError("not supported")
+
+
+def _is_copy(src, dst):
+    return (
+        not dst.is_symlink()
+        and not os.path.samefile(src, dst)
+        and dst.read_bytes() == src.read_bytes()
+        and dst.stat().st_mtime_ns == src.stat().st_mtime_ns
+    )
+
+
+def test_auto_uses_reflink(src, tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(utils, "_reflink", lambda s, d: calls.append((s, d)))
+    assert _stage_file(src, tmp_path / "dst", "auto") == "reflink"
+    assert calls == [(src, tmp_path / "dst")]
+
+
+def test_auto_falls_back_to_hardlink(src, tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "_reflink", _partial_reflink)
+    dst = tmp_path / "dst"
+    assert _stage_file(src, dst, "auto") == "hardlink"
+    assert os.path.samefile(src, dst)
+
+
+def test_auto_falls_back_to_copy(src, tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "_reflink", _partial_reflink)
+    monkeypatch.setattr(os, "link", _fail)
+    dst = tmp_path / "dst"
+    assert _stage_file(src, dst, "auto") == "copy"
+    assert _is_copy(src, dst)
+
+
+@pytest.mark.parametrize("link_mode", ["reflink", "hardlink", "symlink"])
+def test_unsupported_mode_falls_back_to_copy(src, tmp_path, monkeypatch, link_mode):
+    monkeypatch.setattr(utils, "_reflink", _partial_reflink)
+    monkeypatch.setattr(os, "link", _fail)
+    monkeypatch.setattr(os, "symlink", _fail)
+    dst = tmp_path / "dst"
+    assert _stage_file(src, dst, link_mode) == "copy"
+    assert _is_copy(src, dst)
+
+
+def test_explicit_modes(src, tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "_reflink", _fail)
+    # An explicit reflink never becomes a hardlink
+    assert _stage_file(src, tmp_path / "reflink", "reflink") == "copy"
+    assert _is_copy(src, tmp_path / "reflink")
+
+    assert _stage_file(src, tmp_path / "hardlink", "hardlink") == "hardlink"
+    assert os.path.samefile(src, tmp_path / "hardlink")
+
+    assert _stage_file(src, tmp_path / "symlink", "symlink") == "symlink"
+    assert os.readlink(tmp_path / "symlink") == os.path.abspath(src)
+
+    monkeypatch.setattr(utils, "_reflink", lambda s, d: pytest.fail("copy mode tried a reflink"))
+    assert _stage_file(src, tmp_path / "copy", "copy") == "copy"
+    assert _is_copy(src, tmp_path / "copy")
+
+
+def test_replaces_existing_destination(src, tmp_path):
+    dst = tmp_path / "dst"
+    os.symlink(tmp_path / "missing", dst)
+    assert _stage_file(src, dst, "copy") == "copy"
+    assert _is_copy(src, dst)
+
+    with pytest.raises(ValueError):
+        _stage_file(src, dst, "move")
+
+
+def _symlinks(root):
+    return [path for path in root.rglob("*") if path.is_symlink()]
+
+
+def test_symlinks_into_a_shared_clone_become_auto(model_cli, dataset, tmp_path):
+    # The shared clone is removed after the pipelines, which would leave symlinks dangling
+    model_cli.run_model(
+        str(dataset), "Chai-1", tmp_path / "cloned", cloned=True, link_mode="symlink"
+    )
+    assert (tmp_path / "cloned" / "Chai1_metadata.csv").is_file()
+    assert not _symlinks(tmp_path / "cloned")
+
+    model_cli.run_model(
+        str(dataset), "Chai-1", tmp_path / "local", cloned=False, link_mode="symlink"
+    )
+    assert _symlinks(tmp_path / "local")
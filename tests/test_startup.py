@@ -0,0 +1,23 @@
+import subprocess
+import sys
+
+import startup
+
+# Imported by the stages that need them, not by --help
+DEFERRED = ("http.client", "ssl", "native.download", "archives", "gitobjects")
+
+
+def test_model_help_defers_stage_imports():
+    modules = {name for name, _, _, _ in startup.import_times(startup.COMMANDS["model.py --help"])}
+    assert not modules & {*DEFERRED, *startup.HEAVY}
+
+
+def test_model_help_lists_native_defaults():
+    proc = subprocess.run(
+        [sys.executable, *startup.COMMANDS["model.py --help"]],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert "https://files.rcsb.org/download" in proc.stdout
+    assert "{auto,pdb,cif}" in proc.stdout
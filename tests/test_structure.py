@@ -0,0 +1,59 @@
+import re
+
+import pytest
+
+import helixfold3
+from structure import cif_chains
+
+# _entity_poly loop as written by the PDB and AlphaFold 3, with sequences in
+# ;-delimited text fields and a quoted entity type
+MULTILINE_ENTITY_POLY = """data_model
+#
+loop_
+_entity_poly.entity_id
+_entity_poly.type
+_entity_poly.nstd_linkage
+_entity_poly.nstd_monomer
+_entity_poly.pdbx_seq_one_letter_code
+_entity_poly.pdbx_seq_one_letter_code_can
+_entity_poly.pdbx_strand_id
+_entity_poly.pdbx_target_identifier
+1 'polypeptide(L)' no no
+;MKTAYIAKQRQISFVKSHFSRQLEERLGLIEVQAPILSRVGDGTQDNLSGAEKAVQVKVKALPDAQ
+FEVVHSLAKWKRQTLGQHDFSAGEGLYTHMKALRPDEDRLSPLHSVYVDQWDWERVMGDGERQFSTL
+;
+;MKTAYIAKQRQISFVKSHFSRQLEERLGLIEVQAPILSRVGDGTQDNLSGAEKAVQVKVKALPDAQ
+FEVVHSLAKWKRQTLGQHDFSAGEGLYTHMKALRPDEDRLSPLHSVYVDQWDWERVMGDGERQFSTL
+;
+A ?
+2 polydeoxyribonucleotide no no '(DA)(DC)' AC C ?
+3 'polypeptide(L)' no no GLFDIIKKIAESF GLFDIIKKIAESF B,D ?
+#
+loop_
+_atom_site.group_PDB
+_atom_site.id
+ATOM 1
+#
+"""
+
+
+@pytest.fixture
+def multiline_cif(tmp_path):
+    path = tmp_path / "predicted_structure.cif"
+    path.write_text(MULTILINE_ENTITY_POLY)
+    return str(path)
+
+
+def test_cif_chains_multiline_rows(multiline_cif):
+    assert cif_chains(multiline_cif) == ["A", "B", "D"]
+    assert cif_chains(multiline_cif, max_chains=2) == ["A", "B"]
+    assert helixfold3.cif_extract(multiline_cif) == {"chains": "AB"}
+
+
+def test_cif_chains_matches_baseline_regex(dataset):
+    paths = sorted((dataset / "HelixFold3").rglob("*.cif"))
+    assert paths
+    for path in paths:
+        # The regex the HelixFold3 adapter used before cif_chains
+        expected = re.findall(r"^\d+\s+([A-Z])\s+polypeptide\(L\)", path.read_text(), re.MULTILINE)
+        assert cif_chains(str(path)) == expected